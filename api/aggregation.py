@@ -0,0 +1,186 @@
+import math
+import typing
+
+from django.db.models import Avg, Count, F, FloatField, Max, Min, QuerySet, Sum
+from django.db.models.functions import ExtractYear
+
+from repository import models
+
+GROUP_COLUMNS: dict[str, dict[str, typing.Any]] = {
+    "variety": {
+        "variety_id": F("crop_variety_id"),
+        "variety": F("crop_variety__variant_name"),
+    },
+    "location": {
+        "location_id": F("location_origin_id"),
+        "location": F("location_origin__region_name"),
+    },
+    "year": {"year": ExtractYear("paper_creation_year")},
+    "reference": {"reference": F("reference")},
+}
+"""Represents the columns that identify each statistics group."""
+
+GROUP_FIELDS = [field for columns in GROUP_COLUMNS.values() for field in columns]
+"""Represents all the group fields of a statistics row."""
+
+SUMMARY_GROUP_COLUMNS: dict[str, dict[str, typing.Any]] = {
+    "variety": GROUP_COLUMNS["variety"],
+    "location": GROUP_COLUMNS["location"],
+    "year": {"year": F("year")},
+}
+"""Represents the columns of the campaign summaries that identify each group."""
+
+SUMMARY_FILTER_LOOKUPS = {
+    "location_origin__id": "location_origin__id",
+    "crop_variety__id": "crop_variety__id",
+    "paper_creation_year__year__gte": "year__gte",
+    "paper_creation_year__year__lte": "year__lte",
+}
+"""Represents the campaign summaries lookup of each campaign documents filter."""
+
+
+def aggregate_campaign_statistics(
+    *, stat: str, group_by: typing.Sequence[str], filters: dict[str, typing.Any]
+) -> list[dict[str, typing.Any]]:
+    """Aggregates a stat of the campaign documents grouped by the given group fields.
+
+    The statistics are read from the campaign summaries when the groups and filters
+    are covered by them, otherwise they are computed with a single GROUP BY query
+    over the campaign documents. The standard deviation is the population one,
+    computed from the mean of the squares since SQLite does not provide it.
+
+    Args:
+        stat (str): The stat column to aggregate.
+        group_by (typing.Sequence[str]): The group fields, keys of `GROUP_COLUMNS`.
+        filters (dict[str, typing.Any]): The django lookups of the search.
+
+    Returns:
+        list[dict[str, typing.Any]]: A row per group with the group fields and the
+        count, mean, min, max and stddev of the stat.
+    """
+    if set(group_by) <= SUMMARY_GROUP_COLUMNS.keys() and set(filters) <= set(
+        SUMMARY_FILTER_LOOKUPS
+    ):
+        return aggregate_summary_statistics(
+            stat=stat, group_by=group_by, filters=filters
+        )
+
+    groups = aggregate_groups(
+        models.CampaignDocumentsModel.objects.filter(**filters),
+        {
+            alias: column
+            for group in group_by
+            for alias, column in GROUP_COLUMNS[group].items()
+        },
+        count=Count("id"),
+        mean=Avg(stat, output_field=FloatField()),
+        mean_square=Avg(F(stat) * F(stat), output_field=FloatField()),
+        min=Min(stat),
+        max=Max(stat),
+    )
+
+    return [
+        build_statistics_row(group, mean=group["mean"], mean_square=group["mean_square"])
+        for group in groups
+    ]
+
+
+def aggregate_summary_statistics(
+    *, stat: str, group_by: typing.Sequence[str], filters: dict[str, typing.Any]
+) -> list[dict[str, typing.Any]]:
+    """Aggregates a stat from the campaign summaries, which only hold a few rows per
+    variety, location and year, behaving like `aggregate_campaign_statistics`."""
+    groups = aggregate_groups(
+        models.CampaignSummaryModel.objects.filter(
+            stat=stat,
+            **{SUMMARY_FILTER_LOOKUPS[lookup]: value for lookup, value in filters.items()},
+        ),
+        {
+            alias: column
+            for group in group_by
+            for alias, column in SUMMARY_GROUP_COLUMNS[group].items()
+        },
+        count=Sum("count"),
+        total=Sum("total"),
+        total_squares=Sum("total_squares"),
+        min=Min("minimum"),
+        max=Max("maximum"),
+    )
+
+    statistics_rows = []
+
+    for group in groups:
+        if not group["count"]:
+            group["count"] = 0
+            statistics_rows.append(build_statistics_row(group))
+            continue
+
+        statistics_rows.append(
+            build_statistics_row(
+                group,
+                mean=group["total"] / group["count"],
+                mean_square=group["total_squares"] / group["count"],
+            )
+        )
+
+    return statistics_rows
+
+
+def aggregate_groups(
+    queryset: QuerySet, group_columns: dict[str, typing.Any], **aggregates
+) -> list[dict[str, typing.Any]]:
+    """Aggregates the given queryset grouped by the given columns.
+
+    Args:
+        queryset (QuerySet): The rows to aggregate.
+        group_columns (dict[str, typing.Any]): The expression of each group field.
+        **aggregates: The aggregate expressions.
+
+    Returns:
+        list[dict[str, typing.Any]]: A row per group with the aggregates and the group
+        fields prefixed by `group_`, a single row when there are no group columns.
+    """
+    if not group_columns:
+        return [queryset.aggregate(**aggregates)]
+
+    group_fields = [f"group_{alias}" for alias in group_columns]
+
+    return list(
+        queryset.values(
+            **{
+                group_field: column
+                for group_field, column in zip(group_fields, group_columns.values())
+            }
+        )
+        .annotate(**aggregates)
+        .order_by(*group_fields)
+    )
+
+
+def build_statistics_row(
+    group: dict[str, typing.Any],
+    *,
+    mean: float | None = None,
+    mean_square: float | None = None,
+) -> dict[str, typing.Any]:
+    """Returns the statistics row of an aggregated group, with all the group fields
+    and the stddev."""
+    statistics_row: dict[str, typing.Any] = dict.fromkeys(GROUP_FIELDS)
+
+    for key, value in group.items():
+        if key.startswith("group_"):
+            statistics_row[key.removeprefix("group_")] = value
+
+    statistics_row.update(
+        count=group["count"],
+        mean=mean,
+        min=None if group["min"] is None else float(group["min"]),
+        max=None if group["max"] is None else float(group["max"]),
+        stddev=(
+            None
+            if mean is None or mean_square is None
+            else math.sqrt(max(mean_square - mean * mean, 0.0))
+        ),
+    )
+
+    return statistics_row
@@ -0,0 +1,504 @@
+import dataclasses
+import threading
+import typing
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, ExtractYear
+from django.dispatch import receiver
+
+from api.cache import InProcessPageCache
+from repository import models
+from repository.versioning import data_changed, get_data_version
+
+type GroupLabel = dict[str, typing.Any]
+
+type Selection = slice | np.ndarray
+
+ANALYTICS_STATS = [stat for stat, _ in models.CampaignSummaryModel.STAT_CHOICES]
+"""Represents the campaign document stats loaded in the columnar snapshot."""
+
+ANALYTICS_GROUPS = ["variety", "location", "year", "reference"]
+"""Represents the fields that group the rows of the columnar snapshot."""
+
+
+@dataclasses.dataclass(frozen=True)
+class ColumnarSnapshot:
+    """Represents the campaign document stats loaded in memory as NumPy columns, one
+    value per campaign document, clustered by location and year.
+
+    The rows of a location, and of a location and year range, are contiguous, so
+    those searches only read a slice of the columns. The answers are cached until
+    the snapshot is replaced.
+    """
+
+    version: int
+    """Represents the repository data version of the snapshot."""
+
+    size: int
+    """Represents the amount of campaign documents."""
+
+    cluster_keys: np.ndarray
+    """Represents the sorted location and year code of each row."""
+
+    group_codes: dict[str, np.ndarray]
+    """Represents the dense code of each group field, an index of `group_values`."""
+
+    group_values: dict[str, np.ndarray]
+    """Represents the sorted distinct values of each group field."""
+
+    group_labels: dict[str, list[GroupLabel]]
+    """Represents the statistics group fields of each group code."""
+
+    stats: dict[str, np.ndarray]
+    """Represents the stat columns as floats."""
+
+    answers: InProcessPageCache = dataclasses.field(
+        default_factory=lambda: InProcessPageCache(
+            max_entries=settings.ANALYTICS_SNAPSHOT["MAX_ANSWERS"],
+            timeout=float("inf"),
+        )
+    )
+    """Represents the cached answers of the snapshot queries."""
+
+    stat_orders: dict[str, np.ndarray] = dataclasses.field(default_factory=dict)
+    """Represents the rows sorted by the value of each stat, built on demand."""
+
+    def find_code(self, group: str, value: typing.Any) -> int | None:
+        """Returns the code of a group value, or None when no row has the value."""
+        values = self.group_values[group]
+        code = int(np.searchsorted(values, value))
+
+        if code < len(values) and values[code] == value:
+            return code
+
+        return None
+
+    def select(
+        self,
+        *,
+        location_id: int | None = None,
+        variety_id: int | None = None,
+        year_from: int | None = None,
+        year_to: int | None = None,
+        reference: str | None = None,
+    ) -> Selection:
+        """Returns the rows that match all the given search filters.
+
+        Returns:
+            Selection: A slice of the columns, or the positions of the matching rows.
+        """
+        years = self.group_values["year"]
+        year_codes = (
+            0 if year_from is None else int(np.searchsorted(years, year_from, "left")),
+            len(years) if year_to is None else int(np.searchsorted(years, year_to, "right")),
+        )
+
+        start, stop = 0, self.size
+        conditions = []
+
+        if location_id is not None:
+            location_code = self.find_code("location", location_id)
+
+            if location_code is None:
+                return slice(0, 0)
+
+            start, stop = np.searchsorted(
+                self.cluster_keys,
+                [
+                    location_code * len(years) + year_codes[0],
+                    location_code * len(years) + year_codes[1],
+                ],
+            ).tolist()
+        elif year_from is not None or year_to is not None:
+            year_column = self.group_codes["year"]
+            conditions.append(
+                (year_column >= year_codes[0]) & (year_column < year_codes[1])
+            )
+
+        for group, value in [("variety", variety_id), ("reference", reference)]:
+            if value is None:
+                continue
+
+            code = self.find_code(group, value)
+
+            if code is None:
+                return slice(0, 0)
+
+            conditions.append(self.group_codes[group] == code)
+
+        if not conditions:
+            return slice(start, stop)
+
+        mask = np.logical_and.reduce(
+            [condition[start:stop] for condition in conditions]
+        )
+
+        return np.flatnonzero(mask) + start
+
+    def group(
+        self, selection: Selection, group_by: typing.Sequence[str]
+    ) -> tuple[np.ndarray, list[GroupLabel]]:
+        """Assigns a dense group key to each selected row.
+
+        Args:
+            selection (Selection): The selected rows.
+            group_by (typing.Sequence[str]): The group fields, in `ANALYTICS_GROUPS`.
+
+        Returns:
+            tuple[np.ndarray, list[GroupLabel]]: The group key of each selected row,
+            and the group fields of each key.
+        """
+        if not group_by:
+            selected_size = len(self.cluster_keys[selection])
+
+            return np.zeros(selected_size, dtype=np.int64), [{}]
+
+        if len(group_by) == 1:
+            return (
+                self.group_codes[group_by[0]][selection],
+                self.group_labels[group_by[0]],
+            )
+
+        # Combine the codes of the groups as the digits of a mixed radix number.
+        combined_keys: typing.Any = 0
+        combined_size = 1
+
+        for group in group_by:
+            combined_keys = combined_keys * len(self.group_labels[group]) + (
+                self.group_codes[group][selection].astype(np.int64)
+            )
+            combined_size *= len(self.group_labels[group])
+
+        # Make the combined keys dense again, counting them when there are not many
+        # combinations, since sorting them is much slower.
+        if combined_size <= max(len(combined_keys), 1 << 16):
+            present_keys = np.bincount(combined_keys, minlength=combined_size) > 0
+            unique_keys = np.flatnonzero(present_keys)
+            keys = (np.cumsum(present_keys) - 1)[combined_keys]
+        else:
+            unique_keys, keys = np.unique(combined_keys, return_inverse=True)
+
+        labels = []
+
+        for combined_key in unique_keys.tolist():
+            label: GroupLabel = {}
+
+            for group in reversed(group_by):
+                combined_key, code = divmod(combined_key, len(self.group_labels[group]))
+                label.update(self.group_labels[group][code])
+
+            labels.append(label)
+
+        return keys.reshape(-1), labels
+
+    def rank(
+        self,
+        *,
+        stat: str,
+        rank_by: typing.Sequence[str],
+        limit: int,
+        ascending: bool = False,
+        filters: dict[str, typing.Any],
+    ) -> list[dict[str, typing.Any]]:
+        """Ranks the groups of the filtered rows by the mean of a stat.
+
+        Args:
+            stat (str): The stat to rank by.
+            rank_by (typing.Sequence[str]): The group fields of the ranked groups.
+            limit (int): The amount of groups to return.
+            ascending (bool): Whether the lowest means are ranked first.
+            filters (dict[str, typing.Any]): The search filters, see `select`.
+
+        Returns:
+            list[dict[str, typing.Any]]: The first `limit` groups with their rank,
+            group fields, count and mean.
+
+        Raises:
+            ValueError: When there are no group fields.
+        """
+        if not rank_by:
+            raise ValueError("Cannot rank without at least one group field.")
+
+        answer_key = repr(("rank", stat, tuple(rank_by), limit, ascending, filters))
+        answer = self.answers.get(answer_key)
+
+        if answer is not None:
+            return answer
+
+        selection = self.select(**filters)
+        keys, labels = self.group(selection, rank_by)
+
+        counts = np.bincount(keys, minlength=len(labels))
+        totals = np.bincount(
+            keys, weights=self.stats[stat][selection], minlength=len(labels)
+        )
+
+        present_keys = np.flatnonzero(counts)
+        means = totals[present_keys] / counts[present_keys]
+        order = np.argsort(means if ascending else -means, kind="stable")[:limit]
+
+        answer = [
+            {
+                **labels[present_keys[index]],
+                "rank": rank,
+                "count": int(counts[present_keys[index]]),
+                "mean": float(means[index]),
+            }
+            for rank, index in enumerate(order.tolist(), start=1)
+        ]
+        self.answers.set(answer_key, answer)
+
+        return answer
+
+    def percentiles(
+        self,
+        *,
+        stat: str,
+        percentiles: typing.Sequence[float],
+        group_by: typing.Sequence[str],
+        filters: dict[str, typing.Any],
+    ) -> list[dict[str, typing.Any]]:
+        """Computes the percentiles of a stat in each group of the filtered rows, with
+        linear interpolation between the closest values.
+
+        Args:
+            stat (str): The stat column.
+            percentiles (typing.Sequence[float]): The percentiles, between 0 and 100.
+            group_by (typing.Sequence[str]): The group fields.
+            filters (dict[str, typing.Any]): The search filters, see `select`.
+
+        Returns:
+            list[dict[str, typing.Any]]: A row per group with its group fields, count
+            and the value of each percentile.
+
+        Raises:
+            ValueError: When a percentile is out of range.
+        """
+        requested_percentiles = np.asarray(percentiles, dtype=np.float64)
+
+        if np.any((requested_percentiles < 0) | (requested_percentiles > 100)):
+            raise ValueError("The percentiles must be between 0 and 100.")
+
+        answer_key = repr(
+            ("percentiles", stat, tuple(percentiles), tuple(group_by), filters)
+        )
+        answer = self.answers.get(answer_key)
+
+        if answer is not None:
+            return answer
+
+        # Walk the selected rows in the order of their values, then a stable sort by
+        # group keeps the values of each group sorted.
+        selection = self.select(**filters)
+        positions = self.get_stat_order(stat)
+
+        if not isinstance(selection, slice) or selection != slice(0, self.size):
+            selected = np.zeros(self.size, dtype=bool)
+            selected[selection] = True
+            positions = positions[selected[positions]]
+
+        keys, labels = self.group(positions, group_by)
+        group_order = np.argsort(
+            keys.astype(np.uint16) if len(labels) <= 1 << 16 else keys, kind="stable"
+        )
+        sorted_values = self.stats[stat][positions[group_order]]
+
+        counts = np.bincount(keys, minlength=len(labels))
+        present_keys = np.flatnonzero(counts)
+        starts = (np.cumsum(counts) - counts)[present_keys]
+
+        value_positions = starts[:, None] + (counts[present_keys, None] - 1) * (
+            requested_percentiles[None, :] / 100
+        )
+        lower_positions = np.floor(value_positions).astype(np.int64)
+        upper_positions = np.ceil(value_positions).astype(np.int64)
+
+        percentile_values = sorted_values[lower_positions] + (
+            sorted_values[upper_positions] - sorted_values[lower_positions]
+        ) * (value_positions - lower_positions)
+
+        answer = [
+            {**labels[key], "count": int(counts[key]), "values": group_values}
+            for key, group_values in zip(
+                present_keys.tolist(), percentile_values.tolist()
+            )
+        ]
+        self.answers.set(answer_key, answer)
+
+        return answer
+
+    def get_stat_order(self, stat: str) -> np.ndarray:
+        """Returns the positions of the rows sorted by the value of the given stat."""
+        if stat not in self.stat_orders:
+            self.stat_orders[stat] = np.argsort(self.stats[stat], kind="stable").astype(
+                np.int32
+            )
+
+        return self.stat_orders[stat]
+
+
+def build_group_codes(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the dense code of each value and the sorted distinct values."""
+    distinct_values, codes = np.unique(values, return_inverse=True)
+
+    return codes.reshape(-1).astype(np.int32), distinct_values
+
+
+def build_columnar_snapshot(version: int) -> ColumnarSnapshot:
+    """Loads the campaign document stats in chunks and builds a new snapshot.
+
+    Args:
+        version (int): The data version read before loading the stats.
+
+    Returns:
+        ColumnarSnapshot: The built snapshot.
+    """
+    chunk_size = settings.ANALYTICS_SNAPSHOT["CHUNK_SIZE"]
+
+    rows = (
+        models.CampaignDocumentsModel.objects.order_by("id")
+        .annotate(
+            year=ExtractYear("paper_creation_year"),
+            **{
+                f"{stat}_value": Cast(F(stat), output_field=FloatField())
+                for stat in ANALYTICS_STATS
+            },
+        )
+        .values_list(
+            "crop_variety_id",
+            "location_origin_id",
+            "year",
+            "reference",
+            *[f"{stat}_value" for stat in ANALYTICS_STATS],
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+    # Convert each chunk of rows to columns, so only one chunk of python objects is
+    # kept in memory at a time.
+    column_chunks: list[list[np.ndarray]] = [[] for _ in range(4 + len(ANALYTICS_STATS))]
+    chunk: list[tuple] = []
+
+    def flush_chunk() -> None:
+        for index, column in enumerate(zip(*chunk)):
+            column_chunks[index].append(
+                np.array(column, dtype=str if index == 3 else np.float64)
+            )
+        chunk.clear()
+
+    for row in rows:
+        chunk.append(row)
+
+        if len(chunk) == chunk_size:
+            flush_chunk()
+
+    flush_chunk()
+
+    columns = [
+        np.concatenate(chunks) if chunks else np.empty(0, dtype=np.float64)
+        for chunks in column_chunks
+    ]
+
+    variety_codes, variety_ids = build_group_codes(columns[0].astype(np.int64))
+    location_codes, location_ids = build_group_codes(columns[1].astype(np.int64))
+    year_codes, years = build_group_codes(columns[2].astype(np.int64))
+    reference_codes, references = build_group_codes(columns[3].astype(str))
+
+    # Cluster the rows by location and year, keeping the id order inside them.
+    cluster_keys = location_codes.astype(np.int64) * len(years) + year_codes
+    cluster_order = np.argsort(cluster_keys, kind="stable")
+
+    variety_names = dict(
+        models.VarietyOptionsModel.objects.values_list("id", "variant_name")
+    )
+    location_names = dict(
+        models.LocationOptionsModel.objects.values_list("id", "region_name")
+    )
+
+    return ColumnarSnapshot(
+        version=version,
+        size=len(cluster_keys),
+        cluster_keys=cluster_keys[cluster_order],
+        group_codes={
+            "variety": variety_codes[cluster_order],
+            "location": location_codes[cluster_order],
+            "year": year_codes[cluster_order],
+            "reference": reference_codes[cluster_order],
+        },
+        group_values={
+            "variety": variety_ids,
+            "location": location_ids,
+            "year": years,
+            "reference": references,
+        },
+        group_labels={
+            "variety": [
+                {"variety_id": variety_id, "variety": variety_names.get(variety_id)}
+                for variety_id in variety_ids.tolist()
+            ],
+            "location": [
+                {"location_id": location_id, "location": location_names.get(location_id)}
+                for location_id in location_ids.tolist()
+            ],
+            "year": [{"year": year} for year in years.tolist()],
+            "reference": [{"reference": reference} for reference in references.tolist()],
+        },
+        stats={
+            stat: column[cluster_order]
+            for stat, column in zip(ANALYTICS_STATS, columns[4:])
+        },
+    )
+
+
+_snapshot: ColumnarSnapshot | None = None
+
+_snapshot_lock = threading.Lock()
+
+
+def get_columnar_snapshot() -> ColumnarSnapshot:
+    """Returns the columnar snapshot of the current data version, building it
+    when it does not exist or is outdated.
+
+    Returns:
+        ColumnarSnapshot: The current columnar snapshot.
+    """
+    global _snapshot
+
+    snapshot = _snapshot
+
+    if snapshot is not None and snapshot.version == get_data_version():
+        return snapshot
+
+    # Only one thread builds the snapshot, the others wait and reuse it.
+    with _snapshot_lock:
+        version = get_data_version()
+
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = build_columnar_snapshot(version)
+
+        return _snapshot
+
+
+def rebuild_columnar_snapshot() -> None:
+    """Rebuilds the columnar snapshot in a background thread."""
+
+    def rebuild() -> None:
+        try:
+            get_columnar_snapshot()
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=rebuild, name="columnar-snapshot", daemon=True).start()
+
+
+@receiver(data_changed, dispatch_uid="api_columnar_snapshot_rebuild")
+def on_data_changed(sender, **kwargs) -> None:
+    """Schedules the rebuild of the columnar snapshot once the change is committed."""
+
+    if _snapshot is None or not settings.ANALYTICS_SNAPSHOT["BACKGROUND_REBUILD"]:
+        return
+
+    transaction.on_commit(rebuild_columnar_snapshot)
@@ -0,0 +1,396 @@
+import asyncio
+import platform
+import statistics
+import time
+import typing
+from datetime import datetime, timezone
+from importlib import metadata
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.cache import get_page_cache
+from api.pagination import Pagination, resolve_cursor
+from api.schema import ASYNC_STRAWBERRY_SCHEMA, STRAWBERRY_SCHEMA
+from repository import models
+from repository.synthetic import get_dataset_counts
+
+
+class Benchmark(typing.NamedTuple):
+    """Represents a measured operation."""
+
+    name: str
+
+    group: str
+    """Represents the kind of operation, like "pagination", "resolver" or "schema"."""
+
+    function: typing.Callable[[], typing.Any]
+
+    setup: typing.Callable[[], None] | None = None
+    """Represents an untimed function that runs before each run."""
+
+
+def clear_page_cache() -> None:
+    """Removes the cached pages, so each run resolves its pages from the database."""
+    get_page_cache().clear()
+
+
+def execute_query(query: str, variables: dict | None = None) -> typing.Callable[[], None]:
+    """Returns a function that executes the given query with the sync schema.
+
+    Raises:
+        RuntimeError: When the query execution has errors.
+    """
+
+    def execute() -> None:
+        result = STRAWBERRY_SCHEMA.execute_sync(query, variable_values=variables)
+
+        if result.errors:
+            raise RuntimeError(f"The benchmark query failed: {result.errors}")
+
+    return execute
+
+
+def execute_query_async(
+    query: str, variables: dict | None = None
+) -> typing.Callable[[], None]:
+    """Returns a function that executes the given query with the async schema, whose
+    resolvers run in the database thread pool.
+
+    Raises:
+        RuntimeError: When the query execution has errors.
+    """
+
+    def execute() -> None:
+        result = asyncio.run(
+            ASYNC_STRAWBERRY_SCHEMA.execute(query, variable_values=variables)
+        )
+
+        if result.errors:
+            raise RuntimeError(f"The benchmark query failed: {result.errors}")
+
+    return execute
+
+
+def build_benchmarks(*, limit: int) -> list[Benchmark]:
+    """Builds the benchmarks of the pagination system, each query field resolver and
+    a few end to end queries, for the current dataset.
+
+    Args:
+        limit (int): The page size of the paginated queries.
+
+    Returns:
+        list[Benchmark]: The benchmarks.
+    """
+    location = models.LocationOptionsModel.objects.order_by("id").first()
+    variety = models.VarietyOptionsModel.objects.order_by("id").first()
+    location_id = location.id if location is not None else 1
+    variety_id = variety.id if variety is not None else 1
+
+    filtered_cursor = {
+        "id": 1,
+        "select_related__location_origin__id": location_id,
+        "select_related__paper_creation_year__year__gte": 2020,
+    }
+    encoded_cursor = Pagination.encode_cursor(filtered_cursor)  # type: ignore
+    filters = {"locationId": location_id, "yearFrom": 2020}
+    viewport = {"south": -40, "west": -66, "north": -30, "east": -58}
+
+    resolver_queries = {
+        "campaign_documents": (
+            """
+            query ($limit: Int!) {
+                campaignDocuments(limit: $limit, cursor: "") {
+                    entries { id reference locationOrigin cropVariety performanceStat }
+                    pageMeta { nextCursor }
+                }
+            }
+            """,
+            {"limit": limit},
+        ),
+        "campaign_documents_filtered": (
+            """
+            query ($limit: Int!, $filters: CampaignDocumentsFilterInput) {
+                campaignDocuments(limit: $limit, cursor: "", filters: $filters) {
+                    entries { id performanceStat }
+                    pageMeta { nextCursor }
+                }
+            }
+            """,
+            {"limit": limit, "filters": filters},
+        ),
+        "variety_options": (
+            """
+            query ($limit: Int!) {
+                preflightOptions {
+                    varietyOptions(limit: $limit, cursor: "") { options { id variantName } }
+                }
+            }
+            """,
+            {"limit": limit},
+        ),
+        "location_options": (
+            """
+            query ($limit: Int!) {
+                preflightOptions {
+                    locationOptions(limit: $limit, cursor: "") { options { id regionName } }
+                }
+            }
+            """,
+            {"limit": limit},
+        ),
+        "campaign_options": (
+            """
+            query ($limit: Int!, $filters: CampaignDocumentsFilterInput) {
+                preflightOptions {
+                    campaignOptions(limit: $limit, cursor: "", filters: $filters) {
+                        options { id reference cropVariant }
+                    }
+                }
+            }
+            """,
+            {"limit": limit, "filters": filters},
+        ),
+        "campaign_statistics": (
+            """
+            {
+                campaignStatistics(stat: PERFORMANCE, groupBy: [VARIETY, LOCATION]) {
+                    varietyId locationId count mean stddev
+                }
+            }
+            """,
+            None,
+        ),
+        "campaign_statistics_by_reference": (
+            """
+            {
+                campaignStatistics(stat: PERFORMANCE, groupBy: [REFERENCE, YEAR]) {
+                    reference year count mean stddev
+                }
+            }
+            """,
+            None,
+        ),
+        "campaign_ranking": (
+            """
+            query ($filters: CampaignDocumentsFilterInput) {
+                campaignRanking(
+                    stat: RELATIVE_PERFORMANCE, rankBy: [VARIETY], filters: $filters
+                ) { rank varietyId mean }
+            }
+            """,
+            {"filters": filters},
+        ),
+        "campaign_percentiles": (
+            """
+            {
+                campaignPercentiles(
+                    stat: PERFORMANCE, percentiles: [10, 50, 90], groupBy: [YEAR]
+                ) { year values }
+            }
+            """,
+            None,
+        ),
+        "campaign_documents_in_viewport": (
+            """
+            query ($viewport: ViewportInput!, $limit: Int!) {
+                campaignDocumentsInViewport(viewport: $viewport, limit: $limit) {
+                    totalCount entries { id latitude longitude }
+                }
+            }
+            """,
+            {"viewport": viewport, "limit": limit},
+        ),
+        "nearest_campaign_documents": (
+            """
+            {
+                nearestCampaignDocuments(latitude: -34.5, longitude: -62.1, limit: 20) {
+                    distance document { id }
+                }
+            }
+            """,
+            None,
+        ),
+        "campaign_clusters": (
+            """
+            query ($viewport: ViewportInput!) {
+                campaignClusters(viewport: $viewport, zoom: 5) { count meanPerformance }
+            }
+            """,
+            {"viewport": viewport},
+        ),
+    }
+
+    dashboard_query = """
+        query ($limit: Int!, $filters: CampaignDocumentsFilterInput) {
+            campaignDocuments(limit: $limit, cursor: "", filters: $filters) {
+                entries { id reference locationOrigin cropVariety performanceStat }
+                pageMeta { nextCursor }
+            }
+            preflightOptions {
+                version
+                varietyOptions(limit: $limit, cursor: "") { options { id variantName } }
+                locationOptions(limit: $limit, cursor: "") { options { id regionName } }
+            }
+            campaignStatistics(stat: PERFORMANCE, groupBy: [VARIETY]) { varietyId mean }
+        }
+    """
+
+    return [
+        Benchmark(
+            "pagination.encode_cursor",
+            "pagination",
+            lambda: Pagination.encode_cursor(filtered_cursor),  # type: ignore
+        ),
+        Benchmark(
+            "pagination.decode_cursor",
+            "pagination",
+            lambda: Pagination.decode_cursor(encoded_cursor),
+        ),
+        Benchmark(
+            "pagination.resolve_cursor",
+            "pagination",
+            lambda: resolve_cursor(
+                search_limit=limit,
+                encoded_cursor="",
+                model=models.CampaignDocumentsModel,
+            ),
+            clear_page_cache,
+        ),
+        Benchmark(
+            "pagination.resolve_cursor_filtered",
+            "pagination",
+            lambda: resolve_cursor(
+                search_limit=limit,
+                encoded_cursor=encoded_cursor,
+                model=models.CampaignDocumentsModel,
+            ),
+            clear_page_cache,
+        ),
+        Benchmark(
+            "pagination.resolve_cursor_cached",
+            "pagination",
+            lambda: resolve_cursor(
+                search_limit=limit,
+                encoded_cursor=encoded_cursor,
+                model=models.CampaignDocumentsModel,
+            ),
+        ),
+        *[
+            Benchmark(
+                f"resolver.{name}",
+                "resolver",
+                execute_query(query, variables),
+                clear_page_cache,
+            )
+            for name, (query, variables) in resolver_queries.items()
+        ],
+        Benchmark(
+            "schema.sync_dashboard",
+            "schema",
+            execute_query(dashboard_query, {"limit": limit, "filters": filters}),
+            clear_page_cache,
+        ),
+        Benchmark(
+            "schema.async_dashboard",
+            "schema",
+            execute_query_async(dashboard_query, {"limit": limit, "filters": filters}),
+            clear_page_cache,
+        ),
+        Benchmark(
+            "schema.async_variety_statistics",
+            "schema",
+            execute_query_async(
+                "query ($id: Int!) { campaignStatistics(stat: PH, groupBy: [YEAR], "
+                "filters: {varietyId: $id}) { year mean } }",
+                {"id": variety_id},
+            ),
+        ),
+    ]
+
+
+def run_benchmark(benchmark: Benchmark, *, repeat: int) -> dict[str, typing.Any]:
+    """Runs a benchmark `repeat` times after a first run, which is reported apart since
+    it builds the in-memory snapshots and caches.
+
+    Args:
+        benchmark (Benchmark): The benchmark to run.
+        repeat (int): The amount of measured runs.
+
+    Returns:
+        dict[str, typing.Any]: The benchmark timings in milliseconds and the amount of
+        SQL queries of a run.
+    """
+
+    def measure() -> float:
+        if benchmark.setup is not None:
+            benchmark.setup()
+
+        start = time.perf_counter_ns()
+        benchmark.function()
+
+        return (time.perf_counter_ns() - start) / 1e6
+
+    first_run = measure()
+    timings = sorted(measure() for _ in range(repeat))
+
+    # The queries are counted in an extra run, so the capture does not add its
+    # overhead to the timings. The queries of the async schema resolvers run in the
+    # database thread pool connections, so they are not counted.
+    if benchmark.setup is not None:
+        benchmark.setup()
+
+    with CaptureQueriesContext(connection) as queries:
+        benchmark.function()
+
+    return {
+        "name": benchmark.name,
+        "group": benchmark.group,
+        "repeat": repeat,
+        "first_run_ms": first_run,
+        "min_ms": timings[0],
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "p95_ms": timings[min(round(0.95 * (repeat - 1)), repeat - 1)],
+        "max_ms": timings[-1],
+        "queries": len(queries),
+    }
+
+
+def run_benchmarks(
+    *, repeat: int, limit: int, label: str | None = None, names: typing.Sequence[str] = ()
+) -> dict[str, typing.Any]:
+    """Runs the benchmarks and returns a report that can be serialized as JSON.
+
+    Args:
+        repeat (int): The amount of measured runs of each benchmark.
+        limit (int): The page size of the paginated queries.
+        label (str | None): A label of the run, like the release version.
+        names (typing.Sequence[str]): Only runs the benchmarks whose names start with
+            one of these prefixes, all of them when empty.
+
+    Returns:
+        dict[str, typing.Any]: The run metadata and the results of each benchmark.
+    """
+    benchmarks = [
+        benchmark
+        for benchmark in build_benchmarks(limit=limit)
+        if not names or benchmark.name.startswith(tuple(names))
+    ]
+
+    return {
+        "metadata": {
+            "label": label,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "packages": {
+                package: metadata.version(package)
+                for package in ["django", "strawberry-graphql", "numpy"]
+            },
+            "database": connection.vendor,
+            "dataset": get_dataset_counts(),
+            "repeat": repeat,
+            "limit": limit,
+        },
+        "results": [run_benchmark(benchmark, repeat=repeat) for benchmark in benchmarks],
+    }
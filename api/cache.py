@@ -0,0 +1,146 @@
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+
+from repository.versioning import data_changed
+
+
+class PageCacheBackend(typing.Protocol):
+    """Represents a storage for the resolved pages of the pagination system."""
+
+    def get(self, key: str) -> typing.Any | None:
+        """Returns the cached value of the given key, or None when it is missing."""
+        ...
+
+    def set(self, key: str, value: typing.Any) -> None:
+        """Stores the given value under the given key."""
+        ...
+
+    def contains(self, key: str) -> bool:
+        """Check if the given key has been cached."""
+        ...
+
+    def clear(self) -> None:
+        """Removes all the cached values."""
+        ...
+
+
+class InProcessPageCache:
+    """Represents a thread safe LRU cache, stored in the process memory, whose
+    entries expire after a fixed timeout."""
+
+    def __init__(self, *, max_entries: int, timeout: float) -> None:
+        self.max_entries = max_entries
+        self.timeout = timeout
+
+        self.__entries: OrderedDict[str, tuple[float, typing.Any]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: str) -> typing.Any | None:
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+            if entry is None:
+                return None
+
+            expiration, value = entry
+
+            # Remove the entry when it has expired.
+            if expiration <= time.monotonic():
+                del self.__entries[key]
+                return None
+
+            self.__entries.move_to_end(key)
+
+            return value
+
+    def set(self, key: str, value: typing.Any) -> None:
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + self.timeout, value)
+            self.__entries.move_to_end(key)
+
+            # Evict the least recently used entries.
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def contains(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+
+class DjangoPageCache:
+    """Represents a cache stored in one of the django cache framework backends,
+    which can be shared between processes."""
+
+    KEY_PREFIX = "api:page"
+
+    def __init__(self, *, alias: str, timeout: float) -> None:
+        self.alias = alias
+        self.timeout = timeout
+
+    def get(self, key: str) -> typing.Any | None:
+        return caches[self.alias].get(f"{self.KEY_PREFIX}:{key}")
+
+    def set(self, key: str, value: typing.Any) -> None:
+        caches[self.alias].set(f"{self.KEY_PREFIX}:{key}", value, self.timeout)
+
+    def contains(self, key: str) -> bool:
+        return caches[self.alias].has_key(f"{self.KEY_PREFIX}:{key}")
+
+    def clear(self) -> None:
+        # The keys carry the data version, so the outdated pages are never requested
+        # again and the backend evicts them when they expire.
+        pass
+
+
+PAGE_CACHE_BACKENDS: dict[str, typing.Callable[[dict], PageCacheBackend]] = {
+    "memory": lambda options: InProcessPageCache(
+        max_entries=options["MAX_ENTRIES"], timeout=options["TIMEOUT"]
+    ),
+    "django": lambda options: DjangoPageCache(
+        alias=options["ALIAS"], timeout=options["TIMEOUT"]
+    ),
+}
+"""Represents the available page cache backends by name."""
+
+_page_cache: PageCacheBackend | None = None
+
+
+def get_page_cache() -> PageCacheBackend:
+    """Returns the page cache backend configured in the `PAGE_CACHE` setting.
+
+    Returns:
+        PageCacheBackend: The page cache backend.
+
+    Raises:
+        ValueError: When the configured backend does not exist.
+    """
+    global _page_cache
+
+    if _page_cache is None:
+        options = settings.PAGE_CACHE
+        backend_name = options["BACKEND"]
+
+        if backend_name not in PAGE_CACHE_BACKENDS:
+            raise ValueError(f"The page cache backend '{backend_name}' does not exist.")
+
+        _page_cache = PAGE_CACHE_BACKENDS[backend_name](options)
+
+    return _page_cache
+
+
+@receiver(data_changed, dispatch_uid="api_page_cache_invalidation")
+def invalidate_page_cache(sender, **kwargs) -> None:
+    """Removes all the cached pages when the repository data changes."""
+    get_page_cache().clear()
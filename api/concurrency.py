@@ -0,0 +1,104 @@
+import contextvars
+import functools
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_database_executor: ThreadPoolExecutor | None = None
+
+
+def get_database_executor() -> ThreadPoolExecutor:
+    """Returns the bounded thread pool where the synchronous database work of the
+    async GraphQL execution runs.
+
+    Returns:
+        ThreadPoolExecutor: The database thread pool.
+    """
+    global _database_executor
+
+    if _database_executor is None:
+        _database_executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_GRAPHQL["POOL_SIZE"],
+            thread_name_prefix="graphql-database",
+        )
+
+    return _database_executor
+
+
+def run_in_database_pool[**P, R](
+    function: typing.Callable[P, R],
+) -> typing.Callable[P, typing.Awaitable[R]]:
+    """Wraps a synchronous function, like a resolver that queries the database,
+    into a coroutine function that runs it in the database thread pool.
+
+    The pool is bounded, so the amount of concurrent database queries is limited
+    while the event loop keeps serving other requests.
+
+    Args:
+        function (typing.Callable[P, R]): A synchronous function.
+
+    Returns:
+        typing.Callable[P, typing.Awaitable[R]]: A coroutine function.
+    """
+
+    def run_with_fresh_connections(*args: P.args, **kwargs: P.kwargs) -> R:
+        # The pool threads outlive the requests, so the connections that exceed
+        # their max age or became unusable are closed as a request would do.
+        close_old_connections()
+
+        return function(*args, **kwargs)
+
+    @functools.wraps(function)
+    async def async_function(*args: P.args, **kwargs: P.kwargs) -> R:
+        return await sync_to_async(
+            run_with_fresh_connections,
+            thread_sensitive=False,
+            executor=get_database_executor(),
+        )(*args, **kwargs)
+
+    return async_function
+
+
+def iterate_in_context[T](iterator: typing.Iterator[T]) -> typing.Iterator[T]:
+    """Iterates an iterator in a copy of the current context, so the iterator keeps
+    the context variables, like the `ReplicaReads` scope of a request, when it is
+    consumed after they are reset, like the content of a streaming response.
+
+    Args:
+        iterator (typing.Iterator[T]): An iterator.
+
+    Returns:
+        typing.Iterator[T]: An iterator of the same items.
+    """
+    # The context is copied now, not when the iteration starts.
+    context = contextvars.copy_context()
+    exhausted = object()
+
+    def iterate() -> typing.Iterator[T]:
+        while (item := context.run(next, iterator, exhausted)) is not exhausted:
+            yield item  # type: ignore
+
+    return iterate()
+
+
+async def iterate_in_thread[T](iterator: typing.Iterator[T]) -> typing.AsyncIterator[T]:
+    """Iterates a synchronous iterator, like the chunks of a database export, pulling
+    each item with `sync_to_async`, so the event loop serves other requests while it
+    is produced and the items are sent as soon as each one is ready.
+
+    Args:
+        iterator (typing.Iterator[T]): A synchronous iterator.
+
+    Yields:
+        T: The items of the iterator.
+    """
+    # The thread sensitive calls run in the thread of the request, so every item is
+    # queried with its database connections.
+    pull_item = sync_to_async(next)
+    exhausted = object()
+
+    while (item := await pull_item(iterator, exhausted)) is not exhausted:
+        yield item  # type: ignore
@@ -0,0 +1,385 @@
+import math
+import threading
+import time
+import typing
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLObjectType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    SelectionSetNode,
+    get_named_type,
+    get_operation_ast,
+)
+from graphql.execution.values import get_argument_values, get_variable_values
+
+from api.cache import InProcessPageCache
+
+FIELD_WEIGHTS: dict[str, int] = {
+    "campaignDocuments": 2,
+    "preflightOptions": 1,
+    "varietyOptions": 1,
+    "locationOptions": 1,
+    "campaignOptions": 2,
+    "campaignStatistics": 100,
+    "campaignRanking": 5,
+    "campaignPercentiles": 5,
+    "campaignDocumentsInViewport": 2,
+    "nearestCampaignDocuments": 2,
+    "campaignClusters": 5,
+}
+"""Represents the cost of resolving each entry of the fields with a resolver, the
+fields that are not listed are resolved from their parent entries for free."""
+
+
+class QueryCostError(Exception):
+    """Represents an operation that exceeds the query cost limits."""
+
+    def __init__(self, message: str, code: str, **extensions: typing.Any) -> None:
+        super().__init__(message)
+
+        self.code = code
+        self.extensions = extensions
+
+    def as_graphql_error(self) -> GraphQLError:
+        """Returns the error as a GraphQL error with its code in the extensions."""
+        return GraphQLError(
+            str(self), extensions={"code": self.code, **self.extensions}
+        )
+
+
+def estimate_query_cost(
+    schema: GraphQLSchema,
+    document: DocumentNode,
+    *,
+    operation_name: str | None = None,
+    variables: dict[str, typing.Any] | None = None,
+) -> int:
+    """Estimates the cost of an operation of a validated document, without running
+    it. Each field costs its weight times its `limit` argument, or its default limit,
+    times its depth, and the aliases of the same field are added apart.
+
+    Args:
+        schema (GraphQLSchema): The schema the document was validated against.
+        document (DocumentNode): The validated document.
+        operation_name (str | None): The name of the executed operation.
+        variables (dict[str, typing.Any] | None): The operation variables.
+
+    Returns:
+        int: The estimated cost, zero when the operation or its variables are not
+        valid, since the execution reports those errors.
+    """
+    operation = get_operation_ast(document, operation_name)
+
+    if operation is None or schema.query_type is None:
+        return 0
+
+    variable_values = get_variable_values(
+        schema, operation.variable_definitions or (), variables or {}
+    )
+
+    if isinstance(variable_values, list):
+        return 0
+
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+
+    def get_selection_set_cost(
+        parent_type: GraphQLObjectType, selection_set: SelectionSetNode, depth: int
+    ) -> int:
+        cost = 0
+
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field = parent_type.fields.get(selection.name.value)
+
+                # The introspection fields are not part of the type fields.
+                if field is None:
+                    continue
+
+                arguments = get_argument_values(field, selection, variable_values)
+                weight = FIELD_WEIGHTS.get(selection.name.value, 0)
+
+                cost += weight * max(arguments.get("limit", 1), 1) * depth
+
+                field_type = get_named_type(field.type)
+
+                if selection.selection_set and isinstance(
+                    field_type, GraphQLObjectType
+                ):
+                    cost += get_selection_set_cost(
+                        field_type, selection.selection_set, depth + 1
+                    )
+
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+
+                if selection.type_condition is not None:
+                    fragment_type = schema.get_type(selection.type_condition.name.value)
+
+                cost += get_selection_set_cost(
+                    fragment_type, selection.selection_set, depth  # type: ignore
+                )
+
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = fragments[selection.name.value]
+
+                cost += get_selection_set_cost(
+                    schema.get_type(fragment.type_condition.name.value),  # type: ignore
+                    fragment.selection_set,
+                    depth,
+                )
+
+        return cost
+
+    return get_selection_set_cost(schema.query_type, operation.selection_set, 1)
+
+
+class CostBudgetsBackend(typing.Protocol):
+    """Represents a storage for the query cost budget of each client."""
+
+    def spend(self, client: str, cost: float) -> float:
+        """Spends the given cost from the budget of a client, when it has enough
+        tokens left, returning zero or the seconds until it can be spent."""
+        ...
+
+
+class CostBudgets:
+    """Represents the query cost budget of each client, a token bucket of `budget`
+    tokens that refills at `budget` tokens per `window` seconds, stored in the
+    process memory.
+
+    The buckets of up to `max_clients` clients are kept, the buckets of the clients
+    that did not send an operation for a whole window are full again, so they
+    expire after it.
+    """
+
+    def __init__(self, *, budget: float, window: float, max_clients: int) -> None:
+        self.budget = budget
+        self.window = window
+
+        self.__buckets = InProcessPageCache(max_entries=max_clients, timeout=window)
+        self.__lock = threading.Lock()
+
+    def spend(self, client: str, cost: float) -> float:
+        """Spends the given cost from the budget of a client, when it has enough
+        tokens left.
+
+        Args:
+            client (str): The client key, like its address.
+            cost (float): The cost of the operation.
+
+        Returns:
+            float: Zero when the cost was spent, otherwise the seconds until the
+            budget of the client refills enough to spend it.
+        """
+        now = time.monotonic()
+        refill_rate = self.budget / self.window
+
+        with self.__lock:
+            tokens, updated_at = self.__buckets.get(client) or (self.budget, now)
+            tokens = min(self.budget, tokens + (now - updated_at) * refill_rate)
+
+            if cost > tokens:
+                self.__buckets.set(client, (tokens, now))
+
+                return (cost - tokens) / refill_rate
+
+            self.__buckets.set(client, (tokens - cost, now))
+
+        return 0.0
+
+
+class DjangoCostBudgets:
+    """Represents the query cost budget of each client, stored in one of the django
+    cache framework backends, so the worker processes share it.
+
+    Each client can spend `budget` tokens per sliding window of `window` seconds.
+    The cost spent in each fixed window is counted with the atomic increments of
+    the backend, and the cost of the previous window is weighted by the part of it
+    that the sliding window still covers.
+    """
+
+    KEY_PREFIX = "api:budget"
+
+    def __init__(self, *, alias: str, budget: float, window: float) -> None:
+        self.alias = alias
+        self.budget = budget
+        self.window = window
+
+    def spend(self, client: str, cost: float) -> float:
+        """Spends the given cost from the budget of a client, when it has enough
+        tokens left.
+
+        Args:
+            client (str): The client key, like its address.
+            cost (float): The cost of the operation.
+
+        Returns:
+            float: Zero when the cost was spent, otherwise the estimated seconds until
+            the budget of the client refills enough to spend it.
+        """
+        cache = caches[self.alias]
+        window_index, window_offset = divmod(time.time(), self.window)
+        key = f"{self.KEY_PREFIX}:{client}:{int(window_index)}"
+
+        previous_spent = cache.get(
+            f"{self.KEY_PREFIX}:{client}:{int(window_index) - 1}", 0
+        )
+
+        # Each window is kept until the next one ends.
+        cache.add(key, 0, math.ceil(2 * self.window))
+
+        try:
+            spent = cache.incr(key, int(cost))
+        except ValueError:
+            # The window expired meanwhile.
+            spent = int(cost)
+            cache.set(key, spent, math.ceil(2 * self.window))
+
+        spent_tokens = previous_spent * (1 - window_offset / self.window) + spent
+
+        if spent_tokens > self.budget:
+            cache.decr(key, int(cost))
+
+            return (spent_tokens - self.budget) / (self.budget / self.window)
+
+        return 0.0
+
+
+COST_BUDGETS_BACKENDS: dict[str, typing.Callable[[dict], CostBudgetsBackend]] = {
+    "memory": lambda options: CostBudgets(
+        budget=options["CLIENT_BUDGET"],
+        window=options["BUDGET_WINDOW"],
+        max_clients=options["MAX_CLIENTS"],
+    ),
+    "django": lambda options: DjangoCostBudgets(
+        alias=options["BUDGETS_ALIAS"],
+        budget=options["CLIENT_BUDGET"],
+        window=options["BUDGET_WINDOW"],
+    ),
+}
+"""Represents the available client budgets backends by name."""
+
+
+def get_client_address(request: HttpRequest) -> str | None:
+    """Returns the address of the client of a request.
+
+    Behind `TRUSTED_PROXIES` proxies, the `REMOTE_ADDR` is the address of the last
+    proxy, so the client address is taken from the `CLIENT_HEADER` header, like
+    `X-Forwarded-For`, where each proxy appends the address it was connected from.
+    The addresses before the ones of the trusted proxies are sent by the client,
+    so they are ignored.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        str | None: The client address.
+    """
+    trusted_proxies = settings.QUERY_COST["TRUSTED_PROXIES"]
+
+    if trusted_proxies <= 0:
+        return request.META.get("REMOTE_ADDR")
+
+    forwarded_addresses = [
+        address.strip()
+        for address in request.headers.get(
+            settings.QUERY_COST["CLIENT_HEADER"], ""
+        ).split(",")
+        if address.strip()
+    ]
+
+    # The request did not go through all the trusted proxies.
+    if len(forwarded_addresses) < trusted_proxies:
+        return request.META.get("REMOTE_ADDR")
+
+    return forwarded_addresses[-trusted_proxies]
+
+
+def check_query_cost(
+    cost: int,
+    *,
+    max_cost: int,
+    client: str | None = None,
+    budgets: CostBudgetsBackend | None = None,
+) -> None:
+    """Checks that an operation cost is within the max cost of an operation and the
+    budget of its client, spending it from the budget.
+
+    Args:
+        cost (int): The estimated operation cost.
+        max_cost (int): The max cost of an operation.
+        client (str | None): The client key, the budgets are not checked without it.
+        budgets (CostBudgetsBackend | None): The client budgets, when they are
+            enabled.
+
+    Raises:
+        QueryCostError: When the cost exceeds the max cost or the client budget.
+    """
+    if cost > max_cost:
+        raise QueryCostError(
+            f"The query cost {cost} exceeds the max cost of {max_cost}, "
+            "request less entries or split the query.",
+            "QUERY_TOO_EXPENSIVE",
+            cost=cost,
+            maxCost=max_cost,
+        )
+
+    if client is None or budgets is None:
+        return
+
+    retry_after = budgets.spend(client, cost)
+
+    if retry_after > 0:
+        raise QueryCostError(
+            f"The query cost {cost} exceeds the remaining budget of the client, "
+            f"retry in {retry_after:.1f} seconds.",
+            "THROTTLED",
+            cost=cost,
+            retryAfter=retry_after,
+        )
+
+
+_cost_budgets: CostBudgetsBackend | None = None
+
+
+def get_cost_budgets() -> CostBudgetsBackend | None:
+    """Returns the client budgets configured in the `QUERY_COST` setting.
+
+    Returns:
+        CostBudgetsBackend | None: The client budgets, or None when they are
+        disabled.
+
+    Raises:
+        ValueError: When the configured backend does not exist.
+    """
+    global _cost_budgets
+
+    options = settings.QUERY_COST
+
+    if options["CLIENT_BUDGET"] <= 0:
+        return None
+
+    if _cost_budgets is None:
+        backend_name = options["BUDGETS_BACKEND"]
+
+        if backend_name not in COST_BUDGETS_BACKENDS:
+            raise ValueError(
+                f"The client budgets backend '{backend_name}' does not exist."
+            )
+
+        _cost_budgets = COST_BUDGETS_BACKENDS[backend_name](options)
+
+    return _cost_budgets
@@ -0,0 +1,207 @@
+import hashlib
+import threading
+import typing
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import DocumentNode, GraphQLError, GraphQLSchema, parse, validate
+
+from api.cache import InProcessPageCache
+
+
+def hash_query(query: str) -> str:
+    """Returns the sha256 hex digest of the given query string.
+
+    Args:
+        query (str): A GraphQL query string.
+
+    Returns:
+        str: The query hash.
+    """
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class DocumentCache:
+    """Represents a LRU cache of the parsed and validated GraphQL documents, keyed by
+    the hash of their query string, that counts its hits and misses."""
+
+    def __init__(self, *, max_entries: int) -> None:
+        self.parsed_documents = InProcessPageCache(
+            max_entries=max_entries, timeout=float("inf")
+        )
+        self.validation_errors = InProcessPageCache(
+            max_entries=max_entries, timeout=float("inf")
+        )
+
+        self.counters = {
+            "parse_hits": 0,
+            "parse_misses": 0,
+            "validation_hits": 0,
+            "validation_misses": 0,
+        }
+        self.__counters_lock = threading.Lock()
+
+    def __count(self, counter: str) -> None:
+        with self.__counters_lock:
+            self.counters[counter] += 1
+
+    def parse(self, query: str, **parse_options) -> DocumentNode:
+        """Returns the parsed document of the given query.
+
+        Args:
+            query (str): A GraphQL query string.
+            **parse_options: The graphql-core parse options.
+
+        Returns:
+            DocumentNode: The parsed document.
+
+        Raises:
+            GraphQLSyntaxError: When the query cannot be parsed.
+        """
+        document_key = hash_query(query)
+        document = self.parsed_documents.get(document_key)
+
+        if document is not None:
+            self.__count("parse_hits")
+            return document
+
+        self.__count("parse_misses")
+
+        document = parse(query, **parse_options)
+        self.parsed_documents.set(document_key, document)
+
+        return document
+
+    def validate(
+        self,
+        schema: GraphQLSchema,
+        query: str,
+        document: DocumentNode,
+        validation_rules: tuple,
+    ) -> list[GraphQLError]:
+        """Returns the validation errors of the given document.
+
+        Args:
+            schema (GraphQLSchema): The schema to validate against.
+            query (str): The query string of the document.
+            document (DocumentNode): The parsed document.
+            validation_rules (tuple): The validation rules to apply.
+
+        Returns:
+            list[GraphQLError]: The validation errors.
+        """
+        validation_key = f"{id(schema)}:{hash(validation_rules)}:{hash_query(query)}"
+        errors = self.validation_errors.get(validation_key)
+
+        if errors is not None:
+            self.__count("validation_hits")
+            return errors
+
+        self.__count("validation_misses")
+
+        errors = validate(schema, document, validation_rules)
+        self.validation_errors.set(validation_key, errors)
+
+        return errors
+
+    def hit_ratio(self) -> dict[str, float]:
+        """Returns the hit ratio of the parse and validation caches.
+
+        Returns:
+            dict[str, float]: The hit ratio of each cache, zero when it was never used.
+        """
+        ratios = {}
+
+        for step in ["parse", "validation"]:
+            hits = self.counters[f"{step}_hits"]
+            lookups = hits + self.counters[f"{step}_misses"]
+
+            ratios[step] = hits / lookups if lookups else 0.0
+
+        return ratios
+
+
+_document_cache: DocumentCache | None = None
+
+
+def get_document_cache() -> DocumentCache:
+    """Returns the document cache configured in the `GRAPHQL_DOCUMENTS` setting.
+
+    Returns:
+        DocumentCache: The document cache.
+    """
+    global _document_cache
+
+    if _document_cache is None:
+        _document_cache = DocumentCache(
+            max_entries=settings.GRAPHQL_DOCUMENTS["MAX_ENTRIES"]
+        )
+
+    return _document_cache
+
+
+# Automatic persisted queries
+# https://www.apollographql.com/docs/apollo-server/performance/apq/
+
+
+class PersistedQueryError(Exception):
+    """Represents an error of the automatic persisted queries protocol."""
+
+    def __init__(self, message: str, code: str) -> None:
+        super().__init__(message)
+        self.code = code
+
+    def as_graphql_error(self) -> GraphQLError:
+        """Returns the error as a GraphQL error that the clients understand."""
+        return GraphQLError(str(self), extensions={"code": self.code})
+
+
+def resolve_persisted_query(data: typing.Any) -> typing.Any:
+    """Completes the given request data with its persisted query, or persists the
+    query when the request data has both the query and its hash.
+
+    Args:
+        data (typing.Any): The decoded GraphQL request data.
+
+    Returns:
+        typing.Any: The request data with the query.
+
+    Raises:
+        PersistedQueryError: When the hash is unknown, does not match the query
+            or the protocol version is not supported.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("extensions"), dict):
+        return data
+
+    persisted_query = data["extensions"].get("persistedQuery")
+
+    if persisted_query is None:
+        return data
+
+    if persisted_query.get("version") != 1:
+        raise PersistedQueryError(
+            "Unsupported persisted query version", "PERSISTED_QUERY_NOT_SUPPORTED"
+        )
+
+    query_hash = persisted_query.get("sha256Hash")
+    query = data.get("query")
+    persisted_queries = caches[settings.GRAPHQL_DOCUMENTS["PERSISTED_QUERIES_ALIAS"]]
+
+    if query is None:
+        query = persisted_queries.get(f"api:persisted_query:{query_hash}")
+
+        if query is None:
+            raise PersistedQueryError(
+                "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"
+            )
+
+        return {**data, "query": query}
+
+    if query_hash != hash_query(query):
+        raise PersistedQueryError(
+            "provided sha does not match query", "INVALID_PERSISTED_QUERY_HASH"
+        )
+
+    persisted_queries.set(f"api:persisted_query:{query_hash}", query, timeout=None)
+
+    return data
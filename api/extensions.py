@@ -0,0 +1,242 @@
+import logging
+import math
+import time
+import typing
+from inspect import isawaitable
+
+from django.conf import settings
+from django.db import connections
+from graphql import ExecutionResult, GraphQLError, GraphQLResolveInfo
+from strawberry.extensions import SchemaExtension
+from strawberry.extensions.tracing.utils import should_skip_tracing
+
+from api.cost import (
+    QueryCostError,
+    check_query_cost,
+    estimate_query_cost,
+    get_client_address,
+    get_cost_budgets,
+)
+from api.documents import get_document_cache, hash_query
+from api.metrics import (
+    OPERATION_DURATION,
+    RESOLVER_DURATION,
+    RESOLVER_QUERIES,
+    RESOLVER_ROWS,
+    QueryCounter,
+    flush_process_metrics,
+    install_query_counter,
+)
+from repository.versioning import DataVersionScope
+
+logger = logging.getLogger(__name__)
+
+
+class PinnedDataVersion(SchemaExtension):
+    """Reads the repository data version once per operation, so the pages and
+    snapshots of all its resolvers are stamped with the same version."""
+
+    def on_operation(self) -> typing.Iterator[None]:
+        with DataVersionScope():
+            yield
+
+
+class CachedDocuments(SchemaExtension):
+    """Serves the parsed and validated documents of the repeated queries from the
+    document cache, skipping both steps."""
+
+    def on_parse(self) -> typing.Iterator[None]:
+        execution_context = self.execution_context
+
+        try:
+            execution_context.graphql_document = get_document_cache().parse(
+                execution_context.query, **execution_context.parse_options  # type: ignore
+            )
+        except GraphQLError:
+            # Let the schema parse the query again and report the syntax error.
+            pass
+
+        yield
+
+    def on_validate(self) -> typing.Iterator[None]:
+        execution_context = self.execution_context
+
+        execution_context.errors = get_document_cache().validate(
+            execution_context.schema._schema,
+            execution_context.query,  # type: ignore
+            execution_context.graphql_document,  # type: ignore
+            execution_context.validation_rules,
+        )
+
+        yield
+
+
+class QueryCostLimiter(SchemaExtension):
+    """Estimates the cost of the validated operations and rejects the ones that
+    exceed the `QUERY_COST` limits before any resolver runs."""
+
+    def on_execute(self) -> typing.Iterator[None]:
+        execution_context = self.execution_context
+
+        cost = estimate_query_cost(
+            execution_context.schema._schema,
+            execution_context.graphql_document,  # type: ignore
+            operation_name=execution_context.operation_name,
+            variables=execution_context.variables,
+        )
+
+        request = getattr(execution_context.context, "request", None)
+        response = getattr(execution_context.context, "response", None)
+
+        try:
+            check_query_cost(
+                cost,
+                max_cost=settings.QUERY_COST["MAX_COST"],
+                client=get_client_address(request) if request is not None else None,
+                budgets=get_cost_budgets(),
+            )
+        except QueryCostError as error:
+            # The schema skips the execution of the operations with a result.
+            execution_context.result = ExecutionResult(
+                data=None, errors=[error.as_graphql_error()]
+            )
+
+            if error.code == "THROTTLED" and response is not None:
+                response.status_code = 429
+                response["Retry-After"] = str(math.ceil(error.extensions["retryAfter"]))
+
+        yield
+
+
+def count_resolved_rows(result: typing.Any) -> int:
+    """Returns the amount of entries of a resolver result, the entries of the
+    paginated results or one for any other value."""
+    for attribute in ["entries", "options"]:
+        if hasattr(result, attribute):
+            result = getattr(result, attribute)
+
+    if isinstance(result, (list, tuple)):
+        return len(result)
+
+    return int(result is not None)
+
+
+class ResolverStats(typing.NamedTuple):
+    """Represents the measures of a resolved field."""
+
+    path: str
+
+    duration: float
+
+    queries: int
+
+    rows: int
+
+
+class ResolverMetrics(SchemaExtension):
+    """Records the wall time, the SQL queries and the returned rows of each field
+    resolver, and the wall time of each operation, tagged by the operation name.
+
+    The operations that take longer than the `SLOW_OPERATION_SECONDS` setting are
+    logged with the measures of each resolver.
+    """
+
+    def on_operation(self) -> typing.Iterator[None]:
+        self.resolver_stats: list[ResolverStats] = []
+        start = time.perf_counter()
+
+        yield
+
+        duration = time.perf_counter() - start
+        operation_name = self.execution_context.operation_name or "anonymous"
+
+        OPERATION_DURATION.observe(duration, operation_name)
+        flush_process_metrics()
+
+        slow_operation_seconds = settings.GRAPHQL_METRICS["SLOW_OPERATION_SECONDS"]
+
+        if slow_operation_seconds is not None and duration >= slow_operation_seconds:
+            logger.warning(
+                "Slow GraphQL operation %s (query %s) took %.1f ms and %d SQL "
+                "queries: %s",
+                operation_name,
+                hash_query(self.execution_context.query or ""),
+                duration * 1000,
+                sum(stats.queries for stats in self.resolver_stats),
+                ", ".join(
+                    f"{stats.path} {stats.duration * 1000:.1f} ms "
+                    f"{stats.queries} queries {stats.rows} rows"
+                    for stats in sorted(
+                        self.resolver_stats,
+                        key=lambda stats: stats.duration,
+                        reverse=True,
+                    )
+                ),
+            )
+
+    def on_execute(self) -> typing.Iterator[None]:
+        self.operation_name = self.execution_context.operation_name or "anonymous"
+
+        # The connections opened before the metrics module was imported do not
+        # count their queries yet.
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+        yield
+
+    def record(
+        self, info: GraphQLResolveInfo, start: float, queries: int, result: typing.Any
+    ) -> None:
+        """Records the measures of a resolved field."""
+        duration = time.perf_counter() - start
+        field = f"{info.parent_type.name}.{info.field_name}"
+        rows = count_resolved_rows(result)
+
+        RESOLVER_DURATION.observe(duration, self.operation_name, field)
+        RESOLVER_QUERIES.observe(queries, self.operation_name, field)
+        RESOLVER_ROWS.observe(rows, self.operation_name, field)
+
+        self.resolver_stats.append(
+            ResolverStats(
+                ".".join(str(key) for key in info.path.as_list()),
+                duration,
+                queries,
+                rows,
+            )
+        )
+
+    async def record_awaitable(
+        self, info: GraphQLResolveInfo, start: float, result: typing.Awaitable
+    ) -> typing.Any:
+        """Awaits the result of an async resolver and records its measures."""
+        # The counter is entered again in the task that awaits the result, since the
+        # async resolvers run after the resolve call returns.
+        with QueryCounter() as query_counter:
+            value = await result
+
+        self.record(info, start, query_counter.count, value)
+
+        return value
+
+    def resolve(
+        self,
+        _next: typing.Callable,
+        root: typing.Any,
+        info: GraphQLResolveInfo,
+        *args: str,
+        **kwargs: typing.Any,
+    ) -> typing.Any:
+        if should_skip_tracing(_next, info):
+            return _next(root, info, *args, **kwargs)
+
+        start = time.perf_counter()
+
+        with QueryCounter() as query_counter:
+            result = _next(root, info, *args, **kwargs)
+
+        if isawaitable(result):
+            return self.record_awaitable(info, start, result)
+
+        self.record(info, start, query_counter.count, result)
+
+        return result
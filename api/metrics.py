@@ -0,0 +1,491 @@
+import bisect
+import contextvars
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import typing
+import uuid
+
+from django.conf import settings
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from api.documents import get_document_cache
+
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"""Represents the upper bounds of the duration histograms buckets, in seconds."""
+
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+"""Represents the upper bounds of the SQL queries histograms buckets."""
+
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+"""Represents the upper bounds of the returned rows histograms buckets."""
+
+OTHER_LABEL = "other"
+"""Represents the label value of the series that exceed the max series of a metric."""
+
+
+def escape_label_value(value: str) -> str:
+    """Returns the given label value escaped for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: typing.Mapping[str, str]) -> str:
+    """Returns the given labels in the Prometheus text format, like `{a="1",b="2"}`."""
+    if not labels:
+        return ""
+
+    return (
+        "{"
+        + ",".join(
+            f'{name}="{escape_label_value(value)}"' for name, value in labels.items()
+        )
+        + "}"
+    )
+
+
+class Histogram:
+    """Represents a Prometheus histogram, with a series for each set of label values.
+
+    The label values usually come from the clients, like the operation names, so
+    the series after the first `max_series` ones are recorded with the
+    `OTHER_LABEL` label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        *,
+        label_names: typing.Sequence[str],
+        buckets: typing.Sequence[float],
+        max_series: int = 1000,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.max_series = max_series
+
+        # Each series has the count of each bucket, then the sum of the values.
+        self.series: dict[tuple[str, ...], list[float]] = {}
+        self.__lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Records a value in the series of the given label values.
+
+        Args:
+            value (float): The observed value.
+            *label_values (str): The value of each label, in the `label_names` order.
+        """
+        bucket = bisect.bisect_left(self.buckets, value)
+
+        with self.__lock:
+            series = self.series.get(label_values)
+
+            if series is None:
+                if len(self.series) >= self.max_series:
+                    label_values = (OTHER_LABEL,) * len(self.label_names)
+
+                series = self.series.setdefault(
+                    label_values, [0] * (len(self.buckets) + 2)
+                )
+
+            # The last bucket is the implicit "+Inf" bucket.
+            series[bucket] += 1
+            series[-1] += value
+
+    def clear(self) -> None:
+        """Removes all the series."""
+        with self.__lock:
+            self.series.clear()
+
+    def collect(self) -> dict[tuple[str, ...], list[float]]:
+        """Returns a copy of the series."""
+        with self.__lock:
+            return {labels: list(values) for labels, values in self.series.items()}
+
+    def render(
+        self, series: typing.Mapping[tuple[str, ...], list[float]] | None = None
+    ) -> typing.Iterator[str]:
+        """Yields the lines of the histogram in the Prometheus text format.
+
+        Args:
+            series (typing.Mapping[tuple[str, ...], list[float]] | None): The
+                series to render, like the series of all the worker processes,
+                the series of this histogram by default.
+        """
+        if series is None:
+            series = self.collect()
+
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+
+        for label_values, values in sorted(series.items()):
+            labels = dict(zip(self.label_names, label_values))
+            cumulative_count = 0
+
+            for upper_bound, count in zip([*self.buckets, "+Inf"], values[:-1]):
+                cumulative_count += count
+                bucket_labels = format_labels({**labels, "le": str(upper_bound)})
+
+                yield f"{self.name}_bucket{bucket_labels} {cumulative_count}"
+
+            yield f"{self.name}_sum{format_labels(labels)} {values[-1]}"
+            yield f"{self.name}_count{format_labels(labels)} {cumulative_count}"
+
+
+OPERATION_DURATION = Histogram(
+    "agrovar_graphql_operation_duration_seconds",
+    "The wall time of the GraphQL operations, from the parsing to the result.",
+    label_names=["operation"],
+    buckets=DURATION_BUCKETS,
+)
+
+RESOLVER_DURATION = Histogram(
+    "agrovar_graphql_resolver_duration_seconds",
+    "The wall time of the GraphQL field resolvers.",
+    label_names=["operation", "field"],
+    buckets=DURATION_BUCKETS,
+)
+
+RESOLVER_QUERIES = Histogram(
+    "agrovar_graphql_resolver_queries",
+    "The amount of SQL queries executed by the GraphQL field resolvers.",
+    label_names=["operation", "field"],
+    buckets=QUERIES_BUCKETS,
+)
+
+RESOLVER_ROWS = Histogram(
+    "agrovar_graphql_resolver_rows",
+    "The amount of entries returned by the GraphQL field resolvers.",
+    label_names=["operation", "field"],
+    buckets=ROWS_BUCKETS,
+)
+
+HISTOGRAMS = [OPERATION_DURATION, RESOLVER_DURATION, RESOLVER_QUERIES, RESOLVER_ROWS]
+"""Represents the histograms served by the metrics endpoint."""
+
+
+# Multiprocess aggregation
+
+EXITED_METRICS_FILE = "exited.json"
+"""Represents the file of the metrics directory that adds up the metrics of the worker
+processes that exited."""
+
+_process_metrics_file: tuple[int, str] | None = None
+_flushed_at = 0.0
+_flush_lock = threading.Lock()
+
+
+def collect_process_metrics() -> dict[str, typing.Any]:
+    """Returns the histogram series and the document cache counters of this process.
+
+    Returns:
+        dict[str, typing.Any]: The metrics, as JSON values.
+    """
+    return {
+        "histograms": {
+            histogram.name: [
+                [list(labels), values] for labels, values in histogram.collect().items()
+            ]
+            for histogram in HISTOGRAMS
+        },
+        "document_cache": dict(get_document_cache().counters),
+    }
+
+
+def get_process_metrics_path(directory: str) -> str:
+    """Returns the file of this process in the metrics directory. The pid is followed
+    by a random suffix, so a worker that reuses the pid of a replaced worker does not
+    overwrite its metrics, and the scrapes fold the files of the exited workers."""
+    global _process_metrics_file
+
+    # The forked workers inherit the file of the master process.
+    if _process_metrics_file is None or _process_metrics_file[0] != os.getpid():
+        _process_metrics_file = (os.getpid(), f"{os.getpid()}-{uuid.uuid4().hex}.json")
+
+    return os.path.join(directory, _process_metrics_file[1])
+
+
+def flush_process_metrics(*, force: bool = False) -> None:
+    """Writes the metrics of this process to the `DIRECTORY` of the `GRAPHQL_METRICS`
+    setting, at most once per `FLUSH_SECONDS` unless forced, so the metrics endpoint
+    of any worker process serves the metrics of all of them.
+
+    Args:
+        force (bool): Whether to write the metrics even if they were just written.
+    """
+    global _flushed_at
+
+    directory = settings.GRAPHQL_METRICS["DIRECTORY"]
+
+    if directory is None:
+        return
+
+    if not force and (
+        time.monotonic() - _flushed_at < settings.GRAPHQL_METRICS["FLUSH_SECONDS"]
+    ):
+        return
+
+    with _flush_lock:
+        _flushed_at = time.monotonic()
+        path = get_process_metrics_path(directory)
+
+        os.makedirs(directory, exist_ok=True)
+        write_metrics_file(path, collect_process_metrics())
+
+
+def write_metrics_file(path: str, metrics: dict[str, typing.Any]) -> None:
+    """Writes the given metrics, as JSON values, to a file of the metrics directory."""
+
+    # The file is replaced at once, so the other processes never read it halfway.
+    with open(f"{path}.tmp", "w") as metrics_file:
+        json.dump(metrics, metrics_file)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def clear_metrics_directory() -> None:
+    """Removes the metrics of the previous server runs from the metrics directory,
+    the metrics of the replaced workers of the current run are kept, since their
+    histograms only grow."""
+    directory = settings.GRAPHQL_METRICS["DIRECTORY"]
+
+    if directory is None:
+        return
+
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def collect_metrics() -> dict[str, typing.Any]:
+    """Returns the metrics of all the processes that write to the metrics directory,
+    added up, or the metrics of this process when the directory is not set.
+
+    Returns:
+        dict[str, typing.Any]: The series of each histogram by name, and the
+        document cache counters.
+    """
+    directory = settings.GRAPHQL_METRICS["DIRECTORY"]
+
+    if directory is None:
+        return {
+            "histograms": {
+                histogram.name: histogram.collect() for histogram in HISTOGRAMS
+            },
+            "document_cache": dict(get_document_cache().counters),
+        }
+
+    flush_process_metrics(force=True)
+
+    metrics: dict[str, typing.Any] = {
+        "histograms": {histogram.name: {} for histogram in HISTOGRAMS},
+        "document_cache": {},
+    }
+    exited_path = os.path.join(directory, EXITED_METRICS_FILE)
+
+    # Only one scrape at a time folds the files of the exited workers, and no scrape
+    # reads them while they are both folded and not yet removed.
+    with open(os.path.join(directory, "metrics.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        paths = sorted(
+            set(glob.glob(os.path.join(directory, "*.json"))) - {exited_path}
+        )
+        exited_paths = [path for path in paths if not is_process_file_alive(path)]
+
+        add_metrics_files(metrics, [exited_path, *exited_paths])
+
+        # The replaced workers would otherwise grow the directory with a file each.
+        if exited_paths:
+            write_metrics_file(
+                exited_path,
+                {
+                    "histograms": {
+                        name: [
+                            [list(labels), values] for labels, values in series.items()
+                        ]
+                        for name, series in metrics["histograms"].items()
+                    },
+                    "document_cache": metrics["document_cache"],
+                },
+            )
+
+            for path in exited_paths:
+                os.remove(path)
+
+        add_metrics_files(metrics, [path for path in paths if path not in exited_paths])
+
+    return metrics
+
+
+def is_process_file_alive(path: str) -> bool:
+    """Returns whether the process that writes the given metrics file is running, the
+    files that are not named after a pid are considered alive."""
+    try:
+        os.kill(int(os.path.basename(path).split("-", 1)[0]), 0)
+    except ValueError:
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process runs as another user.
+        return True
+
+    return True
+
+
+def add_metrics_files(
+    metrics: dict[str, typing.Any], paths: typing.Iterable[str]
+) -> None:
+    """Adds up the metrics of the given files of the metrics directory to the given
+    metrics.
+
+    Args:
+        metrics (dict[str, typing.Any]): The series of each histogram by name, and the
+            document cache counters.
+        paths (typing.Iterable[str]): The metrics files.
+    """
+    histograms = metrics["histograms"]
+    document_cache = metrics["document_cache"]
+
+    for path in paths:
+        try:
+            with open(path) as metrics_file:
+                process_metrics = json.load(metrics_file)
+        except FileNotFoundError:
+            # The directory was cleared meanwhile.
+            continue
+
+        for name, process_series in process_metrics["histograms"].items():
+            series = histograms.setdefault(name, {})
+
+            for labels, values in process_series:
+                total_values = series.setdefault(tuple(labels), [0] * len(values))
+
+                for index, value in enumerate(values):
+                    total_values[index] += value
+
+        for counter, count in process_metrics["document_cache"].items():
+            document_cache[counter] = document_cache.get(counter, 0) + count
+
+
+def render_metrics() -> str:
+    """Returns the histograms and the document cache counters in the Prometheus text
+    format, of all the worker processes when the metrics directory is set.
+
+    Returns:
+        str: The metrics exposition.
+    """
+    metrics = collect_metrics()
+    lines = [
+        line
+        for histogram in HISTOGRAMS
+        for line in histogram.render(metrics["histograms"][histogram.name])
+    ]
+    counters = metrics["document_cache"]
+
+    lines += [
+        "# HELP agrovar_graphql_document_cache_lookups_total The lookups of the "
+        "GraphQL documents cache.",
+        "# TYPE agrovar_graphql_document_cache_lookups_total counter",
+    ]
+
+    for step in ["parse", "validation"]:
+        for result in ["hits", "misses"]:
+            labels = format_labels({"step": step, "result": result})
+            count = counters.get(f"{step}_{result}", 0)
+
+            lines.append(
+                f"agrovar_graphql_document_cache_lookups_total{labels} {count}"
+            )
+
+    lines += [
+        "# HELP agrovar_graphql_document_cache_hit_ratio The hit ratio of the GraphQL "
+        "documents cache.",
+        "# TYPE agrovar_graphql_document_cache_hit_ratio gauge",
+    ]
+
+    for step in ["parse", "validation"]:
+        hits = counters.get(f"{step}_hits", 0)
+        lookups = hits + counters.get(f"{step}_misses", 0)
+        labels = format_labels({"step": step})
+
+        lines.append(
+            f"agrovar_graphql_document_cache_hit_ratio{labels} "
+            f"{hits / lookups if lookups else 0.0}"
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+# SQL queries counting
+
+_query_counter: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar(
+    "query_counter", default=None
+)
+
+
+def count_query(execute, sql, params, many, context):
+    """Counts the executed SQL query in the current query counter, if any."""
+    query_counter = _query_counter.get()
+
+    if query_counter is not None:
+        query_counter[0] += 1
+
+    return execute(sql, params, many, context)
+
+
+class QueryCounter:
+    """Counts the SQL queries executed in the current context, including the ones
+    of the `sync_to_async` threads, that run in a copy of the context.
+
+    The database connections only count the queries once `install_query_counter`
+    wraps them.
+    """
+
+    def __init__(self) -> None:
+        self.__count = [0]
+        self.__token: contextvars.Token | None = None
+
+    @property
+    def count(self) -> int:
+        """Returns the amount of counted queries."""
+        return self.__count[0]
+
+    def __enter__(self) -> "QueryCounter":
+        self.__token = _query_counter.set(self.__count)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _query_counter.reset(self.__token)  # type: ignore
+
+
+def install_query_counter(connection: BaseDatabaseWrapper) -> None:
+    """Wraps the queries of the given connection with the query counter."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@receiver(connection_created, dispatch_uid="api.metrics.install_query_counter")
+def on_connection_created(sender, connection: BaseDatabaseWrapper, **kwargs) -> None:
+    install_query_counter(connection)
@@ -1,9 +1,16 @@
+import functools
+import hashlib
+import hmac
 import json
 import typing
-from base64 import b64decode, b64encode
+from base64 import b64decode, urlsafe_b64decode, urlsafe_b64encode
 
+from django.conf import settings
 from django.db import models
 
+from api.cache import get_page_cache
+from repository.versioning import get_data_version
+
 type ModelType = type[models.Model]
 
 
@@ -11,6 +18,24 @@ MAX_SEARCH_LIMIT = 1000
 """Represents the max search limit for all query."""
 
 
+def check_search_limit(search_limit: int) -> None:
+    """Checks that a search limit is between 1 and the `MAX_SEARCH_LIMIT`.
+
+    Args:
+        search_limit (int): An integer number that limits the entries to serve.
+
+    Raises:
+        ValueError: When the search limit is out of bounds.
+    """
+    if search_limit < 1:
+        raise ValueError("Cannot query less than 1 entry at a time.")
+
+    if search_limit > MAX_SEARCH_LIMIT:
+        raise ValueError(
+            f"Cannot query more than {MAX_SEARCH_LIMIT} entries at a time."
+        )
+
+
 class Filter(typing.TypedDict):
     """Represents a filtration method for the pagination system."""
 
@@ -31,26 +56,73 @@ class Cursor(typing.TypedDict):
     """Represents a query filtration parameter."""
 
 
+class CursorPlan(typing.NamedTuple):
+    """Represents the compiled validation and translation of a cursor shape."""
+
+    filter_type: str | None
+    """Represents the filtration method of the cursor filters."""
+
+    filter_lookups: tuple[tuple[str, str], ...]
+    """Represents the cursor key and the django lookup of each filter."""
+
+
 class Pagination:
 
     CURSOR_FIELDS = ["id"]
 
     CURSOR_FILTERS = ["select_related"]
-    CURSOR_LOOKUPS = ["location_origin__id", "crop_variety__id"]
+    CURSOR_LOOKUPS: dict[str, type] = {
+        "location_origin__id": int,
+        "crop_variety__id": int,
+        "paper_creation_year__year__gte": int,
+        "paper_creation_year__year__lte": int,
+        "reference": str,
+    }
+    """Represents the lookups that a cursor can filter by, and the type of their value."""
 
     @staticmethod
-    def hash(cursor: str) -> str:
+    def hash(
+        cursor: str | Cursor,
+        *,
+        model: typing.Type[ModelType],
+        limit: int,
+        **options,
+    ) -> str:
         """This method generate a hash with the given cursor that will
         be used to dynamicly cache all paginated queries.
 
+        The hash is built with the decoded cursor, so equivalent cursors share the
+        same hash, and with the current data version, so the hashes of the pages
+        change each time the repository data changes.
+
         Args:
-            cursor (str): A encoded cursor.
+            cursor (str | Cursor): A encoded cursor, or a cursor already decoded
+                so its signature is not verified twice.
+            model (typing.Type[ModelType]): The queried model.
+            limit (int): The page search limit.
+            **options: Any other parameter that changes the resolved page.
 
         Returns:
             str: A hash.
         """
+        decoded_cursor = (
+            Pagination.decode_cursor(cursor) if isinstance(cursor, str) else cursor
+        )
 
-        raise NotImplementedError("This method has not been implemented yet")
+        page_key = json.dumps(
+            [
+                model._meta.label,
+                get_data_version(),
+                decoded_cursor,
+                Pagination.translate_filters(decoded_cursor),
+                limit,
+                options,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+
+        return hashlib.sha256(page_key.encode("utf-8")).hexdigest()
 
     @staticmethod
     def is_cached(hash: str) -> bool:
@@ -62,7 +134,7 @@ class Pagination:
         Returns:
             bool: True if the hash has been cached.
         """
-        raise NotImplementedError("This method has not been implemented yet")
+        return get_page_cache().contains(hash)
 
     @staticmethod
     def __is_field_filter(key: str) -> bool:
@@ -77,7 +149,7 @@ class Pagination:
         if not key.__contains__("__"):
             return False
 
-        field_namespace = key.split("__", 2)
+        field_namespace = key.split("__", 1)
 
         if field_namespace[1] == "":
             return False
@@ -103,15 +175,58 @@ class Pagination:
         return (key == "" or key == " ") or key in Pagination.CURSOR_FIELDS
 
     @staticmethod
-    def __is_valid_filter(lookup: str) -> bool:
-        """Check if the given lookup is valid.
+    def __is_valid_filter(lookup: str, value: typing.Any) -> bool:
+        """Check if the given value has the type expected by the given lookup.
 
         Args:
-            lookup (str): A stringified dictionary with a django lookup expression.
+            lookup (str): A django lookup expression.
+            value (typing.Any): The lookup value.
 
         Returns:
-            bool: True if its a valid lookup, False otherwise.
+            bool: True if its a valid lookup value, False otherwise.
         """
+        value_type = Pagination.CURSOR_LOOKUPS.get(lookup, int)
+
+        return isinstance(value, value_type) and not isinstance(value, bool)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def compile_cursor_shape(cursor_shape: tuple[str, ...]) -> CursorPlan | None:
+        """Validates the keys of a cursor and compiles the lookups of its filters. The
+        plans are memoized, so each cursor shape is only walked once.
+
+        Args:
+            cursor_shape (tuple[str, ...]): The sorted keys of a decoded cursor.
+
+        Returns:
+            CursorPlan | None: The cursor plan, or None when the cursor is not valid.
+        """
+        if "id" not in cursor_shape:
+            return None
+
+        filter_types: set[str] = set()
+        filter_lookups: list[tuple[str, str]] = []
+
+        for key in cursor_shape:
+            if Pagination.__is_valid_field(key):
+                continue
+
+            if not Pagination.__is_field_filter(key):
+                return None
+
+            filter_type, filter_lookup = key.split("__", 1)
+
+            filter_types.add(filter_type)
+            filter_lookups.append((key, filter_lookup))
+
+        # All the filters of a cursor are combined in a single search.
+        if len(filter_types) > 1:
+            return None
+
+        return CursorPlan(
+            filter_type=filter_types.pop() if filter_types else None,
+            filter_lookups=tuple(filter_lookups),
+        )
 
     @staticmethod
     def check_valid_cursor(cursor: Cursor) -> bool:
@@ -123,22 +238,24 @@ class Pagination:
         Returns:
             bool: Returns True if all the dictionary fields are valid.
         """
+        if not isinstance(cursor, dict):
+            return False
 
-        # NOTE []: This validation process can be improve using a cache system.
+        cursor_plan = Pagination.compile_cursor_shape(tuple(sorted(cursor)))
 
-        valid_keys = [
-            True
-            or Pagination.__is_field_filter(key)
-            or Pagination.__is_valid_field(key)
-            for key in cursor
-        ]
+        if cursor_plan is None:
+            return False
 
-        return all(valid_keys)
+        return Pagination.__is_valid_filter("id", cursor["id"]) and all(
+            Pagination.__is_valid_filter(lookup, cursor[key])  # type: ignore
+            for key, lookup in cursor_plan.filter_lookups
+        )
 
     @staticmethod
     def translate_filters(cursor: Cursor) -> Filter | None:
         """This method translates the given cursor returning a dictionary
-        with the translated filters anf the original value.
+        with the translated filters anf the original value. All the filters
+        of the cursor are combined in the same filter dictionary.
 
         Example:
             >>> Pagination.translate_filters({"id":0,"select_related__<lookup>":<value>})
@@ -154,39 +271,33 @@ class Pagination:
         if not Pagination.check_valid_cursor(cursor):
             raise ValueError("Cannot translate an invalid cursor.")
 
-        # Define an empty cursor by default.
-        filters: Filter = {"type": "", "filter": {"": ""}}
-
-        for __field in cursor:
-            filter_namespace = __field.split("__", 1)
-
-            # Continue when the namespace does not container a prefix.
-            if len(filter_namespace) == 1:
-                continue
-
-            filter_type = filter_namespace[0]
-            filter_lookup = filter_namespace[1]
-            filter_lookup_value = cursor.get(__field)
-
-            filters.update(
-                {"type": filter_type, "filter": {filter_lookup: filter_lookup_value}}
-            )
+        cursor_plan = Pagination.compile_cursor_shape(tuple(sorted(cursor)))
 
         # Return none if there is no any filters.
-        if filters["type"] == "":
+        if cursor_plan is None or cursor_plan.filter_type is None:
             return None
 
-        return filters
+        return {
+            "type": cursor_plan.filter_type,
+            "filter": {
+                lookup: cursor[key]  # type: ignore
+                for key, lookup in cursor_plan.filter_lookups
+            },
+        }
 
     @staticmethod
     def encode_cursor(cursor: Cursor) -> str:
-        """Returns an encoded stringified cursor in base 64.
+        """Returns an encoded cursor in the compact signed format.
+
+        The cursor is packed as the format version, the id and each filter lookup code
+        with its value, followed by its truncated HMAC signature, and then encoded in
+        URL safe base 64.
 
         Args:
             cursor (Cursor): A dictionary with the pagination metadata
 
         Returns:
-            str: Returns a stringified dictionary in base 64.
+            str: Returns the packed cursor in URL safe base 64.
 
         Raises:
             ValueError: When the cursor argument were not a valid cursor dictionary.
@@ -194,35 +305,161 @@ class Pagination:
         if not Pagination.check_valid_cursor(cursor):
             raise ValueError("The parameter 'cursor' is not a valid cursor dictionary.")
 
-        serialized_json = json.dumps(cursor).encode("utf-8")
-        encoded_cursor = b64encode(serialized_json).decode("utf-8")
+        cursor_plan = Pagination.compile_cursor_shape(tuple(sorted(cursor)))
+        lookup_codes = list(Pagination.CURSOR_LOOKUPS)
+
+        packed_cursor = bytearray([CURSOR_FORMAT_VERSION])
+        pack_value(packed_cursor, cursor["id"])
+
+        for key, lookup in cursor_plan.filter_lookups:  # type: ignore
+            packed_cursor.append(lookup_codes.index(lookup))
+            pack_value(packed_cursor, cursor[key])  # type: ignore
+
+        packed_cursor += sign_cursor(packed_cursor)
 
-        return encoded_cursor
+        return urlsafe_b64encode(packed_cursor).rstrip(b"=").decode("ascii")
 
     @staticmethod
     def decode_cursor(cursor: str) -> Cursor:
         """Returs a decoded cursor in a dictionary.
 
+        The cursors in the legacy format, a JSON dictionary in base 64, are accepted
+        while the `CURSORS["ACCEPT_LEGACY"]` setting is enabled.
+
         Args:
-            cursor (str): A stringified cursor in base 64.
+            cursor (str): An encoded cursor.
 
         Returns:
             Cursor: A decoded cursor built with the deserilized string.
 
         Raises:
-            ValueError: When the cursor argument were not a valid cursor dictionary.
+            ValueError: When the cursor argument were not a valid cursor dictionary,
+                or its signature does not match.
         """
-        decoded_cursor = b64decode(cursor.encode("utf-8")).decode("utf-8")
-        deserialized_json = json.loads(decoded_cursor)
+        if cursor.startswith(LEGACY_CURSOR_PREFIX):
+            if not settings.CURSORS["ACCEPT_LEGACY"]:
+                raise ValueError("The legacy cursors are not accepted anymore.")
 
-        if not Pagination.check_valid_cursor(deserialized_json):
-            raise ValueError("The parameter 'cursor' is not a valid cursor dictionary.")
+            decoded_cursor = b64decode(cursor.encode("utf-8")).decode("utf-8")
+            deserialized_json = json.loads(decoded_cursor)
+
+            if not Pagination.check_valid_cursor(deserialized_json):
+                raise ValueError(
+                    "The parameter 'cursor' is not a valid cursor dictionary."
+                )
+
+            return deserialized_json
+
+        packed_cursor = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = packed_cursor[:-CURSOR_SIGNATURE_SIZE]
+        signature = packed_cursor[-CURSOR_SIGNATURE_SIZE:]
+
+        if not hmac.compare_digest(sign_cursor(payload), signature):
+            raise ValueError("The parameter 'cursor' has an invalid signature.")
 
-        return deserialized_json
+        if payload[:1] != bytes([CURSOR_FORMAT_VERSION]):
+            raise ValueError("The parameter 'cursor' has an unknown format version.")
+
+        lookup_codes = list(Pagination.CURSOR_LOOKUPS)
+
+        try:
+            cursor_id, offset = unpack_value(payload, 1, int)
+            decoded: dict[str, typing.Any] = {"id": cursor_id}
+
+            while offset < len(payload):
+                lookup = lookup_codes[payload[offset]]
+                value, offset = unpack_value(
+                    payload, offset + 1, Pagination.CURSOR_LOOKUPS[lookup]
+                )
+                decoded[f"select_related__{lookup}"] = value
+        except (IndexError, UnicodeDecodeError) as error:
+            raise ValueError("The parameter 'cursor' is malformed.") from error
+
+        return decoded  # type: ignore
+
+
+# Compact cursor format
+
+
+CURSOR_FORMAT_VERSION = 1
+"""Represents the version of the compact cursor format."""
+
+CURSOR_SIGNATURE_SIZE = 12
+"""Represents the size in bytes of the truncated cursor signature."""
+
+LEGACY_CURSOR_PREFIX = "eyJ"
+"""Represents the prefix of the legacy cursors, a JSON dictionary in base 64."""
+
+
+@functools.lru_cache(maxsize=4)
+def get_cursor_signing_key(secret_key: str) -> bytes:
+    """Returns the key that signs the cursors, derived from the given secret key."""
+    return hashlib.sha256(f"api.pagination.cursor:{secret_key}".encode("utf-8")).digest()
+
+
+def sign_cursor(payload: bytes | bytearray) -> bytes:
+    """Returns the truncated HMAC-SHA256 signature of the given cursor payload."""
+    signing_key = get_cursor_signing_key(settings.SECRET_KEY)
+
+    return hmac.digest(signing_key, payload, "sha256")[:CURSOR_SIGNATURE_SIZE]
+
+
+def pack_value(buffer: bytearray, value: int | str) -> None:
+    """Appends the given value to the buffer, the integers as zigzag varints and the
+    strings as their varint length followed by their UTF-8 bytes."""
+    if isinstance(value, str):
+        encoded_value = value.encode("utf-8")
+        pack_value(buffer, len(encoded_value))
+        buffer += encoded_value
+        return
+
+    value = value << 1 if value >= 0 else (-value << 1) - 1
+
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    buffer.append(value)
+
+
+def unpack_value(
+    buffer: bytes, offset: int, value_type: type
+) -> tuple[typing.Any, int]:
+    """Reads a value of the given type packed at the given offset of the buffer.
+
+    Returns:
+        tuple[typing.Any, int]: The value and the offset of the next value.
+    """
+    if value_type is str:
+        length, offset = unpack_value(buffer, offset, int)
+
+        if offset + length > len(buffer):
+            raise IndexError("The packed string exceeds the buffer.")
+
+        return buffer[offset : offset + length].decode("utf-8"), offset + length
+
+    value = 0
+    shift = 0
+
+    while True:
+        byte = buffer[offset]
+        value |= (byte & 0x7F) << shift
+        offset += 1
+        shift += 7
+
+        if byte < 0x80:
+            break
+
+    return (value >> 1 if value & 1 == 0 else -((value + 1) >> 1)), offset
 
 
 def resolve_cursor(
-    *, search_limit: int, encoded_cursor: str, model: typing.Type[ModelType]
+    *,
+    search_limit: int,
+    encoded_cursor: str,
+    model: typing.Type[ModelType],
+    related_fields: typing.Sequence[str] = (),
+    only_fields: typing.Sequence[str] = (),
 ) -> tuple[list[ModelType], str]:
     """This function is responsable of resolve the encoded cursor and return a list of
     specific entries.
@@ -231,60 +468,123 @@ def resolve_cursor(
         search_limit (int): An integer number that limits the entries to serve.
         encoded_cursor (str): A cursor that is incoded in base 64.
         model (typing.Type[_ModelType]): A model to be queried.
+        related_fields (typing.Sequence[str]): Foreign keys joined in the same query.
+        only_fields (typing.Sequence[str]): Columns to load, all of them when empty.
 
     Returns:
         tuple[list[_ModelType], str]: A tuple with the queried entries and the next cursor.
     """
 
-    # Check if the search limit exceeds the maximun search limit and raise an error if it happens.
-    if search_limit > MAX_SEARCH_LIMIT:
-        raise ValueError(
-            f"Cannot query more than {MAX_SEARCH_LIMIT} entries at a time."
-        )
+    # Check if the search limit is out of bounds and raise an error if it happens.
+    check_search_limit(search_limit)
 
     # Use a default cursor if the client does not provides ones.
     if encoded_cursor == "":
-        encoded_cursor = "eyJpZCI6MX0="  # That represents this -> {"id":1}
+        encoded_cursor = Pagination.encode_cursor({"id": 1})  # type: ignore
 
+    # The cursor signature is verified once, for the page hash and the query.
     cursor = Pagination.decode_cursor(encoded_cursor)
 
+    page_cache = get_page_cache()
+    page_hash = Pagination.hash(
+        cursor,
+        model=model,
+        limit=search_limit,
+        related_fields=related_fields,
+        only_fields=only_fields,
+    )
+
+    # Serve the page from the cache when it has been already resolved.
+    cached_page = page_cache.get(page_hash)
+
+    if cached_page is not None:
+        return cached_page
+
     cursor_indexation = cursor.get("id")
     cursor_filters = Pagination.translate_filters(cursor)
 
-    retrieved_entries: list[ModelType] = []
+    # Build a keyset query: "WHERE id >= ? ORDER BY id LIMIT ?", the extra entry is
+    # only fetched to know if there is a next page and where it starts.
+    queryset = model.objects.filter(id__gte=cursor_indexation)
 
-    # Perform the query using default search parameters.
-    if cursor_filters == None:
-        retrieved_entries = [
-            entry for entry in model.objects.filter(id__gte=cursor_indexation)
-        ]
+    # Join the related entries to avoid one extra query per entry and foreign key.
+    if related_fields:
+        queryset = queryset.select_related(*related_fields)
 
-    # Perform the query using search filters parameters.
-    else:
+    # Load only the columns that are going to be served.
+    if only_fields:
+        queryset = queryset.only(*only_fields)
+
+    # Apply the search filters parameters.
+    if cursor_filters != None:
         match cursor_filters["type"]:
             case "select_related":
-                retrieved_entries = [
-                    entry
-                    for entry in model.objects.filter(id__gte=cursor_indexation).filter(
-                        **cursor_filters["filter"]
-                    )
-                ]
-
-    # Send and empty list when no items were retrieved.
-    if len(retrieved_entries) == 0:
-        return [], None
-
-    # Send all items without a trailing cursor when there less items than the limit.
-    if len(retrieved_entries) < search_limit:
+                queryset = queryset.filter(**cursor_filters["filter"])
+
+    retrieved_entries: list[ModelType] = list(
+        queryset.order_by("id")[: search_limit + 1]
+    )
+
+    # Send all items without a trailing cursor when there is no more items than the limit.
+    if len(retrieved_entries) <= search_limit:
+        page_cache.set(page_hash, (retrieved_entries, None))
+
         return retrieved_entries, None
 
-    # When the retrieved items count exceeds the limit, send a portion of this and a cursor.
-    else:
-        paginated_entries = retrieved_entries[: search_limit + 1]
+    # When the retrieved items count exceeds the limit, the last one targets the next page.
+    next_cursor_target = retrieved_entries.pop(-1)
+    next_cursor_target_with_id = next_cursor_target.id  # type: ignore
+
+    # Keep the cursor filters so the next page is resolved with the same search.
+    next_cursor = Pagination.encode_cursor({**cursor, "id": next_cursor_target_with_id})
+
+    page_cache.set(page_hash, (retrieved_entries, next_cursor))
+
+    return retrieved_entries, next_cursor
+
+
+def iterate_cursor_chunks(
+    *,
+    encoded_cursor: str,
+    model: typing.Type[ModelType],
+    fields: typing.Sequence[str],
+    chunk_size: int,
+) -> typing.Iterator[list[tuple]]:
+    """This function iterates all the entries that match the encoded cursor, from its
+    target entry until the last one, querying them in keyset chunks so only one chunk
+    is loaded in memory at a time.
+
+    Args:
+        encoded_cursor (str): A cursor that is incoded in base 64.
+        model (typing.Type[ModelType]): A model to be queried.
+        fields (typing.Sequence[str]): The columns of each entry, the id is always
+            the first value.
+        chunk_size (int): The amount of entries per query.
+
+    Yields:
+        list[tuple]: The id and the requested columns of the entries of each
+        chunk, the chunks are never empty.
+    """
+    if encoded_cursor == "":
+        encoded_cursor = Pagination.encode_cursor({"id": 1})  # type: ignore
+
+    cursor = Pagination.decode_cursor(encoded_cursor)
+    cursor_filters = Pagination.translate_filters(cursor)
+
+    queryset = model.objects.order_by("id").values_list("id", *fields)
+
+    if cursor_filters != None:
+        queryset = queryset.filter(**cursor_filters["filter"])
+
+    last_entry_id = cursor["id"] - 1
+
+    while True:
+        chunk = list(queryset.filter(id__gt=last_entry_id)[:chunk_size])
 
-        next_cursor_target = paginated_entries.pop(-1)
-        next_cursor_target_with_id = next_cursor_target.id  # type: ignore
+        if chunk:
+            yield chunk
 
-        next_cursor = Pagination.encode_cursor({"id": next_cursor_target_with_id})
+        if len(chunk) < chunk_size:
+            return
 
-        return paginated_entries, next_cursor
+        last_entry_id = chunk[-1][0]
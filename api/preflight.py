@@ -0,0 +1,244 @@
+import dataclasses
+import json
+import threading
+import typing
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.dispatch import receiver
+from strawberry.utils.str_converters import to_camel_case
+
+from api.pagination import Pagination, check_search_limit
+from api.schemas.campaign_types import CampaignDocumentOptionType
+from api.schemas.location_types import LocationOptionsType
+from api.schemas.variety_types import VarietyOptionsType
+from repository import models
+from repository.versioning import data_changed, get_data_version
+
+type PreflightEntry = VarietyOptionsType | LocationOptionsType | CampaignDocumentOptionType
+
+
+@dataclasses.dataclass(frozen=True)
+class PreflightOptions:
+    """Represents the first entries of one of the preflight options, sorted by id."""
+
+    entries: list[PreflightEntry]
+    """Represents the resolved entries."""
+
+    entries_ids: list[int]
+    """Represents the ids of the entries, used to locate the cursors."""
+
+    is_complete: bool
+    """Represents whether the entries are all the entries of the table."""
+
+    def paginate(
+        self, *, search_limit: int, encoded_cursor: str
+    ) -> tuple[list[PreflightEntry], str | None] | None:
+        """Resolves a page of entries from memory, behaving like `resolve_cursor`.
+
+        Args:
+            search_limit (int): An integer number that limits the entries to serve.
+            encoded_cursor (str): A cursor that is incoded in base 64.
+
+        Returns:
+            tuple[list[PreflightEntry], str | None] | None: A tuple with the page entries
+            and the next cursor, or None when the page cannot be served from memory.
+        """
+        check_search_limit(search_limit)
+
+        cursor: typing.Any = {"id": 1}
+
+        if encoded_cursor != "":
+            cursor = Pagination.decode_cursor(encoded_cursor)
+
+        # The filtered searches are always resolved by the database.
+        if Pagination.translate_filters(cursor) != None:
+            return None
+
+        page_start = bisect_left(self.entries_ids, cursor["id"])
+        page_end = page_start + search_limit
+
+        # The requested page exceeds the entries loaded in memory.
+        if not self.is_complete and page_end >= len(self.entries):
+            return None
+
+        page_entries = self.entries[page_start:page_end]
+
+        if page_end >= len(self.entries):
+            return page_entries, None
+
+        next_cursor = Pagination.encode_cursor(
+            {**cursor, "id": self.entries_ids[page_end]}
+        )
+
+        return page_entries, next_cursor
+
+
+@dataclasses.dataclass(frozen=True)
+class PreflightSnapshot:
+    """Represents the preflight options resolved at a specific data version."""
+
+    version: int
+    """Represents the repository data version of the snapshot."""
+
+    variety_options: PreflightOptions
+
+    location_options: PreflightOptions
+
+    campaign_options: PreflightOptions
+
+    payload: bytes
+    """Represents the snapshot options serialized as JSON."""
+
+
+def build_preflight_options(
+    entries: typing.Iterable[PreflightEntry], max_entries: int
+) -> PreflightOptions:
+    """Builds the preflight options with the first `max_entries` of the given entries.
+
+    Args:
+        entries (typing.Iterable[PreflightEntry]): The entries sorted by id, with one more
+            entry than `max_entries` when the table has more entries.
+        max_entries (int): The max amount of entries to keep in memory.
+
+    Returns:
+        PreflightOptions: The preflight options.
+    """
+    loaded_entries = list(entries)
+
+    return PreflightOptions(
+        entries=loaded_entries[:max_entries],
+        entries_ids=[entry.id for entry in loaded_entries[:max_entries]],
+        is_complete=len(loaded_entries) <= max_entries,
+    )
+
+
+def build_preflight_snapshot(version: int) -> PreflightSnapshot:
+    """Queries the preflight options and builds a new snapshot.
+
+    Args:
+        version (int): The data version read before querying the options.
+
+    Returns:
+        PreflightSnapshot: The built snapshot.
+    """
+    max_entries = settings.PREFLIGHT_SNAPSHOT["MAX_ENTRIES"]
+
+    variety_options = build_preflight_options(
+        (
+            VarietyOptionsType(**entry)
+            for entry in models.VarietyOptionsModel.objects.order_by("id").values(
+                "id", "tradename", "variant_name"
+            )[: max_entries + 1]
+        ),
+        max_entries,
+    )
+
+    location_options = build_preflight_options(
+        (
+            LocationOptionsType(**entry)
+            for entry in models.LocationOptionsModel.objects.order_by("id").values(
+                "id", "region_name"
+            )[: max_entries + 1]
+        ),
+        max_entries,
+    )
+
+    campaign_options = build_preflight_options(
+        (
+            CampaignDocumentOptionType(
+                id=entry["id"],
+                reference=entry["reference"],
+                location_origin=entry["location_origin__region_name"],
+                date_origin=entry["paper_creation_year"],
+                crop_variant=entry["crop_variety__variant_name"],
+            )
+            for entry in models.CampaignDocumentsModel.objects.order_by("id").values(
+                "id",
+                "reference",
+                "location_origin__region_name",
+                "paper_creation_year",
+                "crop_variety__variant_name",
+            )[: max_entries + 1]
+        ),
+        max_entries,
+    )
+
+    payload = json.dumps(
+        {
+            "version": str(version),
+            "varietyOptions": serialize_entries(variety_options.entries),
+            "locationOptions": serialize_entries(location_options.entries),
+            "campaignOptions": serialize_entries(campaign_options.entries),
+        },
+        default=str,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+    return PreflightSnapshot(
+        version=version,
+        variety_options=variety_options,
+        location_options=location_options,
+        campaign_options=campaign_options,
+        payload=payload,
+    )
+
+
+def serialize_entries(entries: list[PreflightEntry]) -> list[dict[str, typing.Any]]:
+    """Returns the given entries as dictionaries with the GraphQL field names."""
+    return [
+        {to_camel_case(key): value for key, value in dataclasses.asdict(entry).items()}
+        for entry in entries
+    ]
+
+
+_snapshot: PreflightSnapshot | None = None
+
+_snapshot_lock = threading.Lock()
+
+
+def get_preflight_snapshot() -> PreflightSnapshot:
+    """Returns the preflight snapshot of the current data version, building it
+    when it does not exist or is outdated.
+
+    Returns:
+        PreflightSnapshot: The current preflight snapshot.
+    """
+    global _snapshot
+
+    snapshot = _snapshot
+
+    if snapshot is not None and snapshot.version == get_data_version():
+        return snapshot
+
+    # Only one thread builds the snapshot, the others wait and reuse it.
+    with _snapshot_lock:
+        version = get_data_version()
+
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = build_preflight_snapshot(version)
+
+        return _snapshot
+
+
+def rebuild_preflight_snapshot() -> None:
+    """Rebuilds the preflight snapshot in a background thread."""
+
+    def rebuild() -> None:
+        try:
+            get_preflight_snapshot()
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=rebuild, name="preflight-snapshot", daemon=True).start()
+
+
+@receiver(data_changed, dispatch_uid="api_preflight_snapshot_rebuild")
+def on_data_changed(sender, **kwargs) -> None:
+    """Schedules the rebuild of the preflight snapshot once the change is committed."""
+
+    if _snapshot is None or not settings.PREFLIGHT_SNAPSHOT["BACKGROUND_REBUILD"]:
+        return
+
+    transaction.on_commit(rebuild_preflight_snapshot)
@@ -0,0 +1,134 @@
+import dataclasses
+import typing
+
+from strawberry import types
+from strawberry.types.nodes import SelectedField, Selection
+from strawberry.utils.str_converters import to_snake_case
+
+type FieldColumns = dict[str, str]
+
+CAMPAIGN_DOCUMENT_COLUMNS: FieldColumns = {
+    "id": "id",
+    "reference": "reference",
+    "paper_type": "paper_type",
+    "paper_creation_year": "paper_creation_year",
+    "location_origin": "location_origin__region_name",
+    "latitude": "latitude",
+    "longitude": "longitude",
+    "paper_repetition": "paper_repetition",
+    "crop_variety": "crop_variety__variant_name",
+    "humidity_percentage_stat": "humidity_percentage_stat",
+    "performance_stat": "performance_stat",
+    "relative_performance_stat": "relative_performance_stat",
+    "grain_count_crop_stat": "grain_count_crop_stat",
+    "grain_count_per_spike_stat": "grain_count_per_spike_stat",
+    "weight_per_thousand_grains_stat": "weight_per_thousand_grains_stat",
+    "proteins_percentage_stat": "proteins_percentage_stat",
+    "ph_stat": "ph_stat",
+}
+"""Represents the model column that resolves each CampaignDocumentType field."""
+
+CAMPAIGN_DOCUMENT_OPTION_COLUMNS: FieldColumns = {
+    "id": "id",
+    "reference": "reference",
+    "location_origin": "location_origin__region_name",
+    "date_origin": "paper_creation_year",
+    "crop_variant": "crop_variety__variant_name",
+}
+"""Represents the model column that resolves each CampaignDocumentOptionType field."""
+
+
+def iter_selected_fields(
+    selections: typing.Iterable[Selection],
+) -> typing.Iterator[SelectedField]:
+    """Yields the selected fields, including the fields selected through fragments,
+    except the selections excluded by the `@skip` and `@include` directives."""
+    for selection in selections:
+        if selection.directives.get("skip", {}).get("if") is True:
+            continue
+
+        if selection.directives.get("include", {}).get("if") is False:
+            continue
+
+        if isinstance(selection, SelectedField):
+            yield selection
+        else:
+            yield from iter_selected_fields(selection.selections)
+
+
+class Projection(typing.NamedTuple):
+    """Represents the columns that a query selection needs."""
+
+    field_columns: FieldColumns
+    """Represents the model column of each selected field."""
+
+    only_fields: tuple[str, ...]
+    """Represents the model columns to load."""
+
+    related_fields: tuple[str, ...]
+    """Represents the foreign keys to join."""
+
+    def build_entry[T](self, entry_type: typing.Callable[..., T], entry: typing.Any) -> T:
+        """Builds an entry of the given type with the selected fields of a model entry,
+        the fields that were not selected are never resolved, so they are left empty.
+
+        Args:
+            entry_type (typing.Callable[..., T]): A strawberry type.
+            entry (typing.Any): A model entry loaded with the projection columns.
+
+        Returns:
+            T: The strawberry type entry.
+        """
+        entry_fields = {
+            field.name: None
+            for field in dataclasses.fields(entry_type)  # type: ignore
+            if field.init
+        }
+
+        for field, column in self.field_columns.items():
+            value = entry
+
+            for attribute in column.split("__"):
+                value = getattr(value, attribute)
+
+            entry_fields[field] = value
+
+        return entry_type(**entry_fields)
+
+
+def project_selection(
+    info: types.Info, entries_field: str, field_columns: FieldColumns
+) -> Projection:
+    """Returns the columns needed to resolve the fields selected inside the given
+    entries field of the current resolver.
+
+    Args:
+        info (types.Info): The resolver info.
+        entries_field (str): The python name of the field that wraps the entries.
+        field_columns (FieldColumns): The model column of each entry field.
+
+    Returns:
+        Projection: The columns of the selected fields, always including the id.
+    """
+    selected_columns: FieldColumns = {"id": field_columns["id"]}
+
+    for wrapper_field in iter_selected_fields(info.selected_fields):
+        for field in iter_selected_fields(wrapper_field.selections):
+            if to_snake_case(field.name) != entries_field:
+                continue
+
+            for entry_field in iter_selected_fields(field.selections):
+                entry_field_name = to_snake_case(entry_field.name)
+
+                if entry_field_name in field_columns:
+                    selected_columns[entry_field_name] = field_columns[entry_field_name]
+
+    columns = sorted(set(selected_columns.values()))
+
+    return Projection(
+        field_columns=selected_columns,
+        only_fields=tuple(columns),
+        related_fields=tuple(
+            sorted({column.split("__")[0] for column in columns if "__" in column})
+        ),
+    )
@@ -3,46 +3,94 @@ import typing
 from datetime import date
 
 import strawberry
+from django.conf import settings
 from strawberry import types
 
-from api.pagination import resolve_cursor
-from api.schemas.campaign_types import CampaignDocumentType
+from api.aggregation import GROUP_FIELDS, aggregate_campaign_statistics
+from api.analytics import get_columnar_snapshot
+from api.concurrency import run_in_database_pool
+from api.extensions import (
+    CachedDocuments,
+    PinnedDataVersion,
+    QueryCostLimiter,
+    ResolverMetrics,
+)
+from api.pagination import Pagination, check_search_limit, resolve_cursor
+from api.preflight import PreflightSnapshot, get_preflight_snapshot
+from api.projection import (
+    CAMPAIGN_DOCUMENT_COLUMNS,
+    CAMPAIGN_DOCUMENT_OPTION_COLUMNS,
+    project_selection,
+)
+from api.schemas.campaign_types import (
+    CampaignDocumentOptionType,
+    CampaignDocumentsFilterInput,
+    CampaignDocumentType,
+)
 from api.schemas.location_types import LocationOptionsType
 from api.schemas.pagination_types import PaginationMetaType
+from api.schemas.spatial_types import (
+    CampaignClusterType,
+    CampaignDocumentsInViewportType,
+    NearbyCampaignDocumentType,
+    ViewportInput,
+)
+from api.schemas.statistics_types import (
+    CampaignPercentilesType,
+    CampaignRankingType,
+    CampaignStat,
+    CampaignStatisticsType,
+    StatisticsGroup,
+)
 from api.schemas.variety_types import VarietyOptionsType
+from api.spatial import get_spatial_index, load_campaign_documents
 from repository import models
 
 # Query field resolvers
 
 
+def apply_search_filters(
+    cursor: str, filters: typing.Optional[CampaignDocumentsFilterInput]
+) -> str:
+    """Returns the cursor of the first page of the filtered search when the client does
+    not provide a cursor, the next cursors already carry the search filters.
+
+    Args:
+        cursor (str): A cursor that is incoded in base 64.
+        filters (typing.Optional[CampaignDocumentsFilterInput]): The search filters.
+
+    Returns:
+        str: The cursor of the page to resolve.
+    """
+    if cursor != "" or filters is None:
+        return cursor
+
+    return Pagination.encode_cursor(filters.as_cursor())
+
+
 def resolve_campaign_document(
-    self, info: types.Info, limit: int, cursor: str
+    self,
+    info: types.Info,
+    limit: int,
+    cursor: str,
+    filters: typing.Optional[CampaignDocumentsFilterInput] = None,
 ) -> "PaginatedCampaignDocumentType":
 
+    cursor = apply_search_filters(cursor, filters)
+
+    # Load only the columns and joins of the selected fields.
+    projection = project_selection(info, "entries", CAMPAIGN_DOCUMENT_COLUMNS)
+
     sliced_campaign_documents, next_cursor = resolve_cursor(
-        search_limit=limit, encoded_cursor=cursor, model=models.CampaignDocumentsModel
+        search_limit=limit,
+        encoded_cursor=cursor,
+        model=models.CampaignDocumentsModel,
+        related_fields=projection.related_fields,
+        only_fields=projection.only_fields,
     )
 
     paginated_entries = [
-        CampaignDocumentType(
-            id=entry.id,
-            reference=entry.reference,
-            paper_type=entry.paper_type,
-            paper_repetition=entry.paper_repetition,
-            paper_creation_year=entry.paper_creation_year,
-            location_origin=entry.location_origin.region_name,
-            latitude=entry.latitude,  # type: ignore
-            longitude=entry.longitude,  # type: ignore
-            crop_variety=entry.crop_variety.variant_name,
-            humidity_percentage_stat=entry.humidity_percentage_stat,  # type: ignore
-            performance_stat=entry.performance_stat,  # type: ignore
-            relative_performance_stat=entry.relative_performance_stat,  # type: ignore
-            grain_count_crop_stat=entry.grain_count_crop_stat,
-            grain_count_per_spike_stat=entry.grain_count_per_spike_stat,
-            weight_per_thousand_grains_stat=entry.weight_per_thousand_grains_stat,  # type: ignore
-            proteins_percentage_stat=entry.proteins_percentage_stat,  # type: ignore
-            ph_stat=entry.ph_stat,  # type: ignore
-        )
+        projection.build_entry(CampaignDocumentType, entry)
         for entry in sliced_campaign_documents
     ]
 
@@ -56,6 +104,19 @@ def resolve_variety_options(
     self, info: types.Info, limit: int, cursor: str
 ) -> "PaginatedVarietyOptionsType":
 
+    # Serve the page from the preflight snapshot when it is loaded in memory.
+    snapshot_page = self.snapshot.variety_options.paginate(
+        search_limit=limit, encoded_cursor=cursor
+    )
+
+    if snapshot_page is not None:
+        snapshot_entries, next_cursor = snapshot_page
+
+        return PaginatedVarietyOptionsType(
+            options=snapshot_entries,  # type: ignore
+            page_meta=PaginationMetaType(next_cursor=next_cursor),
+        )
+
     sliced_variety_options, next_cursor = resolve_cursor(
         search_limit=limit, encoded_cursor=cursor, model=models.VarietyOptionsModel
     )
@@ -78,6 +139,19 @@ def resolve_location_options(
     self, info: types.Info, limit: int, cursor: str
 ) -> "PaginatedLocationOptionsType":
 
+    # Serve the page from the preflight snapshot when it is loaded in memory.
+    snapshot_page = self.snapshot.location_options.paginate(
+        search_limit=limit, encoded_cursor=cursor
+    )
+
+    if snapshot_page is not None:
+        snapshot_entries, next_cursor = snapshot_page
+
+        return PaginatedLocationOptionsType(
+            options=snapshot_entries,  # type: ignore
+            page_meta=PaginationMetaType(next_cursor=next_cursor),
+        )
+
     sliced_locations, next_cursor = resolve_cursor(
         search_limit=limit, encoded_cursor=cursor, model=models.LocationOptionsModel
     )
@@ -96,21 +170,42 @@ def resolve_location_options(
 
 
 def resolve_campaign_document_option(
-    self, info: types.Info, limit: int, cursor: str
+    self,
+    info: types.Info,
+    limit: int,
+    cursor: str,
+    filters: typing.Optional[CampaignDocumentsFilterInput] = None,
 ) -> "PaginatedCampaignDocumentOptionsType":
 
+    cursor = apply_search_filters(cursor, filters)
+
+    # Serve the page from the preflight snapshot when it is loaded in memory.
+    snapshot_page = self.snapshot.campaign_options.paginate(
+        search_limit=limit, encoded_cursor=cursor
+    )
+
+    if snapshot_page is not None:
+        snapshot_entries, next_cursor = snapshot_page
+
+        return PaginatedCampaignDocumentOptionsType(
+            options=snapshot_entries,  # type: ignore
+            page_meta=PaginationMetaType(next_cursor=next_cursor),
+        )
+
+    projection = project_selection(
+        info, "options", CAMPAIGN_DOCUMENT_OPTION_COLUMNS
+    )
+
     sliced_campaign_documents, next_cursor = resolve_cursor(
-        search_limit=limit, encoded_cursor=cursor, model=models.CampaignDocumentsModel
+        search_limit=limit,
+        encoded_cursor=cursor,
+        model=models.CampaignDocumentsModel,
+        related_fields=projection.related_fields,
+        only_fields=projection.only_fields,
     )
 
     paginated_entries = [
-        CampaignDocumentOptionType(
-            id=entry.id,
-            reference=entry.reference,
-            location_origin=entry.location_origin.region_name,
-            date_origin=entry.paper_creation_year,
-            crop_variant=entry.crop_variety.variant_name,
-        )
+        projection.build_entry(CampaignDocumentOptionType, entry)
         for entry in sliced_campaign_documents
     ]
 
@@ -120,8 +215,192 @@ def resolve_campaign_document_option(
     )
 
 
+def resolve_campaign_statistics(
+    self,
+    info: types.Info,
+    stat: CampaignStat,
+    group_by: typing.List[StatisticsGroup],
+    filters: typing.Optional[CampaignDocumentsFilterInput] = None,
+) -> typing.List[CampaignStatisticsType]:
+
+    search_filters = None
+
+    if filters is not None:
+        search_filters = Pagination.translate_filters(filters.as_cursor())
+
+    # Remove the repeated groups keeping the requested order.
+    groups = list(dict.fromkeys(group.value for group in group_by))
+
+    statistics_rows = aggregate_campaign_statistics(
+        stat=stat.value,
+        group_by=groups,
+        filters=search_filters["filter"] if search_filters is not None else {},
+    )
+
+    return [CampaignStatisticsType(**row) for row in statistics_rows]
+
+
+def get_snapshot_filters(
+    filters: typing.Optional[CampaignDocumentsFilterInput],
+) -> dict[str, typing.Any]:
+    """Returns the given search filters as the columnar snapshot filters."""
+    if filters is None:
+        return {}
+
+    snapshot_filters = {
+        "location_id": filters.location_id,
+        "variety_id": filters.variety_id,
+        "year_from": filters.year_from,
+        "year_to": filters.year_to,
+        "reference": filters.reference,
+    }
+
+    return {key: value for key, value in snapshot_filters.items() if value is not None}
+
+
+def resolve_campaign_ranking(
+    self,
+    info: types.Info,
+    stat: CampaignStat,
+    rank_by: typing.List[StatisticsGroup],
+    limit: int = 10,
+    ascending: bool = False,
+    filters: typing.Optional[CampaignDocumentsFilterInput] = None,
+) -> typing.List[CampaignRankingType]:
+
+    check_search_limit(limit)
+
+    ranked_groups = get_columnar_snapshot().rank(
+        stat=stat.value,
+        rank_by=list(dict.fromkeys(group.value for group in rank_by)),
+        limit=limit,
+        ascending=ascending,
+        filters=get_snapshot_filters(filters),
+    )
+
+    return [
+        CampaignRankingType(**{**dict.fromkeys(GROUP_FIELDS), **group})
+        for group in ranked_groups
+    ]
+
+
+def resolve_campaign_percentiles(
+    self,
+    info: types.Info,
+    stat: CampaignStat,
+    percentiles: typing.List[float],
+    group_by: typing.List[StatisticsGroup],
+    filters: typing.Optional[CampaignDocumentsFilterInput] = None,
+) -> typing.List[CampaignPercentilesType]:
+
+    percentile_groups = get_columnar_snapshot().percentiles(
+        stat=stat.value,
+        percentiles=percentiles,
+        group_by=list(dict.fromkeys(group.value for group in group_by)),
+        filters=get_snapshot_filters(filters),
+    )
+
+    return [
+        CampaignPercentilesType(**{**dict.fromkeys(GROUP_FIELDS), **group})
+        for group in percentile_groups
+    ]
+
+
+def resolve_campaign_documents_in_viewport(
+    self, info: types.Info, viewport: ViewportInput, limit: int = 100
+) -> CampaignDocumentsInViewportType:
+
+    check_search_limit(limit)
+
+    index = get_spatial_index()
+    positions = index.find_in_viewport(
+        south=viewport.south,
+        west=viewport.west,
+        north=viewport.north,
+        east=viewport.east,
+    )
+
+    projection = project_selection(info, "entries", CAMPAIGN_DOCUMENT_COLUMNS)
+    ids = index.get_first_ids(positions, limit)
+    campaign_documents = load_campaign_documents(
+        ids,
+        related_fields=projection.related_fields,
+        only_fields=projection.only_fields,
+    )
+
+    return CampaignDocumentsInViewportType(
+        entries=[
+            projection.build_entry(CampaignDocumentType, campaign_documents[id])
+            for id in ids
+            if id in campaign_documents
+        ],
+        total_count=len(positions),
+    )
+
+
+def resolve_nearest_campaign_documents(
+    self, info: types.Info, latitude: float, longitude: float, limit: int = 20
+) -> typing.List[NearbyCampaignDocumentType]:
+
+    check_search_limit(limit)
+
+    index = get_spatial_index()
+    positions, distances = index.find_nearest(
+        latitude=latitude, longitude=longitude, count=limit
+    )
+
+    projection = project_selection(info, "document", CAMPAIGN_DOCUMENT_COLUMNS)
+    ids = index.ids[positions].tolist()
+    campaign_documents = load_campaign_documents(
+        ids,
+        related_fields=projection.related_fields,
+        only_fields=projection.only_fields,
+    )
+
+    # The documents deleted after the index was built are skipped, so the distances
+    # are paired by id.
+    return [
+        NearbyCampaignDocumentType(
+            distance=distance,
+            document=projection.build_entry(
+                CampaignDocumentType, campaign_documents[id]
+            ),
+        )
+        for id, distance in zip(ids, distances.tolist())
+        if id in campaign_documents
+    ]
+
+
+def resolve_campaign_clusters(
+    self, info: types.Info, viewport: ViewportInput, zoom: int
+) -> typing.List[CampaignClusterType]:
+
+    clusters = get_spatial_index().find_clusters(
+        zoom=zoom,
+        south=viewport.south,
+        west=viewport.west,
+        north=viewport.north,
+        east=viewport.east,
+    )
+
+    return [CampaignClusterType(**cluster) for cluster in clusters]
+
+
 def resolve_preflight_options(self, info: types.Info) -> "PreflightOptionsType":
-    return PreflightOptionsType()
+    snapshot = get_preflight_snapshot()
+
+    return PreflightOptionsType(version=str(snapshot.version), snapshot=snapshot)
+
+
+# Async query field resolvers
+
+
+async def resolve_preflight_options_async(
+    self, info: types.Info
+) -> "AsyncPreflightOptionsType":
+    snapshot = await run_in_database_pool(get_preflight_snapshot)()
+
+    return AsyncPreflightOptionsType(version=str(snapshot.version), snapshot=snapshot)
 
 
 @strawberry.type(
@@ -176,25 +455,6 @@ class PaginatedCampaignDocumentType:
     page_meta: typing.Optional[PaginationMetaType]
 
 
-@strawberry.type(
-    description="Represents a minimal set of information of a crop variety entry"
-)
-class CampaignDocumentOptionType:
-    """
-    Represents a minimal set of information of a campaign document entry
-    """
-
-    id: int
-
-    reference: str
-
-    location_origin: str
-
-    date_origin: date
-
-    crop_variant: str
-
-
 # Composite preflight query types
 
 
@@ -205,6 +465,12 @@ class PreflightOptionsType:
     Like a form entry option or a user language preference.
     """
 
+    version: str = strawberry.field(
+        description="Represents the data version of the preflight options, it only changes when the options change",
+    )
+
+    snapshot: strawberry.Private[PreflightSnapshot]
+
     variety_options: PaginatedVarietyOptionsType = strawberry.field(
         resolver=resolve_variety_options,
         description="Resolves the variety preflight options",
@@ -234,11 +500,129 @@ class MixedType:
         resolver=resolve_preflight_options,
     )
 
+    campaign_statistics: typing.List[CampaignStatisticsType] = strawberry.field(
+        resolver=resolve_campaign_statistics,
+        description="Resolves the aggregated values of a stat grouped by the given fields",
+    )
+
+    campaign_ranking: typing.List[CampaignRankingType] = strawberry.field(
+        resolver=resolve_campaign_ranking,
+        description="Resolves the groups with the highest, or lowest, mean of a stat",
+    )
+
+    campaign_percentiles: typing.List[CampaignPercentilesType] = strawberry.field(
+        resolver=resolve_campaign_percentiles,
+        description="Resolves the percentiles of a stat grouped by the given fields",
+    )
+
+    campaign_documents_in_viewport: CampaignDocumentsInViewportType = strawberry.field(
+        resolver=resolve_campaign_documents_in_viewport,
+        description="Resolves the campaign documents inside a map viewport",
+    )
+
+    nearest_campaign_documents: typing.List[NearbyCampaignDocumentType] = (
+        strawberry.field(
+            resolver=resolve_nearest_campaign_documents,
+            description="Resolves the campaign documents nearest to a point",
+        )
+    )
+
+    campaign_clusters: typing.List[CampaignClusterType] = strawberry.field(
+        resolver=resolve_campaign_clusters,
+        description="Resolves the clusters of campaign documents of a map viewport at a zoom level",
+    )
+
+
+# Async composite query types, the sibling fields are resolved concurrently.
+
+
+@strawberry.type(name="PreflightOptionsType", description="")
+class AsyncPreflightOptionsType(PreflightOptionsType):
+    """
+    Represents the PreflightOptionsType resolved by the async schema.
+    """
+
+    variety_options: PaginatedVarietyOptionsType = strawberry.field(
+        resolver=run_in_database_pool(resolve_variety_options),
+        description="Resolves the variety preflight options",
+    )
+
+    location_options: PaginatedLocationOptionsType = strawberry.field(
+        resolver=run_in_database_pool(resolve_location_options),
+        description="Resolves the location preflight options",
+    )
+
+    campaign_options: PaginatedCampaignDocumentOptionsType = strawberry.field(
+        resolver=run_in_database_pool(resolve_campaign_document_option),
+        description="Resolves the campaign document preflight options",
+    )
+
+
+@strawberry.type(
+    name="MixedType",
+    description="This type is a set of all the available queries in this API version.",
+)
+class AsyncMixedType(MixedType):
+
+    campaign_documents: PaginatedCampaignDocumentType = strawberry.field(
+        resolver=run_in_database_pool(resolve_campaign_document),
+    )
+
+    preflight_options: AsyncPreflightOptionsType = strawberry.field(
+        resolver=resolve_preflight_options_async,
+    )
+
+    campaign_statistics: typing.List[CampaignStatisticsType] = strawberry.field(
+        resolver=run_in_database_pool(resolve_campaign_statistics),
+        description="Resolves the aggregated values of a stat grouped by the given fields",
+    )
+
+    campaign_ranking: typing.List[CampaignRankingType] = strawberry.field(
+        resolver=run_in_database_pool(resolve_campaign_ranking),
+        description="Resolves the groups with the highest, or lowest, mean of a stat",
+    )
+
+    campaign_percentiles: typing.List[CampaignPercentilesType] = strawberry.field(
+        resolver=run_in_database_pool(resolve_campaign_percentiles),
+        description="Resolves the percentiles of a stat grouped by the given fields",
+    )
+
+    campaign_documents_in_viewport: CampaignDocumentsInViewportType = strawberry.field(
+        resolver=run_in_database_pool(resolve_campaign_documents_in_viewport),
+        description="Resolves the campaign documents inside a map viewport",
+    )
+
+    nearest_campaign_documents: typing.List[NearbyCampaignDocumentType] = (
+        strawberry.field(
+            resolver=run_in_database_pool(resolve_nearest_campaign_documents),
+            description="Resolves the campaign documents nearest to a point",
+        )
+    )
+
+    campaign_clusters: typing.List[CampaignClusterType] = strawberry.field(
+        resolver=run_in_database_pool(resolve_campaign_clusters),
+        description="Resolves the clusters of campaign documents of a map viewport at a zoom level",
+    )
+
 
 # Mutation types
 
 # Graphql Schema
 
+SCHEMA_EXTENSIONS = [
+    PinnedDataVersion,
+    CachedDocuments,
+    QueryCostLimiter,
+    *([ResolverMetrics] if settings.GRAPHQL_METRICS["ENABLED"] else []),
+]
+"""Represents the extensions of both schemas."""
+
 STRAWBERRY_SCHEMA = strawberry.Schema(
     query=MixedType,
+    extensions=SCHEMA_EXTENSIONS,
+)
+
+ASYNC_STRAWBERRY_SCHEMA = strawberry.Schema(
+    query=AsyncMixedType,
+    extensions=SCHEMA_EXTENSIONS,
 )
@@ -1,7 +1,10 @@
+import typing
 from datetime import date
 
 import strawberry
 
+from api.pagination import Cursor
+
 
 @strawberry.type(description="Represents a container for the campaign document.")
 class CampaignDocumentType:
@@ -43,3 +46,54 @@ class CampaignDocumentType:
     proteins_percentage_stat: int
 
     ph_stat: int
+
+
+@strawberry.type(
+    description="Represents a minimal set of information of a crop variety entry"
+)
+class CampaignDocumentOptionType:
+    """
+    Represents a minimal set of information of a campaign document entry
+    """
+
+    id: int
+
+    reference: str
+
+    location_origin: str
+
+    date_origin: date
+
+    crop_variant: str
+
+
+@strawberry.input(description="Represents the filters of a campaign documents search.")
+class CampaignDocumentsFilterInput:
+    """
+    Represents a set of filters that are combined in the same campaign documents search.
+    """
+
+    location_id: typing.Optional[int] = None
+
+    variety_id: typing.Optional[int] = None
+
+    year_from: typing.Optional[int] = None
+
+    year_to: typing.Optional[int] = None
+
+    reference: typing.Optional[str] = None
+
+    def as_cursor(self) -> Cursor:
+        """Returns the cursor of the first page of the filtered search."""
+        cursor_filters = {
+            "select_related__location_origin__id": self.location_id,
+            "select_related__crop_variety__id": self.variety_id,
+            "select_related__paper_creation_year__year__gte": self.year_from,
+            "select_related__paper_creation_year__year__lte": self.year_to,
+            "select_related__reference": self.reference,
+        }
+
+        return {
+            "id": 1,
+            **{key: value for key, value in cursor_filters.items() if value is not None},
+        }  # type: ignore
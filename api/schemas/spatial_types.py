@@ -0,0 +1,67 @@
+import typing
+
+import strawberry
+
+from api.schemas.campaign_types import CampaignDocumentType
+
+
+@strawberry.input(description="Represents a map viewport, as a bounding box in degrees.")
+class ViewportInput:
+    """
+    Represents a map viewport, the viewports that cross the antimeridian have a west
+    longitude greater than the east longitude.
+    """
+
+    south: float
+
+    west: float
+
+    north: float
+
+    east: float
+
+
+@strawberry.type(
+    description="Represents the campaign documents inside a map viewport.",
+)
+class CampaignDocumentsInViewportType:
+    """
+    Represents the first campaign documents inside a map viewport, sorted by id, and
+    the amount of campaign documents inside the viewport.
+    """
+
+    entries: typing.List[CampaignDocumentType]
+
+    total_count: int
+
+
+@strawberry.type(
+    description="Represents a campaign document near a point and its distance.",
+)
+class NearbyCampaignDocumentType:
+    """
+    Represents a campaign document near a point, with its great circle distance to the
+    point in kilometers.
+    """
+
+    distance: float
+
+    document: CampaignDocumentType
+
+
+@strawberry.type(
+    description="Represents the campaign documents of a map area at a zoom level.",
+)
+class CampaignClusterType:
+    """
+    Represents the campaign documents of a cell of the cluster grid of a zoom level,
+    placed at the centroid of their coordinates.
+    """
+
+    latitude: float
+
+    longitude: float
+
+    count: int
+
+    mean_performance: float
@@ -0,0 +1,118 @@
+import enum
+import typing
+
+import strawberry
+
+
+@strawberry.enum(description="Represents the numeric stats of the campaign documents.")
+class CampaignStat(enum.Enum):
+
+    HUMIDITY_PERCENTAGE = "humidity_percentage_stat"
+
+    PERFORMANCE = "performance_stat"
+
+    RELATIVE_PERFORMANCE = "relative_performance_stat"
+
+    GRAIN_COUNT_CROP = "grain_count_crop_stat"
+
+    GRAIN_COUNT_PER_SPIKE = "grain_count_per_spike_stat"
+
+    WEIGHT_PER_THOUSAND_GRAINS = "weight_per_thousand_grains_stat"
+
+    PROTEINS_PERCENTAGE = "proteins_percentage_stat"
+
+    PH = "ph_stat"
+
+
+@strawberry.enum(description="Represents the fields that group the campaign statistics.")
+class StatisticsGroup(enum.Enum):
+
+    VARIETY = "variety"
+
+    LOCATION = "location"
+
+    YEAR = "year"
+
+    REFERENCE = "reference"
+
+
+@strawberry.type(
+    description="Represents the aggregated values of a stat in a group of campaign documents."
+)
+class CampaignStatisticsType:
+    """
+    Represents the aggregated values of a stat in a group of campaign documents, the
+    group fields that were not requested are empty.
+    """
+
+    variety_id: typing.Optional[int]
+
+    variety: typing.Optional[str]
+
+    location_id: typing.Optional[int]
+
+    location: typing.Optional[str]
+
+    year: typing.Optional[int]
+
+    reference: typing.Optional[str]
+
+    count: int
+
+    mean: typing.Optional[float]
+
+    min: typing.Optional[float]
+
+    max: typing.Optional[float]
+
+    stddev: typing.Optional[float]
+
+
+@strawberry.type(description="Represents a group of campaign documents ranked by the mean of a stat.")
+class CampaignRankingType:
+    """
+    Represents a ranked group of campaign documents, the group fields that were not
+    requested are empty.
+    """
+
+    rank: int
+
+    variety_id: typing.Optional[int]
+
+    variety: typing.Optional[str]
+
+    location_id: typing.Optional[int]
+
+    location: typing.Optional[str]
+
+    year: typing.Optional[int]
+
+    reference: typing.Optional[str]
+
+    count: int
+
+    mean: float
+
+
+@strawberry.type(description="Represents the percentiles of a stat in a group of campaign documents.")
+class CampaignPercentilesType:
+    """
+    Represents the percentiles of a stat in a group of campaign documents, in the
+    requested order, the group fields that were not requested are empty.
+    """
+
+    variety_id: typing.Optional[int]
+
+    variety: typing.Optional[str]
+
+    location_id: typing.Optional[int]
+
+    location: typing.Optional[str]
+
+    year: typing.Optional[int]
+
+    reference: typing.Optional[str]
+
+    count: int
+
+    values: typing.List[float]
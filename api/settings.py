@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 from corsheaders.defaults import default_headers
@@ -22,8 +23,14 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
+TESTING = sys.argv[1:2] == ["test"]
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = os.environ.get("AGROVAR_SECRET_KEY", None)
+# The tests sign the pagination cursors with a fixed key, so they do not depend on
+# the environment.
+SECRET_KEY = os.environ.get(
+    "AGROVAR_SECRET_KEY", "agrovar-insecure-tests-key" if TESTING else None
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = bool(os.environ.get("AGROVAR_DEBUG_MODE", None))
@@ -54,6 +61,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "repository.routers.replica_routing_middleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -87,11 +95,61 @@ WSGI_APPLICATION = "api.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# The connections are kept open for "AGROVAR_CONN_MAX_AGE" seconds, and the read
+# replicas are given as a comma separated list of database paths.
+
+DATABASE_CONNECTION = {
+    "CONN_MAX_AGE": int(os.environ.get("AGROVAR_CONN_MAX_AGE", 60)),
+    "CONN_HEALTH_CHECKS": True,
+}
+
+DATABASE_REPLICA_PATHS = [
+    path.strip()
+    for path in os.environ.get("AGROVAR_DATABASE_REPLICAS", "").split(",")
+    if path.strip()
+]
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "NAME": os.environ.get("AGROVAR_DATABASE_PATH", BASE_DIR / "db.sqlite3"),
+        **DATABASE_CONNECTION,
+    },
+    **{
+        f"replica_{index}": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": path,
+            **DATABASE_CONNECTION,
+            "TEST": {"MIRROR": "default"},
+        }
+        for index, path in enumerate(DATABASE_REPLICA_PATHS)
+    },
+}
+
+DATABASE_ROUTERS = ["repository.routers.ReplicaRouter"]
+
+# SQLite pragmas configuration
+# The pragmas are applied to each new SQLite connection, the WAL journal lets the
+# readers run while a writer commits. A None value keeps the SQLite default.
+
+SQLITE_PRAGMAS = {
+    "JOURNAL_MODE": os.environ.get("AGROVAR_SQLITE_JOURNAL_MODE", "wal"),
+    "SYNCHRONOUS": os.environ.get("AGROVAR_SQLITE_SYNCHRONOUS", "normal"),
+    "MMAP_SIZE": int(os.environ.get("AGROVAR_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    # A negative cache size is given in KiB instead of pages.
+    "CACHE_SIZE": int(os.environ.get("AGROVAR_SQLITE_CACHE_SIZE", -64000)),
+    "TEMP_STORE": os.environ.get("AGROVAR_SQLITE_TEMP_STORE", "memory"),
+    "BUSY_TIMEOUT": int(os.environ.get("AGROVAR_SQLITE_BUSY_TIMEOUT", 5000)),
+}
+
+# Read replicas configuration
+# The reads of each request are routed to one of the "ALIASES" databases, picked in
+# round robin, the clients that write are pinned to the primary database for
+# "STICKY_SECONDS".
+
+DATABASE_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "STICKY_SECONDS": int(os.environ.get("AGROVAR_REPLICA_STICKY_SECONDS", 10)),
 }
 
 
@@ -146,6 +204,153 @@ STATIC_URL = "statics/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Cache framework configuration
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The default backend keeps the entries in each process, the processes share them
+# with a backend like "django.core.cache.backends.redis.RedisCache", whose server
+# is given as the "AGROVAR_CACHE_LOCATION".
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "AGROVAR_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("AGROVAR_CACHE_LOCATION", ""),
+    }
+}
+
+# Pagination cursors configuration
+# The cursors are signed with the SECRET_KEY, the legacy JSON cursors are accepted
+# while "ACCEPT_LEGACY" is enabled.
+
+CURSORS = {
+    "ACCEPT_LEGACY": os.environ.get("AGROVAR_ACCEPT_LEGACY_CURSORS", "1") == "1",
+}
+
+# Paginated queries cache configuration
+# The "memory" backend keeps the pages in each process, the "django" backend
+# stores them in the django cache framework "ALIAS" backend.
+
+PAGE_CACHE = {
+    "BACKEND": os.environ.get("AGROVAR_PAGE_CACHE_BACKEND", "memory"),
+    "ALIAS": os.environ.get("AGROVAR_PAGE_CACHE_ALIAS", "default"),
+    "TIMEOUT": int(os.environ.get("AGROVAR_PAGE_CACHE_TIMEOUT", 300)),
+    "MAX_ENTRIES": int(os.environ.get("AGROVAR_PAGE_CACHE_MAX_ENTRIES", 1024)),
+}
+
+# Preflight options snapshot configuration
+# The snapshot keeps in memory up to "MAX_ENTRIES" entries of each preflight option,
+# and it is rebuilt in a background thread when the repository data changes.
+
+PREFLIGHT_SNAPSHOT = {
+    "MAX_ENTRIES": int(os.environ.get("AGROVAR_PREFLIGHT_MAX_ENTRIES", 1000)),
+    "BACKGROUND_REBUILD": os.environ.get("AGROVAR_PREFLIGHT_BACKGROUND_REBUILD", "1")
+    == "1",
+}
+
+# Analytics columnar snapshot configuration
+# The snapshot loads the campaign document stats in chunks of "CHUNK_SIZE" entries,
+# caches up to "MAX_ANSWERS" query answers and it is rebuilt in a background thread
+# when the repository data changes.
+
+ANALYTICS_SNAPSHOT = {
+    "CHUNK_SIZE": int(os.environ.get("AGROVAR_ANALYTICS_CHUNK_SIZE", 10000)),
+    "MAX_ANSWERS": int(os.environ.get("AGROVAR_ANALYTICS_MAX_ANSWERS", 256)),
+    "BACKGROUND_REBUILD": os.environ.get("AGROVAR_ANALYTICS_BACKGROUND_REBUILD", "1")
+    == "1",
+}
+
+# Spatial index configuration
+# The index groups the campaign documents in a grid of "CELL_SIZE" degrees cells,
+# loading their coordinates in chunks of "CHUNK_SIZE" entries, and it is rebuilt in
+# a background thread when the repository data changes. The map clusters of each
+# zoom level up to "CLUSTER_MAX_ZOOM" split each map tile in a grid of
+# "CLUSTER_CELLS_PER_TILE" x "CLUSTER_CELLS_PER_TILE" cells.
+
+SPATIAL_INDEX = {
+    "CELL_SIZE": float(os.environ.get("AGROVAR_SPATIAL_CELL_SIZE", 0.5)),
+    "CLUSTER_MAX_ZOOM": int(os.environ.get("AGROVAR_CLUSTER_MAX_ZOOM", 12)),
+    "CLUSTER_CELLS_PER_TILE": int(os.environ.get("AGROVAR_CLUSTER_CELLS_PER_TILE", 4)),
+    "CHUNK_SIZE": int(os.environ.get("AGROVAR_SPATIAL_CHUNK_SIZE", 10000)),
+    "BACKGROUND_REBUILD": os.environ.get("AGROVAR_SPATIAL_BACKGROUND_REBUILD", "1")
+    == "1",
+}
+
+# Campaign documents export configuration
+# The exports query the campaign documents in chunks of "CHUNK_SIZE" entries.
+
+EXPORT = {
+    "CHUNK_SIZE": int(os.environ.get("AGROVAR_EXPORT_CHUNK_SIZE", 2000)),
+}
+
+# Async GraphQL execution configuration
+# When "ENABLED", the GraphQL endpoint runs the async schema and the database work
+# of the resolvers runs in a thread pool of "POOL_SIZE" threads.
+
+ASYNC_GRAPHQL = {
+    "ENABLED": bool(os.environ.get("AGROVAR_ASYNC_GRAPHQL", None)),
+    "POOL_SIZE": int(os.environ.get("AGROVAR_ASYNC_GRAPHQL_POOL_SIZE", 8)),
+}
+
+# GraphQL documents configuration
+# The parsed and validated documents of up to "MAX_ENTRIES" queries are cached in
+# each process, the persisted queries are stored in the "PERSISTED_QUERIES_ALIAS"
+# backend of the django cache framework.
+
+GRAPHQL_DOCUMENTS = {
+    "MAX_ENTRIES": int(os.environ.get("AGROVAR_GRAPHQL_DOCUMENTS_MAX_ENTRIES", 512)),
+    "PERSISTED_QUERIES_ALIAS": os.environ.get(
+        "AGROVAR_PERSISTED_QUERIES_ALIAS", "default"
+    ),
+}
+
+# GraphQL HTTP cache configuration
+# The queries sent with GET requests are answered with an ETag of the data version,
+# and they can be cached by the clients and the proxies for "MAX_AGE" seconds, or
+# revalidated on each request when it is zero.
+
+GRAPHQL_HTTP_CACHE = {
+    "MAX_AGE": int(os.environ.get("AGROVAR_GRAPHQL_CACHE_MAX_AGE", 60)),
+}
+
+# GraphQL query cost configuration
+# The operations whose estimated cost exceeds "MAX_COST" are rejected before they
+# run. When "CLIENT_BUDGET" is set, each client address can spend that cost every
+# "BUDGET_WINDOW" seconds. The "django" budgets backend stores the budgets in the
+# django cache framework "BUDGETS_ALIAS" backend, the "memory" backend keeps the
+# budgets of up to "MAX_CLIENTS" clients in each process. Behind "TRUSTED_PROXIES"
+# proxies, the client address is taken from the "CLIENT_HEADER" header.
+
+QUERY_COST = {
+    "MAX_COST": int(os.environ.get("AGROVAR_QUERY_MAX_COST", 10000)),
+    "CLIENT_BUDGET": int(os.environ.get("AGROVAR_QUERY_CLIENT_BUDGET", 0)),
+    "BUDGET_WINDOW": float(os.environ.get("AGROVAR_QUERY_BUDGET_WINDOW", 60)),
+    "MAX_CLIENTS": int(os.environ.get("AGROVAR_QUERY_MAX_CLIENTS", 10000)),
+    "BUDGETS_BACKEND": os.environ.get("AGROVAR_QUERY_BUDGETS_BACKEND", "django"),
+    "BUDGETS_ALIAS": os.environ.get("AGROVAR_QUERY_BUDGETS_ALIAS", "default"),
+    "TRUSTED_PROXIES": int(os.environ.get("AGROVAR_TRUSTED_PROXIES", 0)),
+    "CLIENT_HEADER": os.environ.get("AGROVAR_CLIENT_HEADER", "X-Forwarded-For"),
+}
+
+# GraphQL metrics configuration
+# When "ENABLED", the wall time, SQL queries and returned rows of each resolver are
+# recorded and served in the Prometheus text format at /metrics. The operations
+# slower than "SLOW_OPERATION_SECONDS" are logged, only when it is set. When the
+# "DIRECTORY" is set, each worker process writes its metrics there at most once per
+# "FLUSH_SECONDS", and /metrics serves the metrics of all of them added up,
+# otherwise it serves the metrics of the process that answers the scrape.
+
+GRAPHQL_METRICS = {
+    "ENABLED": os.environ.get("AGROVAR_GRAPHQL_METRICS", "1") == "1",
+    "DIRECTORY": os.environ.get("AGROVAR_METRICS_DIRECTORY", None) or None,
+    "FLUSH_SECONDS": float(os.environ.get("AGROVAR_METRICS_FLUSH_SECONDS", 1)),
+    "SLOW_OPERATION_SECONDS": (
+        float(os.environ["AGROVAR_SLOW_OPERATION_SECONDS"])
+        if os.environ.get("AGROVAR_SLOW_OPERATION_SECONDS")
+        else None
+    ),
+}
+
 # Default logging configuration
 # https://docs.djangoproject.com/en/4.2/ref/logging/#logging
 
@@ -0,0 +1,524 @@
+import dataclasses
+import math
+import threading
+import typing
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.dispatch import receiver
+
+from repository import models
+from repository.versioning import data_changed, get_data_version
+
+EARTH_RADIUS_KM = 6371.0088
+"""Represents the mean earth radius, used by the haversine distances."""
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+"""Represents the length of a degree of latitude."""
+
+
+def haversine_km(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    """Returns the great circle distance from a point to each of the given points.
+
+    Args:
+        latitude (float): The point latitude, in degrees.
+        longitude (float): The point longitude, in degrees.
+        latitudes (np.ndarray): The latitudes of the other points, in degrees.
+        longitudes (np.ndarray): The longitudes of the other points, in degrees.
+
+    Returns:
+        np.ndarray: The distances in kilometers.
+    """
+    latitude_radians = math.radians(latitude)
+    latitudes_radians = np.radians(latitudes)
+
+    a = (
+        np.sin((latitudes_radians - latitude_radians) / 2) ** 2
+        + math.cos(latitude_radians)
+        * np.cos(latitudes_radians)
+        * np.sin(np.radians(longitudes - longitude) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+@dataclasses.dataclass(frozen=True)
+class Grid:
+    """Represents a uniform grid of cells over the earth, where the cells are keyed by
+    their row and column, so each row of cells of a bounding box is a contiguous
+    range of keys."""
+
+    cell_size: float
+    """Represents the width and height of the cells, in degrees."""
+
+    cell_keys: np.ndarray
+    """Represents the sorted cell keys of the grid entries."""
+
+    @property
+    def columns(self) -> int:
+        """Returns the amount of cell columns of the grid."""
+        return math.ceil(round(360 / self.cell_size, 6))
+
+    @property
+    def rows(self) -> int:
+        """Returns the amount of cell rows of the grid."""
+        return math.ceil(round(180 / self.cell_size, 6))
+
+    def get_cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        """Returns the row and column of the cell that contains the given point."""
+        return (
+            min(int((latitude + 90) // self.cell_size), self.rows - 1),
+            min(int((longitude + 180) // self.cell_size), self.columns - 1),
+        )
+
+    def get_cell_keys(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """Returns the key of the cell that contains each of the given points."""
+        rows = np.minimum(((latitudes + 90) // self.cell_size).astype(np.int64), self.rows - 1)
+        columns = np.minimum(
+            ((longitudes + 180) // self.cell_size).astype(np.int64), self.columns - 1
+        )
+
+        return rows * self.columns + columns
+
+    def find_box_positions(
+        self, first_cell: tuple[int, int], last_cell: tuple[int, int]
+    ) -> np.ndarray:
+        """Returns the positions of the entries inside a box of cells, the columns
+        outside the grid wrap around the antimeridian.
+
+        Args:
+            first_cell (tuple[int, int]): The lowest row and column of the box.
+            last_cell (tuple[int, int]): The highest row and column of the box.
+
+        Returns:
+            np.ndarray: The positions of the entries in the grid.
+        """
+        rows = np.arange(max(first_cell[0], 0), min(last_cell[0], self.rows - 1) + 1)
+        first_column = first_cell[1] % self.columns
+        last_column = last_cell[1] % self.columns
+
+        if last_cell[1] - first_cell[1] + 1 >= self.columns:
+            column_ranges = [(0, self.columns - 1)]
+        elif first_column > last_column:
+            column_ranges = [(first_column, self.columns - 1), (0, last_column)]
+        else:
+            column_ranges = [(first_column, last_column)]
+
+        starts = np.concatenate(
+            [
+                np.searchsorted(self.cell_keys, rows * self.columns + first_column)
+                for first_column, _ in column_ranges
+            ]
+        )
+        stops = np.concatenate(
+            [
+                np.searchsorted(
+                    self.cell_keys, rows * self.columns + last_column, side="right"
+                )
+                for _, last_column in column_ranges
+            ]
+        )
+
+        return np.concatenate(
+            [np.arange(start, stop) for start, stop in zip(starts, stops) if stop > start]
+            or [np.empty(0, dtype=np.int64)]
+        )
+
+    def find_viewport_cells(
+        self, *, south: float, west: float, north: float, east: float
+    ) -> np.ndarray:
+        """Returns the positions of the entries in the cells that overlap a viewport,
+        the viewports that cross the antimeridian have a west longitude greater than
+        the east one."""
+        if west > east:
+            return np.concatenate(
+                [
+                    self.find_viewport_cells(south=south, west=west, north=north, east=180),
+                    self.find_viewport_cells(
+                        south=south, west=-180, north=north, east=east
+                    ),
+                ]
+            )
+
+        return self.find_box_positions(
+            self.get_cell(south, west), self.get_cell(north, east)
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class ClusterGrid(Grid):
+    """Represents the campaign documents aggregated in the cells of a zoom level."""
+
+    zoom: int
+
+    counts: np.ndarray
+    """Represents the amount of documents of each cell."""
+
+    latitude_sums: np.ndarray
+
+    longitude_sums: np.ndarray
+
+    performance_sums: np.ndarray
+
+    def find_clusters(
+        self, *, south: float, west: float, north: float, east: float
+    ) -> list[dict[str, typing.Any]]:
+        """Returns the clusters of the cells that overlap a viewport.
+
+        Returns:
+            list[dict[str, typing.Any]]: The centroid, count and mean performance of
+            the documents of each cell.
+        """
+        positions = self.find_viewport_cells(
+            south=south, west=west, north=north, east=east
+        )
+        counts = self.counts[positions]
+
+        return [
+            {
+                "latitude": latitude,
+                "longitude": longitude,
+                "count": count,
+                "mean_performance": mean_performance,
+            }
+            for latitude, longitude, count, mean_performance in zip(
+                (self.latitude_sums[positions] / counts).tolist(),
+                (self.longitude_sums[positions] / counts).tolist(),
+                counts.tolist(),
+                (self.performance_sums[positions] / counts).tolist(),
+            )
+        ]
+
+    def coarsen(self) -> "ClusterGrid":
+        """Returns the grid of the previous zoom level, whose cells are twice as big."""
+        rows, columns = np.divmod(self.cell_keys, self.columns)
+        parent_keys = (rows // 2) * math.ceil(self.columns / 2) + columns // 2
+        cell_keys, cells = np.unique(parent_keys, return_inverse=True)
+        cells = cells.reshape(-1)
+
+        return ClusterGrid(
+            cell_size=self.cell_size * 2,
+            cell_keys=cell_keys,
+            zoom=self.zoom - 1,
+            counts=np.bincount(cells, weights=self.counts).astype(np.int64),
+            latitude_sums=np.bincount(cells, weights=self.latitude_sums),
+            longitude_sums=np.bincount(cells, weights=self.longitude_sums),
+            performance_sums=np.bincount(cells, weights=self.performance_sums),
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class SpatialIndex(Grid):
+    """Represents a uniform grid index of the campaign document coordinates, where
+    the documents are sorted by cell, and the cluster grids of each zoom level."""
+
+    version: int
+    """Represents the repository data version of the index."""
+
+    ids: np.ndarray
+
+    latitudes: np.ndarray
+
+    longitudes: np.ndarray
+
+    cluster_grids: tuple[ClusterGrid, ...] = ()
+    """Represents the cluster grid of each zoom level, from the zoom 0."""
+
+    def find_clusters(
+        self, *, zoom: int, south: float, west: float, north: float, east: float
+    ) -> list[dict[str, typing.Any]]:
+        """Returns the clusters of a viewport at the given zoom level, the zoom levels
+        above the last cluster grid use the last grid."""
+        cluster_grid = self.cluster_grids[min(max(zoom, 0), len(self.cluster_grids) - 1)]
+
+        return cluster_grid.find_clusters(south=south, west=west, north=north, east=east)
+
+    def find_in_viewport(
+        self, *, south: float, west: float, north: float, east: float
+    ) -> np.ndarray:
+        """Returns the positions of the documents inside a viewport, the viewports
+        that cross the antimeridian have a west longitude greater than the east one.
+
+        Args:
+            south (float): The lowest latitude.
+            west (float): The westmost longitude.
+            north (float): The highest latitude.
+            east (float): The eastmost longitude.
+
+        Returns:
+            np.ndarray: The positions of the documents.
+        """
+        positions = self.find_viewport_cells(
+            south=south, west=west, north=north, east=east
+        )
+
+        # The border cells can have documents outside the viewport.
+        latitudes = self.latitudes[positions]
+        longitudes = self.longitudes[positions]
+        inside_longitudes = (
+            (longitudes >= west) & (longitudes <= east)
+            if west <= east
+            else (longitudes >= west) | (longitudes <= east)
+        )
+
+        return positions[(latitudes >= south) & (latitudes <= north) & inside_longitudes]
+
+    def get_first_ids(self, positions: np.ndarray, limit: int) -> list[int]:
+        """Returns the lowest `limit` ids of the documents in the given positions, sorted."""
+        ids = self.ids[positions]
+
+        if len(ids) > limit:
+            ids = np.partition(ids, limit - 1)[:limit] if limit > 0 else ids[:0]
+
+        return np.sort(ids).tolist()
+
+    def find_nearest(
+        self, *, latitude: float, longitude: float, count: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the documents nearest to a point, searching boxes of cells around it
+        that double their size until they hold the nearest documents.
+
+        Args:
+            latitude (float): The point latitude.
+            longitude (float): The point longitude.
+            count (int): The amount of documents to return.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The positions of the nearest documents and
+            their distances in kilometers, sorted by distance.
+        """
+        if count <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        row, column = self.get_cell(latitude, longitude)
+        radius = 0
+
+        while True:
+            positions = self.find_box_positions(
+                (row - radius, column - radius), (row + radius, column + radius)
+            )
+            covers_grid = radius >= max(self.rows, self.columns)
+
+            if len(positions) >= count or covers_grid:
+                distances = haversine_km(
+                    latitude,
+                    longitude,
+                    self.latitudes[positions],
+                    self.longitudes[positions],
+                )
+                nearest = np.argsort(distances, kind="stable")[:count]
+
+                # The documents outside the box are farther than the box border.
+                if covers_grid or distances[nearest[-1]] <= self.get_box_border_km(
+                    latitude, longitude, row, column, radius
+                ):
+                    return positions[nearest], distances[nearest]
+
+            radius = max(1, radius * 2)
+
+    def get_box_border_km(
+        self, latitude: float, longitude: float, row: int, column: int, radius: int
+    ) -> float:
+        """Returns a lower bound of the distance from a point to the border of the box
+        of cells of the given radius around the point cell."""
+        south = (row - radius) * self.cell_size - 90
+        north = (row + radius + 1) * self.cell_size - 90
+        west = (column - radius) * self.cell_size - 180
+        east = (column + radius + 1) * self.cell_size - 180
+
+        # The box columns wrap around the antimeridian, so a box as wide as the grid
+        # has no west and east borders.
+        if 2 * radius + 1 >= self.columns:
+            return min(
+                (latitude - south) * KM_PER_DEGREE, (north - latitude) * KM_PER_DEGREE
+            )
+
+        # The distance to the great circle of a meridian bounds the distance to the
+        # meridian, past 90 degrees of longitude the nearest meridian point is a pole.
+        def get_meridian_km(longitude_difference: float) -> float:
+            return EARTH_RADIUS_KM * math.asin(
+                math.cos(math.radians(latitude))
+                * math.sin(math.radians(min(longitude_difference, 90)))
+            )
+
+        return min(
+            (latitude - south) * KM_PER_DEGREE,
+            (north - latitude) * KM_PER_DEGREE,
+            get_meridian_km(longitude - west),
+            get_meridian_km(east - longitude),
+        )
+
+
+def build_cluster_grids(
+    latitudes: np.ndarray, longitudes: np.ndarray, performances: np.ndarray
+) -> tuple[ClusterGrid, ...]:
+    """Aggregates the documents in the cluster grid of each zoom level, the grid of the
+    last zoom level is aggregated from the documents and each grid from the next one.
+
+    Args:
+        latitudes (np.ndarray): The document latitudes.
+        longitudes (np.ndarray): The document longitudes.
+        performances (np.ndarray): The document performances.
+
+    Returns:
+        tuple[ClusterGrid, ...]: The cluster grid of each zoom level, from the zoom 0.
+    """
+    max_zoom = settings.SPATIAL_INDEX["CLUSTER_MAX_ZOOM"]
+    cells_per_tile = settings.SPATIAL_INDEX["CLUSTER_CELLS_PER_TILE"]
+
+    grid = Grid(
+        cell_size=360 / (2**max_zoom * cells_per_tile),
+        cell_keys=np.empty(0, dtype=np.int64),
+    )
+    cell_keys, cells = np.unique(
+        grid.get_cell_keys(latitudes, longitudes), return_inverse=True
+    )
+    cells = cells.reshape(-1)
+
+    cluster_grids = [
+        ClusterGrid(
+            cell_size=grid.cell_size,
+            cell_keys=cell_keys,
+            zoom=max_zoom,
+            counts=np.bincount(cells, minlength=len(cell_keys)),
+            latitude_sums=np.bincount(cells, weights=latitudes, minlength=len(cell_keys)),
+            longitude_sums=np.bincount(
+                cells, weights=longitudes, minlength=len(cell_keys)
+            ),
+            performance_sums=np.bincount(
+                cells, weights=performances, minlength=len(cell_keys)
+            ),
+        )
+    ]
+
+    while cluster_grids[-1].zoom > 0:
+        cluster_grids.append(cluster_grids[-1].coarsen())
+
+    return tuple(reversed(cluster_grids))
+
+
+def build_spatial_index(version: int) -> SpatialIndex:
+    """Loads the campaign document coordinates and builds a new spatial index.
+
+    Args:
+        version (int): The data version read before loading the coordinates.
+
+    Returns:
+        SpatialIndex: The built index.
+    """
+    documents = np.fromiter(
+        models.CampaignDocumentsModel.objects.order_by("id")
+        .annotate(
+            latitude_value=Cast(F("latitude"), output_field=FloatField()),
+            longitude_value=Cast(F("longitude"), output_field=FloatField()),
+            performance_value=Cast(F("performance_stat"), output_field=FloatField()),
+        )
+        .values_list("id", "latitude_value", "longitude_value", "performance_value")
+        .iterator(chunk_size=settings.SPATIAL_INDEX["CHUNK_SIZE"]),
+        dtype=[
+            ("id", np.int64),
+            ("latitude", np.float64),
+            ("longitude", np.float64),
+            ("performance", np.float64),
+        ],
+    )
+
+    grid = Grid(
+        cell_size=settings.SPATIAL_INDEX["CELL_SIZE"],
+        cell_keys=np.empty(0, dtype=np.int64),
+    )
+    cell_keys = grid.get_cell_keys(documents["latitude"], documents["longitude"])
+    cell_order = np.argsort(cell_keys, kind="stable")
+
+    return SpatialIndex(
+        cell_size=grid.cell_size,
+        cell_keys=cell_keys[cell_order],
+        version=version,
+        ids=documents["id"][cell_order],
+        latitudes=documents["latitude"][cell_order],
+        longitudes=documents["longitude"][cell_order],
+        cluster_grids=build_cluster_grids(
+            documents["latitude"], documents["longitude"], documents["performance"]
+        ),
+    )
+
+
+_index: SpatialIndex | None = None
+
+_index_lock = threading.Lock()
+
+
+def get_spatial_index() -> SpatialIndex:
+    """Returns the spatial index of the current data version, building it when it
+    does not exist or is outdated.
+
+    Returns:
+        SpatialIndex: The current spatial index.
+    """
+    global _index
+
+    index = _index
+
+    if index is not None and index.version == get_data_version():
+        return index
+
+    # Only one thread builds the index, the others wait and reuse it.
+    with _index_lock:
+        version = get_data_version()
+
+        if _index is None or _index.version != version:
+            _index = build_spatial_index(version)
+
+        return _index
+
+
+def rebuild_spatial_index() -> None:
+    """Rebuilds the spatial index in a background thread."""
+
+    def rebuild() -> None:
+        try:
+            get_spatial_index()
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=rebuild, name="spatial-index", daemon=True).start()
+
+
+@receiver(data_changed, dispatch_uid="api_spatial_index_rebuild")
+def on_data_changed(sender, **kwargs) -> None:
+    """Schedules the rebuild of the spatial index once the change is committed."""
+
+    if _index is None or not settings.SPATIAL_INDEX["BACKGROUND_REBUILD"]:
+        return
+
+    transaction.on_commit(rebuild_spatial_index)
+
+
+def load_campaign_documents(
+    ids: typing.Sequence[int],
+    *,
+    related_fields: typing.Sequence[str],
+    only_fields: typing.Sequence[str],
+) -> dict[int, models.CampaignDocumentsModel]:
+    """Loads the campaign documents with the given ids, the ids of the documents
+    deleted after the index was built are missing from the result.
+
+    Args:
+        ids (typing.Sequence[int]): The campaign document ids.
+        related_fields (typing.Sequence[str]): The foreign keys to join.
+        only_fields (typing.Sequence[str]): The columns to load.
+
+    Returns:
+        dict[int, models.CampaignDocumentsModel]: The campaign documents by id.
+    """
+    return (
+        models.CampaignDocumentsModel.objects.filter(id__in=ids)
+        .select_related(*related_fields)
+        .only(*only_fields)
+        .in_bulk()
+    )
@@ -1,6 +1,179 @@
-from django.test import TestCase
+import contextlib
+import csv
+import glob
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import typing
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date
+from unittest import mock
 
-from api.pagination import Cursor, Pagination
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    AsyncClient,
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from graphql import parse
+
+from api.aggregation import aggregate_campaign_statistics
+from api.cache import InProcessPageCache, get_page_cache
+from api.cost import (
+    CostBudgets,
+    DjangoCostBudgets,
+    estimate_query_cost,
+    get_client_address,
+)
+from api.documents import DocumentCache, get_document_cache, hash_query
+from api.metrics import (
+    HISTOGRAMS,
+    RESOLVER_DURATION,
+    RESOLVER_QUERIES,
+    RESOLVER_ROWS,
+    Histogram,
+    collect_process_metrics,
+    get_process_metrics_path,
+)
+from api.pagination import Cursor, Pagination, iterate_cursor_chunks, resolve_cursor
+from api.preflight import get_preflight_snapshot
+from api.schema import ASYNC_STRAWBERRY_SCHEMA, STRAWBERRY_SCHEMA
+from api.spatial import get_spatial_index, haversine_km
+from api.views import AsyncGraphQLView
+from repository.models import (
+    CampaignDocumentsModel,
+    DataVersionModel,
+    LocationOptionsModel,
+    VarietyOptionsModel,
+)
+from repository.routers import ReplicaReads, _replica_reads
+from repository.summaries import rebuild_campaign_summaries
+from repository.versioning import bump_data_version, get_data_version
+
+WITHOUT_BACKGROUND_REBUILDS = override_settings(
+    PREFLIGHT_SNAPSHOT={**settings.PREFLIGHT_SNAPSHOT, "BACKGROUND_REBUILD": False},
+    ANALYTICS_SNAPSHOT={**settings.ANALYTICS_SNAPSHOT, "BACKGROUND_REBUILD": False},
+    SPATIAL_INDEX={**settings.SPATIAL_INDEX, "BACKGROUND_REBUILD": False},
+)
+"""Disables the background rebuilds of the transaction test cases, whose threads
+would read the test database while the next tests write it."""
+
+
+def create_campaign_documents(count: int) -> list[CampaignDocumentsModel]:
+    """Creates a set of campaign documents spread over a few locations and varieties.
+
+    Args:
+        count (int): The amount of campaign documents to create.
+
+    Returns:
+        list[CampaignDocumentsModel]: The created campaign documents.
+    """
+    locations = LocationOptionsModel.objects.bulk_create(
+        [LocationOptionsModel(region_name=f"Region {index}") for index in range(3)]
+    )
+    varieties = VarietyOptionsModel.objects.bulk_create(
+        [
+            VarietyOptionsModel(tradename=f"Trade {index}", variant_name=f"V{index}")
+            for index in range(4)
+        ]
+    )
+
+    campaign_documents = CampaignDocumentsModel.objects.bulk_create(
+        [
+            CampaignDocumentsModel(
+                reference="RED INTA 2022",
+                paper_type="VARIEDADES",
+                paper_creation_year=date(2020 + index % 3, 1, 1),
+                location_origin=locations[index % len(locations)],
+                latitude=-34 - index % 5,
+                longitude=-60 - index % 7,
+                paper_repetition=1,
+                crop_variety=varieties[index % len(varieties)],
+                humidity_percentage_stat=12,
+                performance_stat=100 + index % 50,
+                relative_performance_stat=100,
+                grain_count_crop_stat=1000,
+                grain_count_per_spike_stat=40,
+                weight_per_thousand_grains_stat=35,
+                proteins_percentage_stat=11,
+                ph_stat=7,
+            )
+            for index in range(count)
+        ]
+    )
+
+    # The bulk inserts skip the model signals that maintain the summaries.
+    rebuild_campaign_summaries()
+
+    return campaign_documents
+
+
+class QueryCountAssertionsMixin:
+    """Provides assertions over the amount of SQL queries that a GraphQL query costs."""
+
+    @contextlib.contextmanager
+    def assertNumDataQueries(self, num_queries: int) -> typing.Iterator[list[str]]:
+        """Asserts that the block executes the given amount of SQL queries, without
+        the lookups of the data version that stamps the cached results.
+
+        Args:
+            num_queries (int): The expected amount of SQL queries.
+
+        Yields:
+            list[str]: The SQL of the counted queries, filled when the block exits.
+        """
+        data_version_table = f'"{DataVersionModel._meta.db_table}"'
+        data_queries: list[str] = []
+
+        with CaptureQueriesContext(connection) as context:
+            yield data_queries
+
+        data_queries.extend(
+            query["sql"]
+            for query in context.captured_queries
+            if data_version_table not in query["sql"]
+        )
+
+        self.assertEqual(  # type: ignore
+            len(data_queries), num_queries, "\n".join(data_queries)
+        )
+
+    def assertConstantPageQueries(
+        self,
+        query: str,
+        limits: typing.Iterable[int],
+        num_queries: int,
+        variables: dict[str, typing.Any] | None = None,
+    ) -> None:
+        """Asserts that the given query, executed with each limit as the `limit`
+        variable, always costs the same amount of SQL queries.
+
+        Args:
+            query (str): A GraphQL query that receives a `$limit` variable.
+            limits (typing.Iterable[int]): The page sizes to test.
+            num_queries (int): The expected amount of SQL queries per page.
+            variables (dict[str, typing.Any] | None): Other variables of the query.
+        """
+        for limit in limits:
+            with self.subTest(limit=limit):  # type: ignore
+                with self.assertNumDataQueries(num_queries):
+                    result = STRAWBERRY_SCHEMA.execute_sync(
+                        query, variable_values={**(variables or {}), "limit": limit}
+                    )
+
+                self.assertIsNone(result.errors)  # type: ignore
 
 
 class TestPaginationSystem(TestCase):
@@ -27,7 +200,6 @@ class TestPaginationSystem(TestCase):
 
     def test_encode_cursor_with_valid_cursor_expecting_no_exception(self) -> None:
         valid_cursor: Cursor = {"id": 0}
-        valid_encoded_cursor = "eyJpZCI6IDB9"
 
         try:
             encoded_cursor = Pagination.encode_cursor(valid_cursor)
@@ -36,12 +208,43 @@ class TestPaginationSystem(TestCase):
                 "The 'encode_cursor' must run the test without raise any exception."
             )
 
-        self.assertEqual(encoded_cursor, valid_encoded_cursor)
+        self.assertEqual(Pagination.decode_cursor(encoded_cursor), valid_cursor)
+
+    def test_encode_cursor_round_trips_the_cursor_filters(self) -> None:
+        valid_cursor: typing.Any = {
+            "id": 123456,
+            "select_related__location_origin__id": 7,
+            "select_related__paper_creation_year__year__gte": -2021,
+            "select_related__reference": "RED INTA 2022",
+        }
+
+        encoded_cursor = Pagination.encode_cursor(valid_cursor)
+
+        self.assertRegex(encoded_cursor, r"^[A-Za-z0-9_-]+$")
+        self.assertEqual(Pagination.decode_cursor(encoded_cursor), valid_cursor)
+
+    def test_decode_cursor_with_tampered_cursor_expecting_exception(self) -> None:
+        encoded_cursor = Pagination.encode_cursor({"id": 1})  # type: ignore
+        packed_cursor = bytearray(urlsafe_b64decode(encoded_cursor + "=="))
+        packed_cursor[1] ^= 0x01
+        tampered_cursor = urlsafe_b64encode(packed_cursor).rstrip(b"=").decode()
+
+        with self.assertRaises(ValueError):
+            Pagination.decode_cursor(tampered_cursor)
+
+        with override_settings(SECRET_KEY="another secret key"):
+            with self.assertRaises(ValueError):
+                Pagination.decode_cursor(encoded_cursor)
+
+    def test_decode_cursor_rejects_legacy_cursors_when_disabled(self) -> None:
+        with override_settings(CURSORS={"ACCEPT_LEGACY": False}):
+            with self.assertRaises(ValueError):
+                Pagination.decode_cursor("eyJpZCI6IDB9")
 
     def test_decode_cursor_with_valid_cursor_expecting_no_exception(self) -> None:
-        valid_cursor: Cursor = {"id": 0, "select_related__crop_variety": 0}
+        valid_cursor: Cursor = {"id": 0, "select_related__crop_variety__id": 0}
         valid_encoded_cursor = (
-            "eyJpZCI6IDAsICJzZWxlY3RfcmVsYXRlZF9fbG9jYXRpb24iOiAwfQ=="
+            "eyJpZCI6IDAsICJzZWxlY3RfcmVsYXRlZF9fY3JvcF92YXJpZXR5X19pZCI6IDB9"
         )
 
         try:
@@ -52,3 +255,1582 @@ class TestPaginationSystem(TestCase):
             )
 
         self.assertEqual(decoded_cursor, valid_cursor)
+
+
+class TestCursorFilters(TestCase):
+
+    def test_translate_filters_combines_all_the_cursor_filters(self) -> None:
+        cursor: typing.Any = {
+            "id": 1,
+            "select_related__location_origin__id": 2,
+            "select_related__crop_variety__id": 3,
+            "select_related__paper_creation_year__year__gte": 2021,
+            "select_related__reference": "RED INTA 2022",
+        }
+
+        self.assertEqual(
+            Pagination.translate_filters(cursor),
+            {
+                "type": "select_related",
+                "filter": {
+                    "location_origin__id": 2,
+                    "crop_variety__id": 3,
+                    "paper_creation_year__year__gte": 2021,
+                    "reference": "RED INTA 2022",
+                },
+            },
+        )
+
+    def test_check_valid_cursor_rejects_invalid_lookups_and_values(self) -> None:
+        invalid_cursors: list[typing.Any] = [
+            {"select_related__crop_variety__id": 1},
+            {"id": "1"},
+            {"id": 1, "select_related__crop_variety": 1},
+            {"id": 1, "select_related__crop_variety__id": "1"},
+            {"id": 1, "prefetch_related__crop_variety__id": 1},
+        ]
+
+        for cursor in invalid_cursors:
+            with self.subTest(cursor=cursor):
+                self.assertFalse(Pagination.check_valid_cursor(cursor))
+
+    def test_cursor_shapes_are_compiled_once(self) -> None:
+        Pagination.compile_cursor_shape.cache_clear()
+
+        for cursor_id in range(5):
+            Pagination.translate_filters(
+                {"id": cursor_id, "select_related__crop_variety__id": 1}  # type: ignore
+            )
+
+        self.assertEqual(Pagination.compile_cursor_shape.cache_info().misses, 1)
+
+
+class TestResolveCursor(QueryCountAssertionsMixin, TestCase):
+
+    def setUp(self) -> None:
+        get_page_cache().clear()
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        VarietyOptionsModel.objects.bulk_create(
+            [
+                VarietyOptionsModel(tradename=f"Trade {index}", variant_name=f"V{index}")
+                for index in range(25)
+            ]
+        )
+
+    def test_resolve_cursor_walks_all_pages_in_order(self) -> None:
+        retrieved_ids: list[int] = []
+        cursor = ""
+
+        while cursor is not None:
+            entries, cursor = resolve_cursor(
+                search_limit=10, encoded_cursor=cursor, model=VarietyOptionsModel
+            )
+            retrieved_ids.extend(entry.id for entry in entries)
+
+        expected_ids = list(
+            VarietyOptionsModel.objects.order_by("id").values_list("id", flat=True)
+        )
+
+        self.assertEqual(retrieved_ids, expected_ids)
+
+    def test_resolve_cursor_limits_the_query_in_sql(self) -> None:
+        with self.assertNumDataQueries(1) as queries:
+            entries, cursor = resolve_cursor(
+                search_limit=5, encoded_cursor="", model=VarietyOptionsModel
+            )
+
+        self.assertEqual(len(entries), 5)
+        self.assertIsNotNone(cursor)
+
+        sql = queries[0]
+
+        self.assertIn("ORDER BY", sql)
+        self.assertIn("LIMIT 6", sql)
+
+    def test_resolve_cursor_rejects_the_limits_out_of_bounds(self) -> None:
+        for search_limit in [-1, 0, 1001]:
+            with self.subTest(search_limit=search_limit), self.assertRaises(
+                ValueError
+            ):
+                resolve_cursor(
+                    search_limit=search_limit,
+                    encoded_cursor="",
+                    model=VarietyOptionsModel,
+                )
+
+        for query in [
+            "{ nearestCampaignDocuments(latitude: 0, longitude: 0, limit: 0) "
+            "{ distance } }",
+            "{ campaignDocumentsInViewport(viewport: "
+            "{ south: -1, west: -1, north: 1, east: 1 }, limit: -5) { totalCount } }",
+        ]:
+            result = STRAWBERRY_SCHEMA.execute_sync(query)
+
+            self.assertIsNone(result.data)
+            self.assertIn("Cannot query less than 1 entry", result.errors[0].message)
+
+
+class TestSchemaResolvers(QueryCountAssertionsMixin, TestCase):
+
+    def setUp(self) -> None:
+        get_page_cache().clear()
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        create_campaign_documents(60)
+
+    def test_campaign_documents_page_costs_a_single_query(self) -> None:
+        self.assertConstantPageQueries(
+            """
+            query ($limit: Int!) {
+                campaignDocuments(limit: $limit, cursor: "") {
+                    entries { id locationOrigin cropVariety }
+                    pageMeta { nextCursor }
+                }
+            }
+            """,
+            limits=[1, 10, 50],
+            num_queries=1,
+        )
+
+    def test_campaign_documents_are_filtered_by_all_the_search_filters(self) -> None:
+        location = LocationOptionsModel.objects.order_by("id").first()
+        variety = VarietyOptionsModel.objects.order_by("id").first()
+        query = """
+            query ($cursor: String!, $filters: CampaignDocumentsFilterInput) {
+                campaignDocuments(limit: 2, cursor: $cursor, filters: $filters) {
+                    entries { id }
+                    pageMeta { nextCursor }
+                }
+            }
+        """
+        filters = {
+            "locationId": location.id,  # type: ignore
+            "varietyId": variety.id,  # type: ignore
+            "yearFrom": 2020,
+            "yearTo": 2020,
+        }
+
+        retrieved_ids: list[int] = []
+        cursor = ""
+
+        while cursor is not None:
+            result = STRAWBERRY_SCHEMA.execute_sync(
+                query, variable_values={"cursor": cursor, "filters": filters}
+            )
+
+            self.assertIsNone(result.errors)
+
+            page = result.data["campaignDocuments"]  # type: ignore
+            retrieved_ids.extend(entry["id"] for entry in page["entries"])
+            cursor = page["pageMeta"]["nextCursor"]
+
+        expected_ids = list(
+            CampaignDocumentsModel.objects.filter(
+                location_origin=location,
+                crop_variety=variety,
+                paper_creation_year__year=2020,
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        self.assertGreater(len(expected_ids), 2)
+        self.assertEqual(retrieved_ids, expected_ids)
+
+    def test_campaign_documents_load_only_the_selected_columns(self) -> None:
+        query = """
+            query ($fragmentless: Boolean!) {
+                campaignDocuments(limit: 5, cursor: "") {
+                    entries {
+                        id
+                        performanceStat
+                        ... on CampaignDocumentType @skip(if: $fragmentless) {
+                            locationOrigin
+                        }
+                    }
+                }
+            }
+        """
+
+        with self.assertNumDataQueries(1) as queries:
+            result = STRAWBERRY_SCHEMA.execute_sync(
+                query, variable_values={"fragmentless": True}
+            )
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data["campaignDocuments"]["entries"]), 5)  # type: ignore
+
+        sql = queries[0]
+
+        self.assertIn('"performance_stat"', sql)
+        self.assertNotIn('"ph_stat"', sql)
+        self.assertNotIn("JOIN", sql)
+
+        get_page_cache().clear()
+
+        with self.assertNumDataQueries(1) as queries:
+            result = STRAWBERRY_SCHEMA.execute_sync(
+                query, variable_values={"fragmentless": False}
+            )
+
+        self.assertIsNone(result.errors)
+        self.assertIn("JOIN", queries[0])
+        self.assertEqual(
+            result.data["campaignDocuments"]["entries"][0]["locationOrigin"],  # type: ignore
+            "Region 0",
+        )
+
+    def test_filtered_preflight_campaign_options_page_costs_a_single_query(
+        self,
+    ) -> None:
+        # The filtered pages are not served by the preflight snapshot.
+        get_preflight_snapshot()
+
+        location = LocationOptionsModel.objects.order_by("id").first()
+        cursor = Pagination.encode_cursor(
+            {"id": 1, "select_related__location_origin__id": location.id}  # type: ignore
+        )
+
+        self.assertConstantPageQueries(
+            """
+            query ($limit: Int!, $cursor: String!) {
+                preflightOptions {
+                    campaignOptions(limit: $limit, cursor: $cursor) {
+                        options { id locationOrigin cropVariant }
+                    }
+                }
+            }
+            """,
+            limits=[1, 10, 50],
+            num_queries=1,
+            variables={"cursor": cursor},
+        )
+
+    def test_operations_read_the_data_version_once(self) -> None:
+        with CaptureQueriesContext(connection) as context:
+            result = STRAWBERRY_SCHEMA.execute_sync(
+                """
+                {
+                    campaignDocuments(limit: 5, cursor: "") { entries { id } }
+                    preflightOptions {
+                        version
+                        campaignOptions(limit: 5, cursor: "") { options { id } }
+                    }
+                }
+                """
+            )
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            sum(
+                '"data_version"' in query["sql"]
+                for query in context.captured_queries
+            ),
+            1,
+        )
+
+
+class TestPageCache(QueryCountAssertionsMixin, TestCase):
+
+    def setUp(self) -> None:
+        get_page_cache().clear()
+
+    def test_in_process_cache_evicts_the_least_recently_used_entry(self) -> None:
+        page_cache = InProcessPageCache(max_entries=2, timeout=60)
+
+        page_cache.set("first", 1)
+        page_cache.set("second", 2)
+        page_cache.get("first")
+        page_cache.set("third", 3)
+
+        self.assertTrue(page_cache.contains("first"))
+        self.assertFalse(page_cache.contains("second"))
+        self.assertTrue(page_cache.contains("third"))
+
+    def test_in_process_cache_expires_entries_after_the_timeout(self) -> None:
+        page_cache = InProcessPageCache(max_entries=2, timeout=60)
+
+        with mock.patch("api.cache.time.monotonic", return_value=0):
+            page_cache.set("first", 1)
+
+        with mock.patch("api.cache.time.monotonic", return_value=61):
+            self.assertIsNone(page_cache.get("first"))
+
+    def test_hash_is_stable_for_equivalent_cursors(self) -> None:
+        self.assertEqual(
+            Pagination.hash("eyJpZCI6MX0=", model=VarietyOptionsModel, limit=10),
+            Pagination.hash("eyJpZCI6IDF9", model=VarietyOptionsModel, limit=10),
+        )
+        self.assertNotEqual(
+            Pagination.hash("eyJpZCI6MX0=", model=VarietyOptionsModel, limit=10),
+            Pagination.hash("eyJpZCI6MX0=", model=VarietyOptionsModel, limit=20),
+        )
+
+    def test_resolve_cursor_decodes_the_cursor_once(self) -> None:
+        encoded_cursor = Pagination.encode_cursor({"id": 1})  # type: ignore
+
+        with mock.patch.object(
+            Pagination, "decode_cursor", wraps=Pagination.decode_cursor
+        ) as decode_cursor:
+            resolve_cursor(
+                search_limit=10,
+                encoded_cursor=encoded_cursor,
+                model=VarietyOptionsModel,
+            )
+
+        decode_cursor.assert_called_once_with(encoded_cursor)
+
+    def test_resolve_cursor_serves_cached_pages_until_the_data_changes(self) -> None:
+        VarietyOptionsModel.objects.create(tradename="Trade", variant_name="V")
+        page_hash = Pagination.hash(
+            "eyJpZCI6MX0=",
+            model=VarietyOptionsModel,
+            limit=10,
+            related_fields=(),
+            only_fields=(),
+        )
+
+        resolve_cursor(search_limit=10, encoded_cursor="", model=VarietyOptionsModel)
+
+        self.assertTrue(Pagination.is_cached(page_hash))
+
+        with self.assertNumDataQueries(0):
+            entries, _ = resolve_cursor(
+                search_limit=10, encoded_cursor="", model=VarietyOptionsModel
+            )
+
+        self.assertEqual(len(entries), 1)
+
+        VarietyOptionsModel.objects.create(tradename="Trade", variant_name="W")
+
+        with self.assertNumDataQueries(1):
+            entries, _ = resolve_cursor(
+                search_limit=10, encoded_cursor="", model=VarietyOptionsModel
+            )
+
+        self.assertEqual(len(entries), 2)
+
+
+class TestPreflightSnapshot(QueryCountAssertionsMixin, TestCase):
+
+    PREFLIGHT_QUERY = """
+        query ($limit: Int!, $cursor: String!) {
+            preflightOptions {
+                version
+                varietyOptions(limit: $limit, cursor: $cursor) {
+                    options { id variantName }
+                    pageMeta { nextCursor }
+                }
+            }
+        }
+    """
+
+    def setUp(self) -> None:
+        # Discard the snapshots built with the data of other tests.
+        bump_data_version()
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        create_campaign_documents(10)
+
+    def execute_preflight_query(self, limit: int, cursor: str) -> dict:
+        result = STRAWBERRY_SCHEMA.execute_sync(
+            self.PREFLIGHT_QUERY, variable_values={"limit": limit, "cursor": cursor}
+        )
+
+        self.assertIsNone(result.errors)
+
+        return result.data["preflightOptions"]  # type: ignore
+
+    def test_preflight_options_are_served_from_memory_once_built(self) -> None:
+        first_options = self.execute_preflight_query(2, "")
+
+        with self.assertNumDataQueries(0):
+            second_options = self.execute_preflight_query(2, "")
+
+        self.assertEqual(first_options, second_options)
+
+    def test_preflight_pages_match_the_database_pages(self) -> None:
+        retrieved_ids: list[int] = []
+        cursor = ""
+
+        while cursor is not None:
+            options = self.execute_preflight_query(3, cursor)
+            retrieved_ids.extend(
+                option["id"] for option in options["varietyOptions"]["options"]
+            )
+            cursor = options["varietyOptions"]["pageMeta"]["nextCursor"]
+
+        expected_ids = list(
+            VarietyOptionsModel.objects.order_by("id").values_list("id", flat=True)
+        )
+
+        self.assertEqual(retrieved_ids, expected_ids)
+
+    def test_preflight_version_changes_with_the_data(self) -> None:
+        first_options = self.execute_preflight_query(10, "")
+
+        VarietyOptionsModel.objects.create(tradename="Trade", variant_name="New")
+
+        second_options = self.execute_preflight_query(10, "")
+
+        self.assertNotEqual(first_options["version"], second_options["version"])
+        self.assertEqual(
+            len(second_options["varietyOptions"]["options"]),
+            len(first_options["varietyOptions"]["options"]) + 1,
+        )
+
+    def test_preflight_view_skips_the_download_when_the_version_matches(self) -> None:
+        response = self.client.get("/api/v1/preflight/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["varietyOptions"]), 4)
+
+        response = self.client.get(
+            "/api/v1/preflight/", headers={"If-None-Match": response["ETag"]}
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(PREFLIGHT_SNAPSHOT={"MAX_ENTRIES": 5, "BACKGROUND_REBUILD": False})
+@WITHOUT_BACKGROUND_REBUILDS
+class TestAsyncSchema(TransactionTestCase):
+
+    def setUp(self) -> None:
+        create_campaign_documents(12)
+        bump_data_version()
+
+    def test_async_schema_resolves_the_same_data_as_the_sync_schema(self) -> None:
+        query = """
+            query ($limit: Int!, $cursor: String!) {
+                campaignDocuments(limit: $limit, cursor: $cursor) {
+                    entries { id locationOrigin cropVariety performanceStat }
+                    pageMeta { nextCursor }
+                }
+                preflightOptions {
+                    version
+                    varietyOptions(limit: $limit, cursor: $cursor) { options { id } }
+                    locationOptions(limit: $limit, cursor: $cursor) { options { id } }
+                    campaignOptions(limit: $limit, cursor: $cursor) {
+                        options { id cropVariant }
+                        pageMeta { nextCursor }
+                    }
+                }
+            }
+        """
+        variables = {"limit": 10, "cursor": ""}
+
+        sync_result = STRAWBERRY_SCHEMA.execute_sync(query, variable_values=variables)
+        async_result = async_to_sync(ASYNC_STRAWBERRY_SCHEMA.execute)(
+            query, variable_values=variables
+        )
+
+        self.assertIsNone(sync_result.errors)
+        self.assertIsNone(async_result.errors)
+        self.assertEqual(sync_result.data, async_result.data)
+
+    def test_metrics_count_the_queries_of_the_database_pool_threads(self) -> None:
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+
+        get_page_cache().clear()
+        result = async_to_sync(ASYNC_STRAWBERRY_SCHEMA.execute)(
+            'query Entries { campaignDocuments(limit: 5, cursor: "") '
+            "{ entries { id } } }"
+        )
+
+        self.assertIsNone(result.errors)
+        # The data version lookup and the page query.
+        self.assertEqual(
+            RESOLVER_QUERIES.series[("Entries", "MixedType.campaignDocuments")][-1], 2
+        )
+
+
+class TestGraphQLDocuments(TestCase):
+
+    QUERY = "{ preflightOptions { version } }"
+
+    def post_graphql(self, data: dict) -> dict:
+        response = self.client.post(
+            "/api/v1/", data=data, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def test_document_cache_counts_the_repeated_documents_as_hits(self) -> None:
+        document_cache = DocumentCache(max_entries=10)
+        schema = STRAWBERRY_SCHEMA._schema
+
+        for _ in range(4):
+            document = document_cache.parse(self.QUERY)
+            errors = document_cache.validate(schema, self.QUERY, document, ())
+
+            self.assertEqual(errors, [])
+
+        self.assertEqual(document_cache.counters["parse_misses"], 1)
+        self.assertEqual(document_cache.counters["parse_hits"], 3)
+        self.assertEqual(document_cache.hit_ratio(), {"parse": 0.75, "validation": 0.75})
+
+    def test_schema_reuses_the_cached_documents(self) -> None:
+        STRAWBERRY_SCHEMA.execute_sync(self.QUERY)
+        parse_hits = get_document_cache().counters["parse_hits"]
+
+        result = STRAWBERRY_SCHEMA.execute_sync(self.QUERY)
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(get_document_cache().counters["parse_hits"], parse_hits + 1)
+
+    def test_schema_reports_the_syntax_errors(self) -> None:
+        result = STRAWBERRY_SCHEMA.execute_sync("{ preflightOptions { version }")
+
+        self.assertIsNotNone(result.errors)
+
+    def test_persisted_query_is_served_by_its_hash(self) -> None:
+        persisted_query = {
+            "persistedQuery": {"version": 1, "sha256Hash": hash_query(self.QUERY)}
+        }
+
+        response_data = self.post_graphql({"extensions": persisted_query})
+
+        self.assertEqual(
+            response_data["errors"][0]["extensions"]["code"],
+            "PERSISTED_QUERY_NOT_FOUND",
+        )
+
+        response_data = self.post_graphql(
+            {"query": self.QUERY, "extensions": persisted_query}
+        )
+
+        self.assertNotIn("errors", response_data)
+
+        response_data = self.post_graphql({"extensions": persisted_query})
+
+        self.assertNotIn("errors", response_data)
+        self.assertIn("version", response_data["data"]["preflightOptions"])
+
+    def test_persisted_query_with_a_wrong_hash_is_rejected(self) -> None:
+        response_data = self.post_graphql(
+            {
+                "query": self.QUERY,
+                "extensions": {"persistedQuery": {"version": 1, "sha256Hash": "abc"}},
+            }
+        )
+
+        self.assertEqual(
+            response_data["errors"][0]["extensions"]["code"],
+            "INVALID_PERSISTED_QUERY_HASH",
+        )
+
+
+@override_settings(EXPORT={"CHUNK_SIZE": 4})
+class TestCampaignDocumentsExport(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        create_campaign_documents(10)
+
+    def read_streaming_content(self, response) -> str:
+        self.assertEqual(response.status_code, 200)
+
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_export_streams_all_the_documents_as_ndjson(self) -> None:
+        with self.assertNumQueries(3):
+            content = self.read_streaming_content(self.client.get("/api/v1/export/"))
+
+        exported_documents = [json.loads(line) for line in content.splitlines()]
+
+        self.assertEqual(
+            [document["id"] for document in exported_documents],
+            list(
+                CampaignDocumentsModel.objects.order_by("id").values_list("id", flat=True)
+            ),
+        )
+        self.assertEqual(exported_documents[0]["location_origin"], "Region 0")
+        self.assertEqual(exported_documents[0]["performance_stat"], 100.0)
+
+    def test_export_honors_the_search_filters_as_csv(self) -> None:
+        location = LocationOptionsModel.objects.order_by("id").first()
+        content = self.read_streaming_content(
+            self.client.get(
+                "/api/v1/export/",
+                {"format": "csv", "location_id": location.id},  # type: ignore
+            )
+        )
+
+        rows = list(csv.reader(content.splitlines()))
+
+        self.assertEqual(rows[0][:3], ["id", "reference", "paper_type"])
+        self.assertEqual(
+            len(rows) - 1,
+            CampaignDocumentsModel.objects.filter(location_origin=location).count(),
+        )
+
+    def test_export_streams_each_chunk_through_the_asgi_handler(self) -> None:
+        queried_chunks: list[list] = []
+
+        def record_chunks(**kwargs) -> typing.Iterator[list]:
+            for chunk in iterate_cursor_chunks(**kwargs):
+                queried_chunks.append(chunk)
+                yield chunk
+
+        async def read_streaming_parts() -> list[tuple[str, int]]:
+            response = await AsyncClient().get("/api/v1/export/", {"format": "csv"})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+
+            # Each part is kept with the amount of chunks queried before it was sent.
+            return [
+                (part.decode("utf-8"), len(queried_chunks))
+                async for part in response.streaming_content
+            ]
+
+        with mock.patch("api.views.iterate_cursor_chunks", record_chunks):
+            parts = async_to_sync(read_streaming_parts)()
+
+        self.assertEqual(
+            [(content.count("\n"), chunk_count) for content, chunk_count in parts],
+            [(1, 0), (4, 1), (4, 2), (2, 3)],
+        )
+
+    def test_export_queries_the_chunks_in_the_replica_scope_of_the_request(
+        self,
+    ) -> None:
+        chunk_scopes: list[ReplicaReads | None] = []
+
+        def record_scopes(**kwargs) -> typing.Iterator[list]:
+            for chunk in iterate_cursor_chunks(**kwargs):
+                chunk_scopes.append(_replica_reads.get())
+                yield chunk
+
+        with mock.patch("api.views.iterate_cursor_chunks", record_scopes):
+            response = self.client.get("/api/v1/export/")
+
+            # The chunks are queried once the middlewares returned.
+            self.assertEqual(chunk_scopes, [])
+            self.read_streaming_content(response)
+
+        self.assertEqual(len(chunk_scopes), 3)
+        self.assertIsInstance(chunk_scopes[0], ReplicaReads)
+        self.assertTrue(all(scope is chunk_scopes[0] for scope in chunk_scopes))
+
+    def test_export_rejects_invalid_cursors(self) -> None:
+        response = self.client.get("/api/v1/export/", {"cursor": "AQAAAAAA"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TestCampaignStatistics(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        create_campaign_documents(24)
+
+    def execute_statistics_query(self, variables: dict) -> list[dict]:
+        result = STRAWBERRY_SCHEMA.execute_sync(
+            """
+            query ($stat: CampaignStat!, $groupBy: [StatisticsGroup!]!,
+                   $filters: CampaignDocumentsFilterInput) {
+                campaignStatistics(stat: $stat, groupBy: $groupBy, filters: $filters) {
+                    varietyId variety locationId location year reference
+                    count mean min max stddev
+                }
+            }
+            """,
+            variable_values=variables,
+        )
+
+        self.assertIsNone(result.errors)
+
+        return result.data["campaignStatistics"]  # type: ignore
+
+    def test_statistics_are_grouped_by_variety_and_year_in_sql(self) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            groups = self.execute_statistics_query(
+                {"stat": "PERFORMANCE", "groupBy": ["VARIETY", "YEAR"]}
+            )
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn("GROUP BY", queries[0]["sql"])
+        self.assertEqual(len(groups), 12)
+        self.assertEqual(sum(group["count"] for group in groups), 24)
+
+        for group in groups:
+            performances = [
+                float(value)
+                for value in CampaignDocumentsModel.objects.filter(
+                    crop_variety_id=group["varietyId"],
+                    paper_creation_year__year=group["year"],
+                ).values_list("performance_stat", flat=True)
+            ]
+            mean = sum(performances) / len(performances)
+
+            self.assertEqual(group["count"], len(performances))
+            self.assertAlmostEqual(group["mean"], mean)
+            self.assertEqual(group["min"], min(performances))
+            self.assertEqual(group["max"], max(performances))
+            self.assertAlmostEqual(
+                group["stddev"],
+                (sum((value - mean) ** 2 for value in performances) / len(performances))
+                ** 0.5,
+            )
+            self.assertIsNone(group["location"])
+            self.assertIsNone(group["reference"])
+
+    def test_summary_statistics_match_the_campaign_documents_statistics(self) -> None:
+        filters = {"paper_creation_year__year__gte": 2021}
+
+        with CaptureQueriesContext(connection) as queries:
+            summary_groups = aggregate_campaign_statistics(
+                stat="performance_stat", group_by=["location", "year"], filters=filters
+            )
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn("campaign_summaries", queries[0]["sql"])
+        self.assertNotIn("campaign_documents", queries[0]["sql"])
+
+        # The reference filter is not covered by the summaries.
+        document_groups = aggregate_campaign_statistics(
+            stat="performance_stat",
+            group_by=["location", "year"],
+            filters={**filters, "reference": "RED INTA 2022"},
+        )
+
+        self.assertEqual(len(summary_groups), len(document_groups))
+
+        for summary_group, document_group in zip(summary_groups, document_groups):
+            for field in ["location_id", "location", "year", "count", "min", "max"]:
+                self.assertEqual(summary_group[field], document_group[field])
+
+            self.assertAlmostEqual(summary_group["mean"], document_group["mean"])
+            self.assertAlmostEqual(summary_group["stddev"], document_group["stddev"])
+
+    def test_statistics_without_groups_aggregate_all_the_documents(self) -> None:
+        groups = self.execute_statistics_query({"stat": "PH", "groupBy": []})
+
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0]["count"], 24)
+        self.assertEqual(groups[0]["mean"], 7.0)
+
+    def test_statistics_honor_the_search_filters(self) -> None:
+        location = LocationOptionsModel.objects.order_by("id").first()
+        groups = self.execute_statistics_query(
+            {
+                "stat": "PROTEINS_PERCENTAGE",
+                "groupBy": ["LOCATION"],
+                "filters": {"locationId": location.id},  # type: ignore
+            }
+        )
+
+        self.assertEqual(
+            groups,
+            [
+                {
+                    "varietyId": None,
+                    "variety": None,
+                    "locationId": location.id,  # type: ignore
+                    "location": "Region 0",
+                    "year": None,
+                    "reference": None,
+                    "count": 8,
+                    "mean": 11.0,
+                    "min": 11.0,
+                    "max": 11.0,
+                    "stddev": 0.0,
+                }
+            ],
+        )
+
+
+class TestColumnarAnalytics(QueryCountAssertionsMixin, TestCase):
+
+    def setUp(self) -> None:
+        bump_data_version()
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        create_campaign_documents(60)
+
+    def execute_query(self, query: str, variables: dict) -> dict:
+        result = STRAWBERRY_SCHEMA.execute_sync(query, variable_values=variables)
+
+        self.assertIsNone(result.errors)
+
+        return result.data  # type: ignore
+
+    def test_ranking_matches_the_database_means(self) -> None:
+        data = self.execute_query(
+            """
+            query ($filters: CampaignDocumentsFilterInput) {
+                campaignRanking(
+                    stat: PERFORMANCE, rankBy: [VARIETY], limit: 3, filters: $filters
+                ) { rank varietyId variety location count mean }
+            }
+            """,
+            {"filters": {"yearFrom": 2021}},
+        )
+
+        expected_groups = sorted(
+            aggregate_campaign_statistics(
+                stat="performance_stat",
+                group_by=["variety"],
+                filters={"paper_creation_year__year__gte": 2021},
+            ),
+            key=lambda group: -group["mean"],
+        )[:3]
+
+        self.assertEqual(
+            [group["rank"] for group in data["campaignRanking"]], [1, 2, 3]
+        )
+
+        for ranked_group, expected_group in zip(
+            data["campaignRanking"], expected_groups
+        ):
+            self.assertEqual(ranked_group["varietyId"], expected_group["variety_id"])
+            self.assertEqual(ranked_group["variety"], expected_group["variety"])
+            self.assertIsNone(ranked_group["location"])
+            self.assertEqual(ranked_group["count"], expected_group["count"])
+            self.assertAlmostEqual(ranked_group["mean"], expected_group["mean"])
+
+    def test_ranking_reads_the_location_and_year_slices(self) -> None:
+        location = LocationOptionsModel.objects.order_by("id").last()
+        filters = {"locationId": location.id, "yearFrom": 2021, "yearTo": 2022}  # type: ignore
+        data = self.execute_query(
+            """
+            query ($filters: CampaignDocumentsFilterInput) {
+                campaignRanking(
+                    stat: PERFORMANCE, rankBy: [YEAR], ascending: true, filters: $filters
+                ) { year count mean }
+            }
+            """,
+            {"filters": filters},
+        )
+
+        expected_groups = aggregate_campaign_statistics(
+            stat="performance_stat",
+            group_by=["year"],
+            filters={
+                "location_origin__id": location.id,  # type: ignore
+                "paper_creation_year__year__gte": 2021,
+                "paper_creation_year__year__lte": 2022,
+            },
+        )
+
+        self.assertEqual(
+            data["campaignRanking"],
+            sorted(
+                [
+                    {"year": group["year"], "count": group["count"], "mean": group["mean"]}
+                    for group in expected_groups
+                ],
+                key=lambda group: group["mean"],
+            ),
+        )
+
+    def test_ranking_rejects_the_limits_out_of_bounds(self) -> None:
+        for limit, message in [
+            (0, "Cannot query less than 1 entry"),
+            (1001, "Cannot query more than 1000 entries"),
+        ]:
+            with self.subTest(limit=limit):
+                result = STRAWBERRY_SCHEMA.execute_sync(
+                    """
+                    query ($limit: Int!) {
+                        campaignRanking(
+                            stat: PERFORMANCE, rankBy: [VARIETY], limit: $limit
+                        ) { rank }
+                    }
+                    """,
+                    variable_values={"limit": limit},
+                )
+
+                self.assertIsNone(result.data)
+                self.assertIn(message, result.errors[0].message)  # type: ignore
+
+    def test_percentiles_match_numpy_percentiles(self) -> None:
+        data = self.execute_query(
+            """
+            query {
+                campaignPercentiles(
+                    stat: PERFORMANCE, percentiles: [0, 25, 50, 90, 100],
+                    groupBy: [VARIETY, YEAR]
+                ) { varietyId year count values }
+            }
+            """,
+            {},
+        )
+
+        self.assertEqual(len(data["campaignPercentiles"]), 12)
+
+        for group in data["campaignPercentiles"]:
+            performances = [
+                float(value)
+                for value in CampaignDocumentsModel.objects.filter(
+                    crop_variety_id=group["varietyId"],
+                    paper_creation_year__year=group["year"],
+                ).values_list("performance_stat", flat=True)
+            ]
+
+            self.assertEqual(group["count"], len(performances))
+            np.testing.assert_allclose(
+                group["values"], np.percentile(performances, [0, 25, 50, 90, 100])
+            )
+
+    def test_snapshot_is_reused_until_the_data_changes(self) -> None:
+        query = "{ campaignRanking(stat: PH, rankBy: [REFERENCE]) { reference count } }"
+
+        self.execute_query(query, {})
+
+        with self.assertNumDataQueries(0):
+            data = self.execute_query(query, {})
+
+        self.assertEqual(
+            data["campaignRanking"], [{"reference": "RED INTA 2022", "count": 60}]
+        )
+
+        CampaignDocumentsModel.objects.filter(
+            id=CampaignDocumentsModel.objects.order_by("id").first().id  # type: ignore
+        ).delete()
+
+        self.assertEqual(self.execute_query(query, {})["campaignRanking"][0]["count"], 59)
+
+    def test_percentiles_out_of_range_are_rejected(self) -> None:
+        result = STRAWBERRY_SCHEMA.execute_sync(
+            "{ campaignPercentiles(stat: PH, percentiles: [101], groupBy: []) { count } }"
+        )
+
+        self.assertIsNotNone(result.errors)
+
+
+@override_settings(SPATIAL_INDEX={**settings.SPATIAL_INDEX, "CELL_SIZE": 1.0})
+class TestSpatialIndex(TestCase):
+
+    def setUp(self) -> None:
+        bump_data_version()
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        create_campaign_documents(70)
+
+    def test_viewport_returns_the_documents_inside_the_bounding_box(self) -> None:
+        result = STRAWBERRY_SCHEMA.execute_sync(
+            """
+            {
+                campaignDocumentsInViewport(
+                    viewport: {south: -36.5, west: -64.5, north: -34.5, east: -61.5},
+                    limit: 5
+                ) { totalCount entries { id latitude longitude } }
+            }
+            """
+        )
+
+        self.assertIsNone(result.errors)
+
+        expected_ids = list(
+            CampaignDocumentsModel.objects.filter(
+                latitude__gte=-36.5,
+                latitude__lte=-34.5,
+                longitude__gte=-64.5,
+                longitude__lte=-61.5,
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        viewport = result.data["campaignDocumentsInViewport"]  # type: ignore
+
+        self.assertEqual(viewport["totalCount"], len(expected_ids))
+        self.assertEqual(
+            [entry["id"] for entry in viewport["entries"]], expected_ids[:5]
+        )
+
+    def test_nearest_documents_match_a_brute_force_search(self) -> None:
+        result = STRAWBERRY_SCHEMA.execute_sync(
+            """
+            {
+                nearestCampaignDocuments(latitude: -35.2, longitude: -62.9, limit: 12) {
+                    distance document { id locationOrigin }
+                }
+            }
+            """
+        )
+
+        self.assertIsNone(result.errors)
+
+        campaign_documents = list(
+            CampaignDocumentsModel.objects.values_list("id", "latitude", "longitude")
+        )
+        distances = haversine_km(
+            -35.2,
+            -62.9,
+            np.array([float(latitude) for _, latitude, _ in campaign_documents]),
+            np.array([float(longitude) for _, _, longitude in campaign_documents]),
+        )
+        nearest = result.data["nearestCampaignDocuments"]  # type: ignore
+
+        self.assertEqual(len(nearest), 12)
+        np.testing.assert_allclose(
+            [document["distance"] for document in nearest], np.sort(distances)[:12]
+        )
+        self.assertIsNotNone(nearest[0]["document"]["locationOrigin"])
+
+    def test_nearest_documents_are_all_the_documents_when_there_are_fewer(
+        self,
+    ) -> None:
+        positions, distances = get_spatial_index().find_nearest(
+            latitude=40, longitude=100, count=100
+        )
+
+        self.assertEqual(len(positions), 70)
+        self.assertTrue(np.all(np.diff(distances) >= 0))
+
+    def test_nearest_documents_skip_the_documents_deleted_after_the_build(
+        self,
+    ) -> None:
+        query = """
+            {
+                nearestCampaignDocuments(latitude: -35.2, longitude: -62.9, limit: 12) {
+                    distance document { id latitude longitude }
+                }
+            }
+        """
+        index = get_spatial_index()
+        nearest = STRAWBERRY_SCHEMA.execute_sync(query).data[  # type: ignore
+            "nearestCampaignDocuments"
+        ]
+        CampaignDocumentsModel.objects.filter(id=nearest[0]["document"]["id"]).delete()
+
+        with mock.patch("api.schema.get_spatial_index", return_value=index):
+            result = STRAWBERRY_SCHEMA.execute_sync(query)
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["nearestCampaignDocuments"], nearest[1:])  # type: ignore
+
+        for entry in nearest[1:]:
+            self.assertAlmostEqual(
+                entry["distance"],
+                haversine_km(
+                    -35.2,
+                    -62.9,
+                    np.array([entry["document"]["latitude"]]),
+                    np.array([entry["document"]["longitude"]]),
+                )[0],
+            )
+
+    def test_nearest_documents_are_found_across_the_antimeridian(self) -> None:
+        campaign_documents = list(CampaignDocumentsModel.objects.order_by("id")[:3])
+
+        for campaign_document, longitude in zip(
+            campaign_documents, [179.95, -179.95, 178]
+        ):
+            campaign_document.latitude = 0
+            campaign_document.longitude = longitude
+            campaign_document.save()
+
+        for longitude in [179.99, -179.99]:
+            with self.subTest(longitude=longitude):
+                positions, distances = get_spatial_index().find_nearest(
+                    latitude=0, longitude=longitude, count=2
+                )
+
+                self.assertEqual(
+                    sorted(get_spatial_index().ids[positions].tolist()),
+                    [campaign_documents[0].id, campaign_documents[1].id],
+                )
+                self.assertTrue(np.all(distances < 10))
+
+        # The viewports keep splitting at the antimeridian.
+        positions = get_spatial_index().find_in_viewport(
+            south=-1, west=179, north=1, east=-179
+        )
+
+        self.assertEqual(len(positions), 2)
+
+    def test_clusters_aggregate_the_documents_of_each_zoom_level(self) -> None:
+        query = """
+            query ($zoom: Int!) {
+                campaignClusters(
+                    viewport: {south: -60, west: -80, north: -20, east: -50}, zoom: $zoom
+                ) { latitude longitude count meanPerformance }
+            }
+        """
+        performances = [
+            float(value)
+            for value in CampaignDocumentsModel.objects.values_list(
+                "performance_stat", flat=True
+            )
+        ]
+
+        for zoom, expected_clusters in [(0, 1), (12, 35)]:
+            result = STRAWBERRY_SCHEMA.execute_sync(query, variable_values={"zoom": zoom})
+
+            self.assertIsNone(result.errors)
+
+            clusters = result.data["campaignClusters"]  # type: ignore
+
+            self.assertEqual(len(clusters), expected_clusters)
+            self.assertEqual(sum(cluster["count"] for cluster in clusters), 70)
+            self.assertAlmostEqual(
+                sum(cluster["meanPerformance"] * cluster["count"] for cluster in clusters),
+                sum(performances),
+            )
+
+        country_cluster = STRAWBERRY_SCHEMA.execute_sync(
+            query, variable_values={"zoom": 0}
+        ).data["campaignClusters"][0]  # type: ignore
+
+        self.assertAlmostEqual(
+            country_cluster["latitude"],
+            sum(
+                float(latitude)
+                for latitude in CampaignDocumentsModel.objects.values_list(
+                    "latitude", flat=True
+                )
+            )
+            / 70,
+        )
+
+
+class TestBenchmarks(TestCase):
+
+    def setUp(self) -> None:
+        create_campaign_documents(30)
+        bump_data_version()
+
+    def test_command_writes_the_results_as_json(self) -> None:
+        stdout = io.StringIO()
+        call_command(
+            "run_benchmarks",
+            repeat=3,
+            limit=10,
+            label="test",
+            only=["pagination.", "resolver."],
+            stdout=stdout,
+        )
+
+        report = json.loads(stdout.getvalue())
+        results = {result["name"]: result for result in report["results"]}
+
+        self.assertEqual(report["metadata"]["label"], "test")
+        self.assertEqual(report["metadata"]["dataset"]["campaign_documents"], 30)
+        self.assertIn("pagination.resolve_cursor", results)
+        self.assertIn("resolver.campaign_clusters", results)
+        self.assertFalse(any(name.startswith("schema.") for name in results))
+        # Each run also reads the data version that stamps the cached pages.
+        self.assertEqual(results["pagination.resolve_cursor"]["queries"], 2)
+        self.assertEqual(results["pagination.resolve_cursor_cached"]["queries"], 1)
+
+        for result in results.values():
+            self.assertLessEqual(result["min_ms"], result["median_ms"])
+            self.assertLessEqual(result["median_ms"], result["max_ms"])
+
+
+class TestResolverMetrics(TestCase):
+
+    query = """
+        query Dashboard {
+            campaignDocuments(limit: 5, cursor: "") { entries { id } }
+            preflightOptions {
+                varietyOptions(limit: 3, cursor: "") { options { id } }
+            }
+        }
+    """
+
+    def setUp(self) -> None:
+        create_campaign_documents(12)
+        bump_data_version()
+        get_page_cache().clear()
+
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+
+    def test_resolvers_are_measured_by_operation_and_field(self) -> None:
+        result = STRAWBERRY_SCHEMA.execute_sync(self.query)
+
+        self.assertIsNone(result.errors)
+
+        documents_series = ("Dashboard", "MixedType.campaignDocuments")
+        varieties_series = ("Dashboard", "PreflightOptionsType.varietyOptions")
+
+        # The series end with the sum of the observed values. The first resolver
+        # also reads the data version of the operation.
+        self.assertEqual(RESOLVER_QUERIES.series[documents_series][-1], 2)
+        self.assertEqual(RESOLVER_ROWS.series[documents_series][-1], 5)
+        self.assertEqual(RESOLVER_ROWS.series[varieties_series][-1], 3)
+        self.assertGreater(RESOLVER_DURATION.series[documents_series][-1], 0)
+        # The default resolvers of the type attributes are not measured.
+        self.assertFalse(
+            any(
+                field.startswith("CampaignDocumentType.")
+                for _, field in RESOLVER_ROWS.series
+            )
+        )
+
+    def test_metrics_endpoint_serves_the_prometheus_text_format(self) -> None:
+        STRAWBERRY_SCHEMA.execute_sync(self.query)
+
+        response = self.client.get("/metrics")
+        content = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain; version=0.0.4")
+        )
+        self.assertIn(
+            "# TYPE agrovar_graphql_resolver_duration_seconds histogram", content
+        )
+        self.assertIn(
+            'agrovar_graphql_resolver_queries_bucket{operation="Dashboard",'
+            'field="MixedType.campaignDocuments",le="2"} 1',
+            content,
+        )
+        self.assertIn(
+            'agrovar_graphql_resolver_queries_count{operation="Dashboard",'
+            'field="MixedType.campaignDocuments"} 1',
+            content,
+        )
+        self.assertIn(
+            'agrovar_graphql_operation_duration_seconds_count{operation="Dashboard"} 1',
+            content,
+        )
+        self.assertIn("agrovar_graphql_document_cache_hit_ratio", content)
+
+    def test_metrics_endpoint_adds_up_the_metrics_of_every_worker(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with override_settings(
+            GRAPHQL_METRICS={**settings.GRAPHQL_METRICS, "DIRECTORY": directory}
+        ):
+            STRAWBERRY_SCHEMA.execute_sync(self.query)
+
+            # Another worker process served the same operation.
+            other_path = os.path.join(directory, f"{os.getppid()}-other.json")
+
+            with open(other_path, "w") as metrics_file:
+                json.dump(collect_process_metrics(), metrics_file)
+
+            content = self.client.get("/metrics").content.decode()
+
+        self.assertEqual(len(glob.glob(os.path.join(directory, "*.json"))), 2)
+        self.assertIn(
+            'agrovar_graphql_resolver_queries_count{operation="Dashboard",'
+            'field="MixedType.campaignDocuments"} 2',
+            content,
+        )
+        self.assertIn(
+            'agrovar_graphql_operation_duration_seconds_count{operation="Dashboard"} 2',
+            content,
+        )
+
+    def test_metrics_endpoint_folds_the_metrics_of_the_exited_workers(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        series = (
+            'agrovar_graphql_operation_duration_seconds_count{operation="Dashboard"} 3'
+        )
+
+        with override_settings(
+            GRAPHQL_METRICS={**settings.GRAPHQL_METRICS, "DIRECTORY": directory}
+        ):
+            STRAWBERRY_SCHEMA.execute_sync(self.query)
+
+            # Two replaced worker processes served the same operation.
+            for _ in range(2):
+                worker = subprocess.Popen(["true"])
+                worker.wait()
+
+                with open(
+                    os.path.join(directory, f"{worker.pid}-exited.json"), "w"
+                ) as metrics_file:
+                    json.dump(collect_process_metrics(), metrics_file)
+
+            first_content = self.client.get("/metrics").content.decode()
+            second_content = self.client.get("/metrics").content.decode()
+
+        self.assertEqual(
+            sorted(glob.glob(os.path.join(directory, "*.json"))),
+            sorted(
+                [
+                    get_process_metrics_path(directory),
+                    os.path.join(directory, "exited.json"),
+                ]
+            ),
+        )
+        self.assertIn(series, first_content)
+        self.assertIn(series, second_content)
+
+    def test_histogram_groups_the_series_over_the_limit(self) -> None:
+        histogram = Histogram(
+            "test",
+            "A test histogram.",
+            label_names=["operation"],
+            buckets=(1, 5),
+            max_series=2,
+        )
+
+        for operation, value in [("a", 1), ("b", 3), ("c", 10), ("d", 0)]:
+            histogram.observe(value, operation)
+
+        self.assertEqual(histogram.series[("a",)], [1, 0, 0, 1])
+        self.assertEqual(histogram.series[("other",)], [1, 0, 1, 10])
+        self.assertIn(
+            'test_bucket{operation="other",le="+Inf"} 2', list(histogram.render())
+        )
+
+    def test_slow_operations_are_logged_when_enabled(self) -> None:
+        with self.assertNoLogs("api.extensions"):
+            STRAWBERRY_SCHEMA.execute_sync(self.query)
+
+        with override_settings(
+            GRAPHQL_METRICS={**settings.GRAPHQL_METRICS, "SLOW_OPERATION_SECONDS": 0}
+        ), self.assertLogs("api.extensions", "WARNING") as logs:
+            STRAWBERRY_SCHEMA.execute_sync(self.query)
+
+        self.assertIn("Slow GraphQL operation Dashboard", logs.output[0])
+        self.assertIn("preflightOptions.varietyOptions", logs.output[0])
+
+
+class TestQueryCost(TestCase):
+
+    def estimate(self, query: str, variables: dict | None = None) -> int:
+        return estimate_query_cost(
+            STRAWBERRY_SCHEMA._schema, parse(query), variables=variables
+        )
+
+    def test_cost_multiplies_the_limits_by_the_weights_and_depth(self) -> None:
+        self.assertEqual(
+            self.estimate(
+                '{ campaignDocuments(limit: 50, cursor: "") { entries { id } } }'
+            ),
+            100,
+        )
+        # The preflight options weight plus its children at depth two.
+        self.assertEqual(
+            self.estimate(
+                """
+                query ($limit: Int!) {
+                    preflightOptions {
+                        version
+                        varietyOptions(limit: $limit, cursor: "") { options { id } }
+                        ...Locations
+                    }
+                }
+                fragment Locations on PreflightOptionsType {
+                    locationOptions(limit: 5, cursor: "") { options { id } }
+                }
+                """,
+                {"limit": 10},
+            ),
+            1 + 10 * 2 + 5 * 2,
+        )
+        # The default limit of the viewport search is 100.
+        self.assertEqual(
+            self.estimate(
+                "{ campaignDocumentsInViewport(viewport: "
+                "{south: 0, west: 0, north: 1, east: 1}) { totalCount } }"
+            ),
+            200,
+        )
+        self.assertEqual(self.estimate("{ __schema { types { name } } }"), 0)
+
+    def test_expensive_operations_are_rejected_before_any_query(self) -> None:
+        aliases = "\n".join(
+            f"""
+            options{index}: preflightOptions {{
+                varietyOptions(limit: 1000, cursor: "") {{ options {{ id }} }}
+                locationOptions(limit: 1000, cursor: "") {{ options {{ id }} }}
+                campaignOptions(limit: 1000, cursor: "") {{ options {{ id }} }}
+            }}
+            """
+            for index in range(3)
+        )
+
+        with self.assertNumQueries(0):
+            result = STRAWBERRY_SCHEMA.execute_sync(f"{{ {aliases} }}")
+
+        self.assertIsNone(result.data)
+        self.assertEqual(result.errors[0].extensions["code"], "QUERY_TOO_EXPENSIVE")
+        self.assertEqual(result.errors[0].extensions["cost"], 3 * (1 + 8000))
+
+    def test_clients_over_their_budget_are_throttled(self) -> None:
+        data = {
+            "query": '{ campaignDocuments(limit: 50, cursor: "") { entries { id } } }'
+        }
+        query_cost = {
+            **settings.QUERY_COST,
+            "MAX_COST": 10000,
+            "CLIENT_BUDGET": 150,
+            "BUDGET_WINDOW": 60,
+        }
+        cache.clear()
+
+        with override_settings(QUERY_COST=query_cost), mock.patch(
+            "api.cost._cost_budgets", None
+        ):
+            first_response = self.client.post(
+                "/api/v1/", data=data, content_type="application/json"
+            )
+            second_response = self.client.post(
+                "/api/v1/", data=data, content_type="application/json"
+            )
+            other_client_response = self.client.post(
+                "/api/v1/",
+                data=data,
+                content_type="application/json",
+                REMOTE_ADDR="10.0.0.2",
+            )
+
+        self.assertEqual(first_response.status_code, 200)
+        self.assertEqual(second_response.status_code, 429)
+        self.assertEqual(second_response["Retry-After"], "20")
+        self.assertEqual(
+            second_response.json()["errors"][0]["extensions"]["code"], "THROTTLED"
+        )
+        self.assertEqual(other_client_response.status_code, 200)
+
+    def test_budget_refills_over_the_window(self) -> None:
+        budgets = CostBudgets(budget=100, window=10, max_clients=10)
+
+        with mock.patch("api.cost.time.monotonic", return_value=0):
+            self.assertEqual(budgets.spend("client", 80), 0)
+            self.assertEqual(budgets.spend("client", 40), 2)
+
+        with mock.patch("api.cost.time.monotonic", return_value=2):
+            self.assertEqual(budgets.spend("client", 40), 0)
+
+    def test_budgets_are_shared_through_the_django_cache(self) -> None:
+        cache.clear()
+
+        # Each worker process has its own instance.
+        worker_budgets = [
+            DjangoCostBudgets(alias="default", budget=100, window=10) for _ in range(2)
+        ]
+
+        with mock.patch("api.cost.time.time", return_value=1000):
+            self.assertEqual(worker_budgets[0].spend("client", 80), 0)
+            self.assertEqual(worker_budgets[1].spend("client", 40), 2)
+            self.assertEqual(worker_budgets[1].spend("other", 40), 0)
+
+        # The sliding window covers half of the previous window.
+        with mock.patch("api.cost.time.time", return_value=1015):
+            self.assertEqual(worker_budgets[1].spend("client", 60), 0)
+            self.assertEqual(worker_budgets[0].spend("client", 10), 1)
+
+    def test_client_address_is_taken_from_the_trusted_proxies_header(self) -> None:
+        request = RequestFactory().get(
+            "/api/v1/",
+            REMOTE_ADDR="10.0.0.1",
+            HTTP_X_FORWARDED_FOR="1.1.1.1, 203.0.113.7, 10.0.0.2",
+        )
+
+        self.assertEqual(get_client_address(request), "10.0.0.1")
+
+        for trusted_proxies, client_address in [(2, "203.0.113.7"), (4, "10.0.0.1")]:
+            with override_settings(
+                QUERY_COST={**settings.QUERY_COST, "TRUSTED_PROXIES": trusted_proxies}
+            ):
+                self.assertEqual(get_client_address(request), client_address)
+
+
+class TestGraphQLHTTPCache(TestCase):
+
+    QUERY = {"query": '{ campaignDocuments(limit: 5, cursor: "") { entries { id } } }'}
+
+    def setUp(self) -> None:
+        create_campaign_documents(8)
+        bump_data_version()
+
+    def test_get_queries_are_revalidated_without_executing_them(self) -> None:
+        response = self.client.get("/api/v1/", self.QUERY)
+        etag = response["ETag"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        self.assertEqual(
+            len(response.json()["data"]["campaignDocuments"]["entries"]), 5
+        )
+
+        with mock.patch.object(STRAWBERRY_SCHEMA, "execute_sync") as execute_sync:
+            not_modified_response = self.client.get(
+                "/api/v1/", self.QUERY, HTTP_IF_NONE_MATCH=etag
+            )
+            weak_response = self.client.get(
+                "/api/v1/", self.QUERY, HTTP_IF_NONE_MATCH=f"W/{etag}"
+            )
+
+        execute_sync.assert_not_called()
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response["ETag"], etag)
+        self.assertEqual(weak_response.status_code, 304)
+
+        # Another query has its own ETag.
+        other_response = self.client.get(
+            "/api/v1/",
+            {"query": "{ preflightOptions { version } }"},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(other_response.status_code, 200)
+        self.assertNotEqual(other_response["ETag"], etag)
+
+    def test_etags_carry_the_data_version_of_the_execution(self) -> None:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/v1/", self.QUERY)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith(f'"{get_data_version()}-'))
+        self.assertEqual(
+            sum(
+                '"data_version"' in query["sql"]
+                for query in context.captured_queries
+            ),
+            1,
+        )
+
+    def test_async_view_reads_the_etag_version_out_of_the_event_loop(self) -> None:
+        view = AsyncGraphQLView.as_view(schema=ASYNC_STRAWBERRY_SCHEMA)
+        etag = self.client.get("/api/v1/", self.QUERY)["ETag"]
+
+        # The database queries raise SynchronousOnlyOperation on the event loop.
+        response = async_to_sync(view)(
+            AsyncRequestFactory().get(
+                "/api/v1/", self.QUERY, headers={"If-None-Match": etag}
+            )
+        )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_data_changes_invalidate_the_etags(self) -> None:
+        etag = self.client.get("/api/v1/", self.QUERY)["ETag"]
+
+        bump_data_version()
+        response = self.client.get("/api/v1/", self.QUERY, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_only_successful_get_queries_are_cacheable(self) -> None:
+        post_response = self.client.post(
+            "/api/v1/", data=self.QUERY, content_type="application/json"
+        )
+        error_response = self.client.get(
+            "/api/v1/",
+            {"query": '{ campaignDocuments(limit: 5, cursor: "?") { entries { id } } }'},
+        )
+
+        self.assertFalse(post_response.has_header("ETag"))
+        self.assertFalse(error_response.has_header("ETag"))
+        self.assertEqual(error_response["Cache-Control"], "no-store")
+
+        with override_settings(GRAPHQL_HTTP_CACHE={"MAX_AGE": 0}):
+            response = self.client.get("/api/v1/", self.QUERY)
+
+        self.assertEqual(response["Cache-Control"], "no-cache")
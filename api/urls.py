@@ -15,13 +15,28 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from strawberry.django.views import GraphQLView
 
-from api.schema import STRAWBERRY_SCHEMA
+from api.schema import ASYNC_STRAWBERRY_SCHEMA, STRAWBERRY_SCHEMA
+from api.views import (
+    AsyncGraphQLView,
+    GraphQLView,
+    campaign_documents_export_view,
+    metrics_view,
+    preflight_snapshot_view,
+)
+
+if settings.ASYNC_GRAPHQL["ENABLED"]:
+    graphql_view = AsyncGraphQLView.as_view(schema=ASYNC_STRAWBERRY_SCHEMA)
+else:
+    graphql_view = GraphQLView.as_view(schema=STRAWBERRY_SCHEMA)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("api/v1/", GraphQLView.as_view(schema=STRAWBERRY_SCHEMA)),
+    path("api/v1/", graphql_view),
+    path("api/v1/preflight/", preflight_snapshot_view),
+    path("api/v1/export/", campaign_documents_export_view),
+    path("metrics", metrics_view),
 ]
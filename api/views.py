@@ -0,0 +1,303 @@
+import csv
+import itertools
+import json
+import typing
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotFound,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils.http import parse_etags, urlencode
+from django.views.decorators.http import require_GET
+from strawberry.django import views as strawberry_views
+from strawberry.types import ExecutionResult
+from strawberry.unset import UNSET
+
+from api.concurrency import iterate_in_context, iterate_in_thread
+from api.documents import PersistedQueryError, hash_query, resolve_persisted_query
+from api.metrics import render_metrics
+from api.pagination import Pagination, iterate_cursor_chunks
+from api.preflight import get_preflight_snapshot
+from api.projection import CAMPAIGN_DOCUMENT_COLUMNS
+from api.schemas.campaign_types import CampaignDocumentsFilterInput
+from repository import models
+from repository.versioning import DataVersionScope, get_data_version
+
+
+class PersistedQueriesMixin:
+    """Adds the automatic persisted queries protocol to the strawberry views, so the
+    clients can send the hash of a known query instead of the whole query."""
+
+    def parse_json(self, data: str | bytes) -> typing.Any:
+        return resolve_persisted_query(super().parse_json(data))  # type: ignore
+
+    def parse_query_params(self, params: typing.Mapping) -> dict[str, typing.Any]:
+        params = super().parse_query_params(params)  # type: ignore
+
+        extensions = params.get("extensions")
+
+        if isinstance(extensions, list):
+            extensions = extensions[0]
+
+        if extensions:
+            params["extensions"] = super().parse_json(extensions)  # type: ignore
+
+        return resolve_persisted_query(params)
+
+
+def get_cache_control() -> str:
+    """Returns the `Cache-Control` header of the cacheable GraphQL responses."""
+    max_age = settings.GRAPHQL_HTTP_CACHE["MAX_AGE"]
+
+    if max_age <= 0:
+        return "no-cache"
+
+    return f"public, max-age={max_age}"
+
+
+class HTTPCacheMixin:
+    """Adds HTTP caching to the queries sent with GET requests. Their responses
+    have an ETag of the repository data version and the query parameters, so the
+    clients and the reverse proxies revalidate them with `If-None-Match`, and the
+    matching requests are answered with a 304 response without executing them.
+
+    The views run each request in a `DataVersionScope`, so the ETag carries the
+    data version that the operation is executed with.
+    """
+
+    def get_query_etag(self, request: HttpRequest) -> str | None:
+        """Returns the ETag of a GET query request, or None for any other request."""
+        if request.method != "GET" or not {"query", "extensions"} & request.GET.keys():
+            return None
+
+        query_params = urlencode(sorted(request.GET.lists()), doseq=True)
+
+        return f'"{get_data_version()}-{hash_query(query_params)[:32]}"'
+
+    def get_not_modified_response(self, request: HttpRequest) -> HttpResponse | None:
+        """Returns a 304 response when the request ETag is still the current one,
+        otherwise keeps the ETag to be added to the response."""
+        query_etag = self.get_query_etag(request)
+        request.graphql_etag = query_etag  # type: ignore
+
+        if query_etag is None:
+            return None
+
+        request_etags = [
+            etag.removeprefix("W/")
+            for etag in parse_etags(request.headers.get("If-None-Match", ""))
+        ]
+
+        if query_etag in request_etags or "*" in request_etags:
+            return HttpResponseNotModified(
+                headers={"ETag": query_etag, "Cache-Control": get_cache_control()}
+            )
+
+        return None
+
+    def create_response(self, response_data, sub_response) -> HttpResponse:
+        response = super().create_response(response_data, sub_response)  # type: ignore
+        query_etag = getattr(self.request, "graphql_etag", None)  # type: ignore
+
+        if query_etag is None:
+            return response
+
+        # The errors may be transient, like a throttled client, so they are not cached.
+        if response.status_code != 200 or response_data.get("errors"):
+            response["Cache-Control"] = "no-store"
+        else:
+            response["ETag"] = query_etag
+            response["Cache-Control"] = get_cache_control()
+
+        return response
+
+
+class GraphQLView(HTTPCacheMixin, PersistedQueriesMixin, strawberry_views.GraphQLView):
+    """Represents the GraphQL endpoint view."""
+
+    def run(self, request, context=UNSET, root_value=UNSET) -> HttpResponse:
+        with DataVersionScope():
+            not_modified_response = self.get_not_modified_response(request)
+
+            if not_modified_response is not None:
+                return not_modified_response
+
+            return super().run(request, context, root_value)
+
+    def execute_operation(self, request, context, root_value) -> ExecutionResult:
+        try:
+            return super().execute_operation(request, context, root_value)
+        except PersistedQueryError as error:
+            return ExecutionResult(data=None, errors=[error.as_graphql_error()])
+
+
+class AsyncGraphQLView(
+    HTTPCacheMixin, PersistedQueriesMixin, strawberry_views.AsyncGraphQLView
+):
+    """Represents the GraphQL endpoint view of the async execution mode."""
+
+    async def run(self, request, context=UNSET, root_value=UNSET) -> HttpResponse:
+        with DataVersionScope():
+            # The data version is read from the database, out of the event loop.
+            not_modified_response = await sync_to_async(
+                self.get_not_modified_response
+            )(request)
+
+            if not_modified_response is not None:
+                return not_modified_response
+
+            return await super().run(request, context, root_value)
+
+    async def execute_operation(self, request, context, root_value) -> ExecutionResult:
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as error:
+            return ExecutionResult(data=None, errors=[error.as_graphql_error()])
+
+
+@require_GET
+def preflight_snapshot_view(request: HttpRequest) -> HttpResponse:
+    """Serves the pre-serialized preflight options snapshot. The clients that send
+    the snapshot version in the `If-None-Match` header skip the download when the
+    options have not changed.
+    """
+    snapshot = get_preflight_snapshot()
+    snapshot_etag = f'"{snapshot.version}"'
+
+    if request.headers.get("If-None-Match") == snapshot_etag:
+        return HttpResponseNotModified(headers={"ETag": snapshot_etag})
+
+    return HttpResponse(
+        snapshot.payload,
+        content_type="application/json",
+        headers={"ETag": snapshot_etag, "X-Preflight-Version": str(snapshot.version)},
+    )
+
+
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Serves the GraphQL resolvers metrics of this process in the Prometheus text
+    format."""
+    if not settings.GRAPHQL_METRICS["ENABLED"]:
+        return HttpResponseNotFound()
+
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+class Echo:
+    """Represents a file-like object that returns the written value, so the csv
+    writer rows can be streamed without a buffer."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def serialize_export_value(value: typing.Any) -> typing.Any:
+    """Returns the given column value as a JSON value."""
+    if isinstance(value, Decimal):
+        return float(value)
+
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+
+    return value
+
+
+EXPORT_FIELDS = [field for field in CAMPAIGN_DOCUMENT_COLUMNS if field != "id"]
+"""Represents the exported columns, after the id."""
+
+EXPORT_FILTERS = {
+    "location_id": int,
+    "variety_id": int,
+    "year_from": int,
+    "year_to": int,
+    "reference": str,
+}
+"""Represents the query parameters that filter the exported campaign documents."""
+
+
+@require_GET
+def campaign_documents_export_view(request: HttpRequest) -> HttpResponse:
+    """Streams all the campaign documents that match the search filters, as NDJSON or
+    CSV. The search is given as a `cursor`, like the GraphQL queries, or as the
+    `EXPORT_FILTERS` query parameters, and the documents are queried in chunks so
+    the memory usage does not depend on the amount of exported documents.
+
+    Under ASGI the chunks are queried by an async iterator, since the synchronous
+    iterators of the streaming responses are consumed whole before streaming them.
+    The chunks are queried in the context of the request, so they are read from
+    the same database as the request, even after the request middlewares return.
+    """
+    export_format = request.GET.get("format", "ndjson")
+    encoded_cursor = request.GET.get("cursor", "")
+
+    if export_format not in ["ndjson", "csv"]:
+        return HttpResponseBadRequest("The export format must be 'ndjson' or 'csv'.")
+
+    try:
+        if encoded_cursor == "":
+            search_filters = CampaignDocumentsFilterInput(
+                **{
+                    name: value_type(request.GET[name])
+                    for name, value_type in EXPORT_FILTERS.items()
+                    if name in request.GET
+                }
+            )
+            encoded_cursor = Pagination.encode_cursor(search_filters.as_cursor())
+
+        # Validate the cursor before the response starts streaming.
+        Pagination.decode_cursor(encoded_cursor)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+
+    chunks: typing.Iterator[list] = iterate_cursor_chunks(
+        encoded_cursor=encoded_cursor,
+        model=models.CampaignDocumentsModel,
+        fields=[CAMPAIGN_DOCUMENT_COLUMNS[field] for field in EXPORT_FIELDS],
+        chunk_size=settings.EXPORT["CHUNK_SIZE"],
+    )
+    columns = ["id", *EXPORT_FIELDS]
+
+    if export_format == "csv":
+        writer = csv.writer(Echo())
+        content_type = "text/csv"
+        headers = {
+            "Content-Disposition": 'attachment; filename="campaign_documents.csv"'
+        }
+
+        def serialize_chunk(chunk: list) -> str:
+            return "".join(writer.writerow(row) for row in chunk)
+
+        chunks = itertools.chain([[columns]], chunks)
+    else:
+        content_type = "application/x-ndjson"
+        headers = {}
+
+        def serialize_chunk(chunk: list) -> str:
+            return "".join(
+                json.dumps(
+                    dict(zip(columns, map(serialize_export_value, entry))),
+                    separators=(",", ":"),
+                )
+                + "\n"
+                for entry in chunk
+            )
+
+    content = iterate_in_context(map(serialize_chunk, chunks))
+
+    if isinstance(request, ASGIRequest):
+        return StreamingHttpResponse(
+            iterate_in_thread(content), content_type=content_type, headers=headers
+        )
+
+    return StreamingHttpResponse(content, content_type=content_type, headers=headers)
@@ -0,0 +1,112 @@
+"""
+Gunicorn config for the production ASGI server of the api project.
+
+The uvicorn workers serve `api.asgi`, the app is loaded in the master process
+before the workers are forked and each worker is replaced after serving a limited
+amount of requests. The settings are taken from the `AGROVAR_*` environment
+variables.
+
+Each worker keeps its own memory, so the state that the workers share lives in
+the database, like the data version, or in a shared django cache backend, like the
+client budgets. The /metrics endpoint is answered by whichever worker receives the
+scrape, so it only serves the metrics of all the workers when they write them to
+the `AGROVAR_METRICS_DIRECTORY`, otherwise each scrape sees a single worker.
+
+For more information on this file, see
+https://docs.gunicorn.org/en/stable/settings.html
+"""
+
+import os
+
+
+def get_cpu_count() -> int:
+    """Returns the amount of CPUs available to this process, which is lower than
+    the machine CPUs when the process is bound to some of them."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+wsgi_app = "api.asgi:application"
+
+worker_class = "uvicorn.workers.UvicornWorker"
+
+bind = os.environ.get("AGROVAR_BIND", "0.0.0.0:8000")
+
+workers = int(os.environ.get("AGROVAR_WORKERS", 0)) or get_cpu_count()
+
+# Load django and the GraphQL schemas once, the workers share their memory pages.
+preload_app = True
+
+# Replace each worker after serving a few requests, the jitter keeps the workers
+# from restarting at the same time.
+max_requests = int(os.environ.get("AGROVAR_MAX_REQUESTS", 10000))
+
+max_requests_jitter = int(os.environ.get("AGROVAR_MAX_REQUESTS_JITTER", 1000))
+
+graceful_timeout = int(os.environ.get("AGROVAR_GRACEFUL_TIMEOUT", 30))
+
+timeout = int(os.environ.get("AGROVAR_WORKER_TIMEOUT", 60))
+
+keepalive = int(os.environ.get("AGROVAR_KEEPALIVE", 5))
+
+accesslog = "-"
+
+
+def check_shared_state(workers: int) -> None:
+    """Checks that the state that must be shared by the workers is not kept in the
+    memory of each one, like the client budgets in the default in-memory cache,
+    which would let each client spend its budget once per worker.
+
+    Args:
+        workers (int): The amount of workers.
+
+    Raises:
+        ImproperlyConfigured: When a shared state is kept in each worker memory.
+    """
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+
+    if workers <= 1 or settings.QUERY_COST["CLIENT_BUDGET"] <= 0:
+        return
+
+    budgets_backend = settings.QUERY_COST["BUDGETS_BACKEND"]
+    budgets_cache = settings.CACHES[settings.QUERY_COST["BUDGETS_ALIAS"]]["BACKEND"]
+
+    if budgets_backend == "memory" or (
+        budgets_backend == "django" and budgets_cache.endswith(".LocMemCache")
+    ):
+        raise ImproperlyConfigured(
+            f"The {workers} workers would keep their own client budgets, set a "
+            "shared AGROVAR_CACHE_BACKEND or AGROVAR_WORKERS=1."
+        )
+
+
+def when_ready(server) -> None:
+    """Builds the URL configuration, and with it the GraphQL schemas, before the
+    workers are forked. The database connections opened meanwhile are closed, so
+    the workers do not share them, and the metrics of the previous runs are removed.
+
+    Raises:
+        ImproperlyConfigured: When the secret key that signs the pagination
+            cursors is missing, instead of failing each paginated query, or when a
+            shared state is kept in each worker memory.
+    """
+    from django.core.exceptions import ImproperlyConfigured
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from api.metrics import clear_metrics_directory
+
+    if not os.environ.get("AGROVAR_SECRET_KEY"):
+        raise ImproperlyConfigured(
+            "Set the AGROVAR_SECRET_KEY environment variable, the pagination "
+            "cursors are signed with it."
+        )
+
+    check_shared_state(server.cfg.workers)
+
+    get_resolver().url_patterns
+    connections.close_all()
+    clear_metrics_directory()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RepositoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'repository'
+
+    def ready(self) -> None:
+        # Connect the signal receivers of the repository.
+        from repository import signals  # noqa: F401
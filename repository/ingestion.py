@@ -0,0 +1,300 @@
+import csv
+import itertools
+import json
+import logging
+import typing
+from collections import ChainMap
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from repository import models
+from repository.relative_performance import recompute_relative_performance
+from repository.summaries import get_summary_group, refresh_campaign_summaries
+from repository.versioning import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+type Record = dict[str, typing.Any]
+
+DECIMAL_FIELDS = [
+    "latitude",
+    "longitude",
+    "humidity_percentage_stat",
+    "performance_stat",
+    "relative_performance_stat",
+    "weight_per_thousand_grains_stat",
+    "proteins_percentage_stat",
+    "ph_stat",
+]
+"""Represents the decimal columns of a campaign document record."""
+
+INTEGER_FIELDS = [
+    "paper_repetition",
+    "grain_count_crop_stat",
+    "grain_count_per_spike_stat",
+]
+"""Represents the integer columns of a campaign document record."""
+
+TEXT_FIELDS = ["reference", "paper_type"]
+"""Represents the text columns of a campaign document record."""
+
+
+class IngestionError(ValueError):
+    """Represents an invalid record of an ingested file."""
+
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+class OptionsLookup:
+    """Represents an in-memory lookup of the location and variety options by name,
+    that creates the missing options of each batch of records with a bulk insert."""
+
+    def __init__(self) -> None:
+        self.locations: dict[str, int] = dict(
+            models.LocationOptionsModel.objects.values_list("region_name", "id")
+        )
+        self.varieties: dict[str, int] = dict(
+            models.VarietyOptionsModel.objects.values_list("variant_name", "id")
+        )
+        self.created_options = 0
+
+    def create_missing_options(
+        self, batch: typing.Sequence[tuple[int, Record]]
+    ) -> tuple[dict[str, int], dict[str, int]]:
+        """Creates the locations and varieties of the batch records that are not in
+        the lookup, with a single bulk insert per model.
+
+        The created options are not added to the lookup, since the transaction of
+        the batch may roll them back, `keep_options` adds them once it commits.
+
+        Args:
+            batch (typing.Sequence[tuple[int, Record]]): The records of the batch and
+                their line number.
+
+        Returns:
+            tuple[dict[str, int], dict[str, int]]: The ids of the created locations
+            and varieties by name.
+
+        Raises:
+            IngestionError: When a record misses an option column.
+        """
+        missing_locations: set[str] = set()
+        missing_varieties: dict[str, str] = {}
+
+        for line, record in batch:
+            try:
+                region_name = str(record["location_origin"]).strip()
+                variant_name = str(record["crop_variety"]).strip()
+            except KeyError as error:
+                raise IngestionError(line, f"Missing column {error}") from error
+
+            if region_name not in self.locations:
+                missing_locations.add(region_name)
+
+            if variant_name not in self.varieties:
+                missing_varieties.setdefault(
+                    variant_name, record.get("crop_variety_tradename") or variant_name
+                )
+
+        # The bulk inserts do not send the model signals, so the data version is
+        # not bumped for each new option.
+        locations = models.LocationOptionsModel.objects.bulk_create(
+            [
+                models.LocationOptionsModel(region_name=region_name)
+                for region_name in sorted(missing_locations)
+            ]
+        )
+        varieties = models.VarietyOptionsModel.objects.bulk_create(
+            [
+                models.VarietyOptionsModel(
+                    variant_name=variant_name, tradename=tradename
+                )
+                for variant_name, tradename in missing_varieties.items()
+            ]
+        )
+
+        return (
+            {location.region_name: location.id for location in locations},
+            {variety.variant_name: variety.id for variety in varieties},
+        )
+
+    def keep_options(
+        self, locations: dict[str, int], varieties: dict[str, int]
+    ) -> None:
+        """Adds the options created by a committed batch to the lookup."""
+        self.locations.update(locations)
+        self.varieties.update(varieties)
+        self.created_options += len(locations) + len(varieties)
+
+
+def read_csv_records(stream: typing.TextIO) -> typing.Iterator[tuple[int, Record]]:
+    """Yields the records of a CSV stream with a header row, and their line number."""
+    reader = csv.DictReader(stream)
+
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_json_lines_records(
+    stream: typing.TextIO,
+) -> typing.Iterator[tuple[int, Record]]:
+    """Yields the records of a JSON lines stream, and their line number."""
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip() == "":
+            continue
+
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as error:
+            raise IngestionError(line_number, f"Invalid JSON, {error}") from error
+
+
+RECORD_READERS: dict[str, typing.Callable[[typing.TextIO], typing.Iterator]] = {
+    "csv": read_csv_records,
+    "jsonl": read_json_lines_records,
+}
+"""Represents the record reader of each supported file format."""
+
+
+def parse_creation_year(value: typing.Any) -> date:
+    """Parses a paper creation year, given as a year or as an ISO date."""
+    text = str(value).strip()
+
+    if text.isdigit():
+        return date(int(text), 1, 1)
+
+    return date.fromisoformat(text)
+
+
+def build_campaign_document(
+    line: int,
+    record: Record,
+    location_ids: typing.Mapping[str, int],
+    variety_ids: typing.Mapping[str, int],
+) -> models.CampaignDocumentsModel:
+    """Builds an unsaved campaign document with the values of the given record.
+
+    Args:
+        line (int): The line number of the record, used in the errors.
+        record (Record): A record with the campaign document columns, where the
+            `location_origin` and `crop_variety` columns are the option names.
+        location_ids (typing.Mapping[str, int]): The location ids by name.
+        variety_ids (typing.Mapping[str, int]): The variety ids by name.
+
+    Returns:
+        models.CampaignDocumentsModel: The unsaved campaign document.
+
+    Raises:
+        IngestionError: When a column is missing or has an invalid value.
+    """
+    try:
+        fields: Record = {field: str(record[field]).strip() for field in TEXT_FIELDS}
+
+        for field in DECIMAL_FIELDS:
+            fields[field] = Decimal(str(record[field]).strip())
+
+        for field in INTEGER_FIELDS:
+            fields[field] = int(str(record[field]).strip())
+
+        fields["paper_creation_year"] = parse_creation_year(
+            record["paper_creation_year"]
+        )
+        fields["location_origin_id"] = location_ids[
+            str(record["location_origin"]).strip()
+        ]
+        fields["crop_variety_id"] = variety_ids[str(record["crop_variety"]).strip()]
+    except KeyError as error:
+        raise IngestionError(line, f"Missing column {error}") from error
+    except (ValueError, TypeError, InvalidOperation) as error:
+        raise IngestionError(line, f"Invalid value, {error!r}") from error
+
+    return models.CampaignDocumentsModel(**fields)
+
+
+def ingest_campaign_documents(
+    stream: typing.TextIO, *, file_format: str, batch_size: int
+) -> tuple[int, int]:
+    """Streams the records of the given file into the campaign documents table,
+    writing each batch with a single bulk insert inside its own transaction, along
+    with the refresh of its summary groups. The relative performances of the written
+    locations and years are recomputed once all the batches are written.
+
+    Only one batch of records is kept in memory at a time, so the memory usage does
+    not depend on the file size.
+
+    Args:
+        stream (typing.TextIO): The file stream.
+        file_format (str): The file format, one of `RECORD_READERS`.
+        batch_size (int): The amount of records written per transaction.
+
+    Returns:
+        tuple[int, int]: The amount of created campaign documents and options.
+
+    Raises:
+        IngestionError: When a record is not valid, the batches already written
+            are kept.
+    """
+    lookup = OptionsLookup()
+    records = RECORD_READERS[file_format](stream)
+    created_documents = 0
+    written_groups: set[tuple[int, int]] = set()
+
+    def finish_written_batches() -> None:
+        # The relative performances of the trials of the written locations and
+        # years depend on the new documents.
+        if written_groups:
+            location_ids, years = (set(values) for values in zip(*written_groups))
+            recompute_relative_performance(location_ids=location_ids, years=years)
+
+        # The bulk inserts do not send the model signals, so the data version is
+        # bumped once for all the written batches.
+        if created_documents > 0 or lookup.created_options > 0:
+            bump_data_version()
+
+    try:
+        while batch := list(itertools.islice(records, batch_size)):
+            with transaction.atomic():
+                locations, varieties = lookup.create_missing_options(batch)
+                location_ids = ChainMap(locations, lookup.locations)
+                variety_ids = ChainMap(varieties, lookup.varieties)
+
+                campaign_documents = [
+                    build_campaign_document(line, record, location_ids, variety_ids)
+                    for line, record in batch
+                ]
+
+                models.CampaignDocumentsModel.objects.bulk_create(
+                    campaign_documents, batch_size=batch_size
+                )
+
+                # The bulk inserts do not send the model signals either, so the
+                # summary groups of the batch are refreshed in the same transaction.
+                refresh_campaign_summaries(
+                    get_summary_group(campaign_document)
+                    for campaign_document in campaign_documents
+                )
+
+            # The options of the rolled back batches are neither kept nor counted.
+            lookup.keep_options(locations, varieties)
+            created_documents += len(campaign_documents)
+            written_groups.update(
+                get_summary_group(campaign_document)[1:]
+                for campaign_document in campaign_documents
+            )
+    except Exception:
+        # The batches written before the error are kept, so they are finished too,
+        # but a failure while finishing them does not hide the original error.
+        try:
+            finish_written_batches()
+        except Exception:
+            logger.exception("Could not finish the batches written before the error")
+
+        raise
+
+    finish_written_batches()
+
+    return created_documents, lookup.created_options
@@ -0,0 +1,64 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from repository.sqlite import measure_concurrent_reads
+
+ROLLBACK_JOURNAL_PRAGMAS = {"JOURNAL_MODE": "delete", "SYNCHRONOUS": "full"}
+"""Represents the SQLite defaults, the pragmas before the SQLITE_PRAGMAS setting."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the SQLite read latency while a writer inserts rows in a loop, with "
+        "the default rollback journal and with the SQLITE_PRAGMAS setting."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=4,
+            help="The amount of reader threads.",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=3.0,
+            help="The seconds that each profile runs.",
+        )
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=20000,
+            help="The amount of rows inserted before the measures.",
+        )
+        parser.add_argument(
+            "--write-batch",
+            type=int,
+            default=500,
+            help="The amount of rows inserted per write transaction.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        profiles = {
+            "rollback_journal": ROLLBACK_JOURNAL_PRAGMAS,
+            "settings": settings.SQLITE_PRAGMAS,
+        }
+        results = {}
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name, pragmas in profiles.items():
+                results[name] = measure_concurrent_reads(
+                    str(Path(directory) / f"{name}.sqlite3"),
+                    pragmas=pragmas,
+                    readers=options["readers"],
+                    duration=options["duration"],
+                    rows=options["rows"],
+                    write_batch=options["write_batch"],
+                )
+
+        self.stdout.write(json.dumps(results, indent=2))
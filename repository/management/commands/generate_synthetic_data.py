@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from repository.synthetic import flush_dataset, generate_synthetic_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a reproducible synthetic dataset of campaign documents, locations "
+        "and varieties, to benchmark the API with realistic volumes."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--documents",
+            type=int,
+            default=100_000,
+            help="The amount of campaign documents to create.",
+        )
+        parser.add_argument(
+            "--locations",
+            type=int,
+            default=200,
+            help="The amount of locations to create.",
+        )
+        parser.add_argument(
+            "--varieties",
+            type=int,
+            default=500,
+            help="The amount of varieties to create.",
+        )
+        parser.add_argument(
+            "--trial-size",
+            type=int,
+            default=12,
+            help="The amount of campaign documents of each location, year and reference.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="The seed of the random generators, the same seed generates the same data.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="The amount of documents written per bulk insert.",
+        )
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Deletes the existing documents, locations and varieties first.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["flush"]:
+            flush_dataset()
+
+        documents, locations, varieties = generate_synthetic_dataset(
+            documents=options["documents"],
+            locations=options["locations"],
+            varieties=options["varieties"],
+            trial_size=options["trial_size"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {documents} campaign documents, {locations} locations "
+                f"and {varieties} varieties."
+            )
+        )
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from repository.ingestion import RECORD_READERS, IngestionError, ingest_campaign_documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports the campaign documents of CSV or JSON lines files, where the "
+        "location_origin and crop_variety columns are the option names."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("files", nargs="+", type=Path)
+        parser.add_argument(
+            "--format",
+            choices=list(RECORD_READERS),
+            default=None,
+            help="The files format, guessed from the file extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="The amount of records written per transaction.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        for file_path in options["files"]:
+            file_format = options["format"] or file_path.suffix.lstrip(".").lower()
+
+            if file_format not in RECORD_READERS:
+                raise CommandError(f"Cannot guess the format of '{file_path}'.")
+
+            try:
+                with file_path.open(newline="", encoding="utf-8") as stream:
+                    created_documents, created_options = ingest_campaign_documents(
+                        stream,
+                        file_format=file_format,
+                        batch_size=options["batch_size"],
+                    )
+            except (IngestionError, OSError) as error:
+                raise CommandError(f"{file_path}: {error}") from error
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{file_path}: imported {created_documents} campaign documents "
+                    f"and created {created_options} options."
+                )
+            )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from repository.summaries import find_inconsistent_summaries, rebuild_campaign_summaries
+from repository.versioning import bump_data_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the campaign summaries from all the campaign documents, or only "
+        "verifies that they are consistent with --verify."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compares the stored summaries with the campaign documents.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["verify"]:
+            inconsistent_keys = find_inconsistent_summaries()
+
+            for stat, variety_id, location_id, year in inconsistent_keys:
+                self.stderr.write(
+                    f"Inconsistent summary: stat={stat} variety={variety_id} "
+                    f"location={location_id} year={year}"
+                )
+
+            if inconsistent_keys:
+                raise CommandError(
+                    f"{len(inconsistent_keys)} campaign summaries are inconsistent, "
+                    "run this command without --verify to rebuild them."
+                )
+
+            self.stdout.write(self.style.SUCCESS("The campaign summaries are consistent."))
+            return
+
+        created_summaries = rebuild_campaign_summaries()
+
+        # The bulk inserts do not send the model signals, so the caches and the
+        # snapshots built with the old summaries are dropped by bumping the version.
+        bump_data_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {created_summaries} campaign summaries.")
+        )
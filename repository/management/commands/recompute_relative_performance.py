@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from repository.relative_performance import recompute_relative_performance
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the relative performance of the campaign documents, relative to "
+        "the mean performance of the varieties of the same location and year."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--location",
+            type=int,
+            action="append",
+            dest="location_ids",
+            help="Only recomputes the trials of this location id, can be repeated.",
+        )
+        parser.add_argument(
+            "--year",
+            type=int,
+            action="append",
+            dest="years",
+            help="Only recomputes the trials of this year, can be repeated.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="The amount of documents written per bulk update.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        updated_documents = recompute_relative_performance(
+            location_ids=options["location_ids"],
+            years=options["years"],
+            chunk_size=options["chunk_size"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated the relative performance of {updated_documents} campaign documents."
+            )
+        )
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from api.benchmarks import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the pagination, resolver and schema benchmarks against the current "
+        "database and writes the results as JSON, to compare them across releases."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=50,
+            help="The amount of measured runs of each benchmark.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=50,
+            help="The page size of the paginated queries.",
+        )
+        parser.add_argument(
+            "--label",
+            help="A label of the run, like the release version.",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            default=[],
+            help="Only runs the benchmarks whose names start with this prefix, can be repeated.",
+        )
+        parser.add_argument(
+            "--output",
+            help="The path of the JSON report, the report is written to stdout by default.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        report = run_benchmarks(
+            repeat=options["repeat"],
+            limit=options["limit"],
+            label=options["label"],
+            names=options["only"],
+        )
+
+        if options["output"] is None:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        with open(options["output"], "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {len(report['results'])} benchmark results to {options['output']}."
+            )
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-17 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0005_remove_campaigndocumentsmodel_location_origing_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaigndocumentsmodel',
+            index=models.Index(fields=['location_origin', 'id'], name='campaign_location_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaigndocumentsmodel',
+            index=models.Index(fields=['crop_variety', 'id'], name='campaign_variety_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaigndocumentsmodel',
+            index=models.Index(fields=['paper_creation_year', 'id'], name='campaign_year_id_idx'),
+        ),
+    ]
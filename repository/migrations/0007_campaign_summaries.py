@@ -0,0 +1,95 @@
+# Generated by Django 5.0.1 on 2026-10-17 12:35
+
+import django.db.models.deletion
+import django.db.models.functions
+from django.db import migrations, models
+
+# The stats and the aggregation are frozen here, so later changes of the summary
+# model or of repository.summaries do not change this migration.
+SUMMARY_STATS = [
+    'humidity_percentage_stat',
+    'performance_stat',
+    'relative_performance_stat',
+    'grain_count_crop_stat',
+    'grain_count_per_spike_stat',
+    'weight_per_thousand_grains_stat',
+    'proteins_percentage_stat',
+    'ph_stat',
+]
+
+
+def summarize_existing_documents(apps, schema_editor):
+    CampaignDocumentsModel = apps.get_model('repository', 'CampaignDocumentsModel')
+    CampaignSummaryModel = apps.get_model('repository', 'CampaignSummaryModel')
+
+    aggregates = {'count': models.Count('id')}
+
+    for stat in SUMMARY_STATS:
+        aggregates[f'total_{stat}'] = models.Sum(stat, output_field=models.FloatField())
+        aggregates[f'total_squares_{stat}'] = models.Sum(
+            models.F(stat) * models.F(stat), output_field=models.FloatField()
+        )
+        aggregates[f'minimum_{stat}'] = models.Min(stat)
+        aggregates[f'maximum_{stat}'] = models.Max(stat)
+
+    groups = (
+        CampaignDocumentsModel.objects.annotate(
+            year=models.functions.ExtractYear('paper_creation_year')
+        )
+        .values('crop_variety_id', 'location_origin_id', 'year')
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+    CampaignSummaryModel.objects.bulk_create(
+        [
+            CampaignSummaryModel(
+                stat=stat,
+                crop_variety_id=group['crop_variety_id'],
+                location_origin_id=group['location_origin_id'],
+                year=group['year'],
+                count=group['count'],
+                total=float(group[f'total_{stat}']),
+                total_squares=float(group[f'total_squares_{stat}']),
+                minimum=float(group[f'minimum_{stat}']),
+                maximum=float(group[f'maximum_{stat}']),
+            )
+            for group in groups
+            for stat in SUMMARY_STATS
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0006_campaign_documents_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignSummaryModel',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False, verbose_name='Identificador Unico')),
+                ('stat', models.CharField(choices=[('humidity_percentage_stat', 'Porcentaje de humedad (%)'), ('performance_stat', 'Rendimiento (Kg/Ha)'), ('relative_performance_stat', 'Rendimiento relativo (kg/ha)'), ('grain_count_crop_stat', 'Conteo de granos por cultivo'), ('grain_count_per_spike_stat', 'Conteo de granos por espiga'), ('weight_per_thousand_grains_stat', 'Peso por mil granos (g)'), ('proteins_percentage_stat', 'Porcentaje de proteinas (%)'), ('ph_stat', 'Potencial de hidrogeno (ph)')], max_length=50, verbose_name='Estadistica')),
+                ('year', models.IntegerField(verbose_name='Año de registro')),
+                ('count', models.IntegerField(verbose_name='Cantidad de ensayos')),
+                ('total', models.FloatField(verbose_name='Suma de los valores')),
+                ('total_squares', models.FloatField(verbose_name='Suma de los cuadrados de los valores')),
+                ('minimum', models.FloatField(verbose_name='Valor minimo')),
+                ('maximum', models.FloatField(verbose_name='Valor maximo')),
+                ('crop_variety', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='repository.varietyoptionsmodel', verbose_name='Variedad del cultivo')),
+                ('location_origin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='repository.locationoptionsmodel', verbose_name='Localidad de origen')),
+            ],
+            options={
+                'db_table': 'campaign_summaries',
+                'db_table_comment': 'This model stores the campaign documents stats rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='campaignsummarymodel',
+            constraint=models.UniqueConstraint(fields=('stat', 'crop_variety', 'location_origin', 'year'), name='campaign_summary_group_unique'),
+        ),
+        migrations.RunPython(summarize_existing_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:08
+
+import time
+
+from django.db import migrations, models
+
+
+def initialize_data_version(apps, schema_editor):
+    apps.get_model('repository', 'DataVersionModel').objects.create(
+        id=1, version=time.time_ns()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0007_campaign_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersionModel',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False, verbose_name='Identificador Unico')),
+                ('version', models.BigIntegerField(verbose_name='Version de los datos')),
+            ],
+            options={
+                'db_table': 'data_version',
+                'db_table_comment': 'This model stores the version of the repository data',
+            },
+        ),
+        migrations.RunPython(initialize_data_version, migrations.RunPython.noop),
+    ]
@@ -56,6 +56,17 @@ class CampaignDocumentsModel(models.Model):
         db_table = "campaign_documents"
         db_table_comment = "This model stores the capaign documents"
 
+        # Keyset pagination indexes, one for each cursor filter lookup.
+        indexes = [
+            models.Index(
+                fields=["location_origin", "id"], name="campaign_location_id_idx"
+            ),
+            models.Index(fields=["crop_variety", "id"], name="campaign_variety_id_idx"),
+            models.Index(
+                fields=["paper_creation_year", "id"], name="campaign_year_id_idx"
+            ),
+        ]
+
     id = models.AutoField(
         verbose_name="Identificador Unico",
         primary_key=True,
@@ -192,3 +203,101 @@ class CampaignDocumentsModel(models.Model):
 
     def __str__(self) -> str:
         return f"{self.id} / {self.paper_type} / {self.reference} - {self.location_origin.region_name} - {self.paper_creation_year} / {self.crop_variety.variant_name}"
+
+
+class CampaignSummaryModel(models.Model):
+
+    class Meta:
+        db_table = "campaign_summaries"
+        db_table_comment = "This model stores the campaign documents stats rollups"
+
+        # A summary row per variety, location, year and stat, the stat goes first so
+        # the dashboard lookups of a single stat are resolved by this index.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["stat", "crop_variety", "location_origin", "year"],
+                name="campaign_summary_group_unique",
+            ),
+        ]
+
+    id = models.AutoField(
+        verbose_name="Identificador Unico",
+        primary_key=True,
+    )
+
+    STAT_CHOICES = [
+        ("humidity_percentage_stat", "Porcentaje de humedad (%)"),
+        ("performance_stat", "Rendimiento (Kg/Ha)"),
+        ("relative_performance_stat", "Rendimiento relativo (kg/ha)"),
+        ("grain_count_crop_stat", "Conteo de granos por cultivo"),
+        ("grain_count_per_spike_stat", "Conteo de granos por espiga"),
+        ("weight_per_thousand_grains_stat", "Peso por mil granos (g)"),
+        ("proteins_percentage_stat", "Porcentaje de proteinas (%)"),
+        ("ph_stat", "Potencial de hidrogeno (ph)"),
+    ]
+
+    stat = models.CharField(
+        verbose_name="Estadistica",
+        max_length=50,
+        choices=STAT_CHOICES,
+    )
+
+    crop_variety = models.ForeignKey(
+        to=VarietyOptionsModel,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Variedad del cultivo",
+    )
+
+    location_origin = models.ForeignKey(
+        to=LocationOptionsModel,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Localidad de origen",
+    )
+
+    year = models.IntegerField(
+        verbose_name="Año de registro",
+    )
+
+    count = models.IntegerField(
+        verbose_name="Cantidad de ensayos",
+    )
+
+    total = models.FloatField(
+        verbose_name="Suma de los valores",
+    )
+
+    total_squares = models.FloatField(
+        verbose_name="Suma de los cuadrados de los valores",
+    )
+
+    minimum = models.FloatField(
+        verbose_name="Valor minimo",
+    )
+
+    maximum = models.FloatField(
+        verbose_name="Valor maximo",
+    )
+
+    def __str__(self) -> str:
+        return f"{self.id} / {self.stat} / {self.crop_variety_id} - {self.location_origin_id} - {self.year}"  # type: ignore
+
+
+class DataVersionModel(models.Model):
+
+    class Meta:
+        db_table = "data_version"
+        db_table_comment = "This model stores the version of the repository data"
+
+    id = models.AutoField(
+        verbose_name="Identificador Unico",
+        primary_key=True,
+    )
+
+    version = models.BigIntegerField(
+        verbose_name="Version de los datos",
+    )
+
+    def __str__(self) -> str:
+        return f"{self.id} / {self.version}"
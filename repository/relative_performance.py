@@ -0,0 +1,139 @@
+import typing
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, ExtractYear
+
+from repository import models
+from repository.summaries import refresh_campaign_summaries
+from repository.versioning import bump_data_version
+
+MAX_RELATIVE_PERFORMANCE = 999.99
+"""Represents the highest value that the relative performance column can store."""
+
+
+def compute_relative_performances(
+    group_keys: np.ndarray, performances: np.ndarray
+) -> np.ndarray:
+    """Computes the performance of each trial relative to the mean performance of its
+    group, as a percentage rounded to the column precision.
+
+    Args:
+        group_keys (np.ndarray): The group of each trial, its location and year.
+        performances (np.ndarray): The performance of each trial.
+
+    Returns:
+        np.ndarray: The relative performance of each trial, zero when the mean
+        performance of its group is zero.
+    """
+    _, groups = np.unique(group_keys, axis=0, return_inverse=True)
+    groups = groups.reshape(-1)
+
+    means = np.bincount(groups, weights=performances) / np.bincount(groups)
+    trial_means = means[groups]
+
+    relative_performances = np.divide(
+        performances * 100,
+        trial_means,
+        out=np.zeros_like(performances),
+        where=trial_means != 0,
+    )
+
+    return np.clip(np.round(relative_performances, 2), 0, MAX_RELATIVE_PERFORMANCE)
+
+
+def recompute_relative_performance(
+    *,
+    location_ids: typing.Collection[int] | None = None,
+    years: typing.Collection[int] | None = None,
+    chunk_size: int = 1000,
+) -> int:
+    """Recomputes the relative performance of the campaign documents, relative to the
+    mean performance of all the varieties of the same location and year, and writes
+    the changed values with bulk updates of `chunk_size` documents.
+
+    Args:
+        location_ids (typing.Collection[int] | None): Only recomputes these locations.
+        years (typing.Collection[int] | None): Only recomputes these years.
+        chunk_size (int): The amount of documents written per bulk update.
+
+    Returns:
+        int: The amount of updated campaign documents.
+    """
+    campaign_documents = models.CampaignDocumentsModel.objects.order_by("id").annotate(
+        year=ExtractYear("paper_creation_year"),
+        performance_value=Cast(F("performance_stat"), output_field=FloatField()),
+        relative_performance_value=Cast(
+            F("relative_performance_stat"), output_field=FloatField()
+        ),
+    )
+
+    if location_ids is not None:
+        campaign_documents = campaign_documents.filter(location_origin_id__in=location_ids)
+
+    if years is not None:
+        campaign_documents = campaign_documents.filter(year__in=years)
+
+    trials = np.fromiter(
+        campaign_documents.values_list(
+            "id",
+            "crop_variety_id",
+            "location_origin_id",
+            "year",
+            "performance_value",
+            "relative_performance_value",
+        ).iterator(chunk_size=chunk_size),
+        dtype=[
+            ("id", np.int64),
+            ("variety_id", np.int64),
+            ("location_id", np.int64),
+            ("year", np.int64),
+            ("performance", np.float64),
+            ("relative_performance", np.float64),
+        ],
+    )
+
+    if len(trials) == 0:
+        return 0
+
+    relative_performances = compute_relative_performances(
+        np.stack([trials["location_id"], trials["year"]], axis=1),
+        trials["performance"],
+    )
+
+    # Only the documents whose stored value differs are written.
+    changed = ~np.isclose(relative_performances, trials["relative_performance"])
+    changed_trials = trials[changed]
+    changed_values = relative_performances[changed]
+
+    for start in range(0, len(changed_trials), chunk_size):
+        chunk_trials = changed_trials[start : start + chunk_size]
+
+        with transaction.atomic():
+            models.CampaignDocumentsModel.objects.bulk_update(
+                [
+                    models.CampaignDocumentsModel(
+                        id=id, relative_performance_stat=Decimal(f"{value:.2f}")
+                    )
+                    for id, value in zip(
+                        chunk_trials["id"].tolist(),
+                        changed_values[start : start + chunk_size].tolist(),
+                    )
+                ],
+                ["relative_performance_stat"],
+            )
+
+    if len(changed_trials) > 0:
+        # The bulk updates do not send the model signals.
+        refresh_campaign_summaries(
+            zip(
+                changed_trials["variety_id"].tolist(),
+                changed_trials["location_id"].tolist(),
+                changed_trials["year"].tolist(),
+            )
+        )
+        bump_data_version()
+
+    return len(changed_trials)
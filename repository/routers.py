@@ -0,0 +1,145 @@
+import contextvars
+import itertools
+import threading
+import typing
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+STICKY_COOKIE = "agrovar_primary"
+"""Represents the cookie of the clients whose reads are routed to the primary."""
+
+
+class ReplicaReads:
+    """Represents a scope, like a request, where the reads are routed to a read
+    replica until the first write, which pins the rest of the scope to the primary
+    database so it reads its own writes.
+
+    All the reads of the scope use the same replica, so the data version read in
+    the scope matches the rows read in it, even when the replicas lag behind.
+    """
+
+    def __init__(self, *, pinned: bool = False) -> None:
+        self.pinned = pinned
+        self.wrote = False
+        self.replica: str | None = None
+        self.__token: contextvars.Token | None = None
+
+    def __enter__(self) -> "ReplicaReads":
+        self.__token = _replica_reads.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _replica_reads.reset(self.__token)  # type: ignore
+
+
+_replica_reads: contextvars.ContextVar[ReplicaReads | None] = contextvars.ContextVar(
+    "replica_reads", default=None
+)
+
+_replica_counter = itertools.count()
+
+_replica_lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """Routes the reads of the `ReplicaReads` scopes to the read replicas of the
+    `DATABASE_REPLICAS` setting, a replica per scope in round robin, and everything
+    else to the primary database.
+
+    The reads outside the scopes, like the ones of the management commands and the
+    snapshots rebuilt in background threads, and the reads inside the transactions
+    of the primary database always use the primary database.
+    """
+
+    def db_for_read(self, model, **hints) -> str:
+        instance = hints.get("instance")
+
+        # Keep the related objects of an instance in its database.
+        if instance is not None and instance._state.db is not None:
+            return instance._state.db
+
+        replica_reads = _replica_reads.get()
+        replicas = settings.DATABASE_REPLICAS["ALIASES"]
+
+        if (
+            replica_reads is None
+            or replica_reads.pinned
+            or not replicas
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+
+        # The `sync_to_async` threads of the scope share it, so only one of them
+        # picks its replica.
+        if replica_reads.replica is None:
+            with _replica_lock:
+                if replica_reads.replica is None:
+                    replica_reads.replica = replicas[
+                        next(_replica_counter) % len(replicas)
+                    ]
+
+        return replica_reads.replica
+
+    def db_for_write(self, model, **hints) -> str:
+        replica_reads = _replica_reads.get()
+
+        if replica_reads is not None:
+            replica_reads.pinned = True
+            replica_reads.wrote = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # The replicas hold the same data as the primary database.
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints) -> bool:
+        return db == DEFAULT_DB_ALIAS
+
+
+def set_sticky_cookie(response: HttpResponse, replica_reads: ReplicaReads) -> None:
+    """Pins the next requests of the client to the primary database for the
+    `STICKY_SECONDS` setting, when the request wrote to the database."""
+    if replica_reads.wrote:
+        response.set_cookie(
+            STICKY_COOKIE,
+            "1",
+            max_age=settings.DATABASE_REPLICAS["STICKY_SECONDS"],
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(
+    get_response: typing.Callable,
+) -> typing.Callable:
+    """Routes the reads of each request to the read replicas, unless the client
+    wrote to the database in the last `STICKY_SECONDS` seconds, so the replication
+    lag does not hide its own writes."""
+
+    if iscoroutinefunction(get_response):
+
+        async def async_middleware(request: HttpRequest) -> HttpResponse:
+            with ReplicaReads(pinned=STICKY_COOKIE in request.COOKIES) as replica_reads:
+                response = await get_response(request)
+
+            set_sticky_cookie(response, replica_reads)
+
+            return response
+
+        return async_middleware
+
+    def middleware(request: HttpRequest) -> HttpResponse:
+        with ReplicaReads(pinned=STICKY_COOKIE in request.COOKIES) as replica_reads:
+            response = get_response(request)
+
+        set_sticky_cookie(response, replica_reads)
+
+        return response
+
+    return middleware
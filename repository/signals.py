@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db.models.functions import ExtractYear
+from django.dispatch import receiver
+
+from repository import models
+from repository.sqlite import apply_sqlite_pragmas
+from repository.summaries import get_summary_group, refresh_campaign_summaries
+from repository.versioning import bump_data_version
+
+VERSIONED_MODELS = [
+    models.CampaignDocumentsModel,
+    models.VarietyOptionsModel,
+    models.LocationOptionsModel,
+]
+"""Represents the models whose changes bump the repository data version."""
+
+
+@receiver(post_save, dispatch_uid="repository_versioning_on_save")
+@receiver(post_delete, dispatch_uid="repository_versioning_on_delete")
+def on_repository_change(sender, **kwargs) -> None:
+    """Bumps the repository data version when a versioned model entry is saved or deleted."""
+
+    if sender not in VERSIONED_MODELS:
+        return
+
+    # Bump the version right away to stop serving the old data in this process, and
+    # again once the transaction commits and the other processes see the change, so
+    # nothing cached in the meantime survives it.
+    bump_data_version()
+    transaction.on_commit(bump_data_version)
+
+
+@receiver(
+    pre_save,
+    sender=models.CampaignDocumentsModel,
+    dispatch_uid="repository_summaries_before_save",
+)
+def on_campaign_document_before_save(sender, instance, **kwargs) -> None:
+    """Stores the summary group that the campaign document had before the update."""
+
+    instance._previous_summary_group = None
+
+    if instance._state.adding:
+        return
+
+    instance._previous_summary_group = (
+        models.CampaignDocumentsModel.objects.filter(pk=instance.pk)
+        .annotate(year=ExtractYear("paper_creation_year"))
+        .values_list("crop_variety_id", "location_origin_id", "year")
+        .first()
+    )
+
+
+@receiver(
+    post_save,
+    sender=models.CampaignDocumentsModel,
+    dispatch_uid="repository_summaries_on_save",
+)
+@receiver(
+    post_delete,
+    sender=models.CampaignDocumentsModel,
+    dispatch_uid="repository_summaries_on_delete",
+)
+def on_campaign_document_change(sender, instance, **kwargs) -> None:
+    """Refreshes the summary groups of the saved or deleted campaign document."""
+
+    groups = {
+        get_summary_group(instance),
+        getattr(instance, "_previous_summary_group", None),
+    }
+
+    refresh_campaign_summaries(group for group in groups if group is not None)
+
+
+@receiver(connection_created, dispatch_uid="repository_sqlite_pragmas")
+def on_connection_created(sender, connection, **kwargs) -> None:
+    """Applies the `SQLITE_PRAGMAS` setting to each new SQLite connection."""
+
+    if connection.vendor != "sqlite":
+        return
+
+    # The DB-API cursor skips the query logging and wrappers of the connection.
+    cursor = connection.connection.cursor()
+
+    try:
+        apply_sqlite_pragmas(cursor, settings.SQLITE_PRAGMAS)
+    finally:
+        cursor.close()
@@ -0,0 +1,183 @@
+import sqlite3
+import statistics
+import threading
+import time
+import typing
+
+JOURNAL_MODES = ["delete", "truncate", "persist", "memory", "wal", "off"]
+"""Represents the valid values of the journal mode pragma."""
+
+SYNCHRONOUS_MODES = ["off", "normal", "full", "extra"]
+"""Represents the valid values of the synchronous pragma."""
+
+TEMP_STORES = ["default", "file", "memory"]
+"""Represents the valid values of the temp store pragma."""
+
+
+def get_pragma_statements(pragmas: typing.Mapping[str, typing.Any]) -> list[str]:
+    """Returns the statements that apply the given `SQLITE_PRAGMAS` like setting.
+
+    Args:
+        pragmas (typing.Mapping[str, typing.Any]): The pragma values, the missing or
+            None values are left unchanged.
+
+    Returns:
+        list[str]: The pragma statements.
+
+    Raises:
+        ValueError: When a pragma value is not valid.
+    """
+    statements = []
+
+    for name, valid_values in [
+        ("JOURNAL_MODE", JOURNAL_MODES),
+        ("SYNCHRONOUS", SYNCHRONOUS_MODES),
+        ("TEMP_STORE", TEMP_STORES),
+    ]:
+        value = pragmas.get(name)
+
+        if value is None:
+            continue
+
+        if str(value).lower() not in valid_values:
+            raise ValueError(
+                f"The SQLite {name} pragma must be one of {', '.join(valid_values)}."
+            )
+
+        statements.append(f"PRAGMA {name.lower()} = {str(value).lower()}")
+
+    for name in ["MMAP_SIZE", "CACHE_SIZE", "BUSY_TIMEOUT"]:
+        value = pragmas.get(name)
+
+        if value is not None:
+            statements.append(f"PRAGMA {name.lower()} = {int(value)}")
+
+    return statements
+
+
+def apply_sqlite_pragmas(cursor, pragmas: typing.Mapping[str, typing.Any]) -> None:
+    """Applies the given pragmas to the connection of a DB-API cursor."""
+    for statement in get_pragma_statements(pragmas):
+        cursor.execute(statement)
+
+
+# Concurrent reads benchmark
+
+
+def measure_concurrent_reads(
+    path: str,
+    *,
+    pragmas: typing.Mapping[str, typing.Any],
+    readers: int = 4,
+    duration: float = 2.0,
+    rows: int = 20000,
+    write_batch: int = 500,
+) -> dict[str, typing.Any]:
+    """Measures the latency of the reads of a SQLite database while a writer inserts
+    batches of rows in a loop, to compare the read latency of the pragma profiles.
+
+    Args:
+        path (str): The path of a new database file.
+        pragmas (typing.Mapping[str, typing.Any]): The pragmas of every connection.
+        readers (int): The amount of reader threads.
+        duration (float): The seconds that the writer and the readers run.
+        rows (int): The amount of rows inserted before the measures.
+        write_batch (int): The amount of rows inserted per write transaction.
+
+    Returns:
+        dict[str, typing.Any]: The read latencies in milliseconds, the amount of
+        reads and writes, and the reads that failed on a locked database.
+    """
+
+    def connect() -> sqlite3.Connection:
+        # The default busy timeout is replaced by the pragmas, if any.
+        connection = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        apply_sqlite_pragmas(connection.cursor(), pragmas)
+
+        return connection
+
+    setup_connection = connect()
+    setup_connection.execute(
+        "CREATE TABLE trials (id INTEGER PRIMARY KEY, location INTEGER, value REAL)"
+    )
+    setup_connection.execute("CREATE INDEX trials_location ON trials (location)")
+    setup_connection.executemany(
+        "INSERT INTO trials (location, value) VALUES (?, ?)",
+        [(index % 100, index * 0.5) for index in range(rows)],
+    )
+    setup_connection.close()
+
+    stop = threading.Event()
+    latencies: list[float] = []
+    failed_reads = [0]
+    writes = [0]
+    lock = threading.Lock()
+
+    def write() -> None:
+        connection = connect()
+
+        while not stop.is_set():
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO trials (location, value) VALUES (?, ?)",
+                [(index % 100, index * 0.5) for index in range(write_batch)],
+            )
+            connection.execute("COMMIT")
+            writes[0] += 1
+
+        connection.close()
+
+    def read(reader_index: int) -> None:
+        connection = connect()
+        reader_latencies = []
+        reader_failures = 0
+        location = reader_index
+
+        while not stop.is_set():
+            location = (location + 7) % 100
+            start = time.perf_counter()
+
+            try:
+                connection.execute(
+                    "SELECT COUNT(*), AVG(value) FROM trials WHERE location = ?",
+                    (location,),
+                ).fetchone()
+            except sqlite3.OperationalError:
+                reader_failures += 1
+                continue
+
+            reader_latencies.append((time.perf_counter() - start) * 1000)
+
+        connection.close()
+
+        with lock:
+            latencies.extend(reader_latencies)
+            failed_reads[0] += reader_failures
+
+    threads = [threading.Thread(target=write)] + [
+        threading.Thread(target=read, args=(index,)) for index in range(readers)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    time.sleep(duration)
+    stop.set()
+
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+
+    return {
+        "pragmas": dict(pragmas),
+        "reads": len(latencies),
+        "failed_reads": failed_reads[0],
+        "write_transactions": writes[0],
+        "median_ms": statistics.median(latencies) if latencies else None,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] if latencies else None,
+        "max_ms": latencies[-1] if latencies else None,
+    }
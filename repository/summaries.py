@@ -0,0 +1,192 @@
+import itertools
+import math
+import typing
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Max, Min, Q, QuerySet, Sum
+from django.db.models.functions import ExtractYear
+
+from repository import models
+
+type SummaryGroup = tuple[int, int, int]
+"""Represents the variety id, location id and year of a summary group."""
+
+type SummaryKey = tuple[str, int, int, int]
+"""Represents the stat, variety id, location id and year of a summary row."""
+
+SUMMARY_STATS = [stat for stat, _ in models.CampaignSummaryModel.STAT_CHOICES]
+"""Represents the campaign document stats that are summarized."""
+
+SUMMARY_VALUES = ["count", "total", "total_squares", "minimum", "maximum"]
+"""Represents the aggregated values of a summary row."""
+
+REFRESH_CHUNK_SIZE = 250
+"""Represents the amount of groups refreshed per query, so the query parameters stay
+within the SQLite limits."""
+
+
+def get_summary_group(campaign_document: typing.Any) -> SummaryGroup:
+    """Returns the summary group of the given campaign document."""
+    return (
+        campaign_document.crop_variety_id,
+        campaign_document.location_origin_id,
+        campaign_document.paper_creation_year.year,
+    )
+
+
+def summarize_campaign_documents(
+    campaign_documents: QuerySet,
+) -> list[models.CampaignSummaryModel]:
+    """Aggregates the given campaign documents with a single GROUP BY query.
+
+    Args:
+        campaign_documents (QuerySet): The campaign documents to summarize.
+
+    Returns:
+        list[models.CampaignSummaryModel]: The unsaved summary rows, one per group
+        and stat.
+    """
+    aggregates: dict[str, typing.Any] = {"count": Count("id")}
+
+    for stat in SUMMARY_STATS:
+        aggregates[f"total_{stat}"] = Sum(stat, output_field=FloatField())
+        aggregates[f"total_squares_{stat}"] = Sum(
+            F(stat) * F(stat), output_field=FloatField()
+        )
+        aggregates[f"minimum_{stat}"] = Min(stat)
+        aggregates[f"maximum_{stat}"] = Max(stat)
+
+    groups = (
+        campaign_documents.annotate(year=ExtractYear("paper_creation_year"))
+        .values("crop_variety_id", "location_origin_id", "year")
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+    return [
+        models.CampaignSummaryModel(
+            stat=stat,
+            crop_variety_id=group["crop_variety_id"],
+            location_origin_id=group["location_origin_id"],
+            year=group["year"],
+            count=group["count"],
+            total=float(group[f"total_{stat}"]),
+            total_squares=float(group[f"total_squares_{stat}"]),
+            minimum=float(group[f"minimum_{stat}"]),
+            maximum=float(group[f"maximum_{stat}"]),
+        )
+        for group in groups
+        for stat in SUMMARY_STATS
+    ]
+
+
+def match_summary_groups(groups: typing.Iterable[SummaryGroup], year_lookup: str) -> Q:
+    """Returns a filter that matches the entries of exactly the given groups.
+
+    Args:
+        groups (typing.Iterable[SummaryGroup]): The matched groups.
+        year_lookup (str): The lookup of the group year, like `year` for the summary
+            rows or `paper_creation_year__year` for the campaign documents.
+
+    Returns:
+        Q: An OR of the filters of each group.
+    """
+    return Q(
+        *(
+            Q(
+                crop_variety_id=variety,
+                location_origin_id=location,
+                **{year_lookup: year},
+            )
+            for variety, location, year in groups
+        ),
+        _connector=Q.OR,
+    )
+
+
+def refresh_campaign_summaries(groups: typing.Iterable[SummaryGroup]) -> None:
+    """Recomputes the summary rows of exactly the given groups from their campaign
+    documents, with a delete and an aggregation query per `REFRESH_CHUNK_SIZE` groups.
+
+    Args:
+        groups (typing.Iterable[SummaryGroup]): The groups whose documents changed.
+    """
+    groups = iter(sorted(set(groups)))
+
+    with transaction.atomic():
+        while chunk := list(itertools.islice(groups, REFRESH_CHUNK_SIZE)):
+            models.CampaignSummaryModel.objects.filter(
+                match_summary_groups(chunk, "year")
+            ).delete()
+
+            models.CampaignSummaryModel.objects.bulk_create(
+                summarize_campaign_documents(
+                    models.CampaignDocumentsModel.objects.filter(
+                        match_summary_groups(chunk, "paper_creation_year__year")
+                    )
+                )
+            )
+
+
+def rebuild_campaign_summaries() -> int:
+    """Replaces all the summary rows with the summary of all the campaign documents.
+
+    Returns:
+        int: The amount of created summary rows.
+    """
+    with transaction.atomic():
+        models.CampaignSummaryModel.objects.all().delete()
+
+        summary_rows = models.CampaignSummaryModel.objects.bulk_create(
+            summarize_campaign_documents(models.CampaignDocumentsModel.objects.all()),
+            batch_size=1000,
+        )
+
+    return len(summary_rows)
+
+
+def find_inconsistent_summaries() -> list[SummaryKey]:
+    """Compares the stored summary rows with the summary of all the campaign documents.
+
+    Returns:
+        list[SummaryKey]: The keys of the summary rows that are missing, outdated or
+        that summarize no campaign documents, sorted.
+    """
+
+    def get_summary_key(summary: models.CampaignSummaryModel) -> SummaryKey:
+        return (
+            summary.stat,
+            summary.crop_variety_id,  # type: ignore
+            summary.location_origin_id,  # type: ignore
+            summary.year,
+        )
+
+    expected_summaries = {
+        get_summary_key(summary): summary
+        for summary in summarize_campaign_documents(
+            models.CampaignDocumentsModel.objects.all()
+        )
+    }
+    stored_summaries = {
+        get_summary_key(summary): summary
+        for summary in models.CampaignSummaryModel.objects.all()
+    }
+
+    inconsistent_keys = expected_summaries.keys() ^ stored_summaries.keys()
+
+    for key in expected_summaries.keys() & stored_summaries.keys():
+        expected_summary = expected_summaries[key]
+        stored_summary = stored_summaries[key]
+
+        if not all(
+            math.isclose(
+                getattr(expected_summary, value),
+                getattr(stored_summary, value),
+                rel_tol=1e-9,
+                abs_tol=1e-6,
+            )
+            for value in SUMMARY_VALUES
+        ):
+            inconsistent_keys.add(key)
+
+    return sorted(inconsistent_keys)
@@ -0,0 +1,242 @@
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection, transaction
+
+from repository import models
+from repository.relative_performance import MAX_RELATIVE_PERFORMANCE
+from repository.summaries import rebuild_campaign_summaries
+from repository.versioning import bump_data_version
+
+SYNTHETIC_YEARS = (2015, 2024)
+"""Represents the first and last year of the synthetic trials."""
+
+SYNTHETIC_BOUNDS = ((-55.0, -22.0), (-73.0, -53.0))
+"""Represents the latitude and longitude ranges of the synthetic locations."""
+
+SYNTHETIC_STATS: dict[str, tuple[float, float]] = {
+    "humidity_percentage_stat": (10, 16),
+    "performance_stat": (200, 900),
+    "grain_count_crop_stat": (8000, 16000),
+    "grain_count_per_spike_stat": (25, 55),
+    "weight_per_thousand_grains_stat": (25, 45),
+    "proteins_percentage_stat": (9, 15),
+    "ph_stat": (5.5, 8),
+}
+"""Represents the range of the values of each synthetic stat."""
+
+
+def generate_synthetic_batch(
+    *, seed: int, batch_index: int, batch_documents: int, locations: int, trial_size: int
+) -> dict[str, np.ndarray]:
+    """Generates the columns of a batch of synthetic campaign documents, grouped in
+    trials of `trial_size` documents of the same location, year and reference.
+
+    The batches are generated by their own random generator, so each batch can be
+    generated again without generating the previous ones.
+
+    Returns:
+        dict[str, np.ndarray]: The columns of the batch, the locations are indexes of
+        the created locations and the varieties random fractions of the varieties.
+    """
+    random = np.random.default_rng([seed, batch_index])
+
+    # Every trial_size consecutive documents share a trial.
+    trials = np.arange(batch_documents) // trial_size
+    trials_count = int(trials[-1]) + 1
+
+    columns = {
+        "location": random.integers(0, locations, trials_count)[trials],
+        "year": random.integers(SYNTHETIC_YEARS[0], SYNTHETIC_YEARS[1] + 1, trials_count)[
+            trials
+        ],
+        "reference": random.integers(0, 2, trials_count)[trials],
+        "variety": random.random(batch_documents),
+        "repetition": random.integers(1, 5, batch_documents),
+        "jitter": random.normal(0, 0.05, (batch_documents, 2)),
+    }
+
+    for stat, (low, high) in SYNTHETIC_STATS.items():
+        columns[stat] = np.round(random.uniform(low, high, batch_documents), 2)
+
+    return columns
+
+
+def generate_synthetic_dataset(
+    *,
+    documents: int,
+    locations: int,
+    varieties: int,
+    trial_size: int = 12,
+    seed: int = 0,
+    batch_size: int = 5000,
+) -> tuple[int, int, int]:
+    """Generates a synthetic dataset of campaign documents, grouped in trials of a
+    location and year, where each trial tests `trial_size` random varieties.
+
+    The same arguments always generate the same dataset. The batches are generated
+    twice, first to compute the mean performance of each location and year, then to
+    write the documents with their relative performances, so the memory usage does
+    not depend on the amount of documents. The summaries are rebuilt at the end.
+
+    Args:
+        documents (int): The amount of campaign documents to create.
+        locations (int): The amount of locations to create.
+        varieties (int): The amount of varieties to create.
+        trial_size (int): The amount of campaign documents of each trial.
+        seed (int): The seed of the random generators.
+        batch_size (int): The amount of documents written per bulk insert.
+
+    Returns:
+        tuple[int, int, int]: The amount of created documents, locations and varieties.
+    """
+    random = np.random.default_rng(seed)
+    (south, north), (west, east) = SYNTHETIC_BOUNDS
+    location_coordinates = random.uniform((south, west), (north, east), (locations, 2))
+
+    created_locations = models.LocationOptionsModel.objects.bulk_create(
+        [
+            models.LocationOptionsModel(region_name=f"Synthetic location {index}")
+            for index in range(locations)
+        ],
+        batch_size=batch_size,
+    )
+    created_varieties = models.VarietyOptionsModel.objects.bulk_create(
+        [
+            models.VarietyOptionsModel(
+                tradename=f"SYN {index}", variant_name=f"Synthetic {index}"
+            )
+            for index in range(varieties)
+        ],
+        batch_size=batch_size,
+    )
+
+    location_ids = [location.id for location in created_locations]
+    variety_ids = [variety.id for variety in created_varieties]
+    references = [
+        reference for reference, _ in models.CampaignDocumentsModel.REFERENCES_CHOICES
+    ]
+    years_count = SYNTHETIC_YEARS[1] - SYNTHETIC_YEARS[0] + 1
+
+    batches = [
+        (batch_index, min(batch_size, documents - start))
+        for batch_index, start in enumerate(range(0, documents, batch_size))
+    ]
+
+    def generate_batch(batch_index: int, batch_documents: int) -> dict[str, np.ndarray]:
+        columns = generate_synthetic_batch(
+            seed=seed,
+            batch_index=batch_index,
+            batch_documents=batch_documents,
+            locations=locations,
+            trial_size=trial_size,
+        )
+        columns["group"] = (
+            columns["location"] * years_count + columns["year"] - SYNTHETIC_YEARS[0]
+        )
+
+        return columns
+
+    # Sum the performances of each location and year.
+    performance_totals = np.zeros(locations * years_count)
+    performance_counts = np.zeros(locations * years_count)
+
+    for batch_index, batch_documents in batches:
+        columns = generate_batch(batch_index, batch_documents)
+        performance_totals += np.bincount(
+            columns["group"],
+            weights=columns["performance_stat"],
+            minlength=len(performance_totals),
+        )
+        performance_counts += np.bincount(
+            columns["group"], minlength=len(performance_counts)
+        )
+
+    mean_performances = performance_totals / np.maximum(performance_counts, 1)
+
+    for batch_index, batch_documents in batches:
+        columns = generate_batch(batch_index, batch_documents)
+        coordinates = location_coordinates[columns["location"]] + columns["jitter"]
+        relative_performances = np.clip(
+            np.round(
+                columns["performance_stat"] * 100 / mean_performances[columns["group"]], 2
+            ),
+            0,
+            MAX_RELATIVE_PERFORMANCE,
+        )
+
+        stat_values = {
+            stat: columns[stat].tolist()
+            if stat.startswith("grain_count")
+            else [Decimal(f"{value:.2f}") for value in columns[stat].tolist()]
+            for stat in SYNTHETIC_STATS
+        }
+
+        campaign_documents = [
+            models.CampaignDocumentsModel(
+                reference=references[reference],
+                paper_type="VARIEDADES",
+                paper_creation_year=date(year, 1, 1),
+                location_origin_id=location_ids[location],
+                latitude=Decimal(f"{latitude:.2f}"),
+                longitude=Decimal(f"{longitude:.2f}"),
+                paper_repetition=repetition,
+                crop_variety_id=variety_ids[int(variety * varieties)],
+                relative_performance_stat=Decimal(f"{relative_performance:.2f}"),
+                **{stat: values[index] for stat, values in stat_values.items()},
+            )
+            for index, (
+                reference,
+                year,
+                location,
+                (latitude, longitude),
+                repetition,
+                variety,
+                relative_performance,
+            ) in enumerate(
+                zip(
+                    columns["reference"].tolist(),
+                    columns["year"].tolist(),
+                    columns["location"].tolist(),
+                    coordinates.tolist(),
+                    columns["repetition"].tolist(),
+                    columns["variety"].tolist(),
+                    relative_performances.tolist(),
+                )
+            )
+        ]
+
+        with transaction.atomic():
+            models.CampaignDocumentsModel.objects.bulk_create(campaign_documents)
+
+    rebuild_campaign_summaries()
+    bump_data_version()
+
+    return documents, locations, varieties
+
+
+def flush_dataset() -> None:
+    """Deletes all the campaign documents, summaries, locations and varieties, the
+    documents and summaries are deleted with a single statement each, since deleting
+    them through the ORM refreshes the summaries of each document."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in [models.CampaignSummaryModel, models.CampaignDocumentsModel]:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+
+        models.LocationOptionsModel.objects.all().delete()
+        models.VarietyOptionsModel.objects.all().delete()
+
+    bump_data_version()
+
+
+def get_dataset_counts() -> dict[str, int]:
+    """Returns the amount of entries of each table of the dataset."""
+    return {
+        model._meta.db_table: model.objects.count()
+        for model in [
+            models.CampaignDocumentsModel,
+            models.LocationOptionsModel,
+            models.VarietyOptionsModel,
+        ]
+    }
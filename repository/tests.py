@@ -1,3 +1,688 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import tempfile
+import threading
+from unittest import mock
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    OperationalError,
+    connection,
+    connections,
+    transaction,
+)
+from django.http import HttpRequest, HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from repository.ingestion import IngestionError, ingest_campaign_documents
+from repository.models import (
+    CampaignDocumentsModel,
+    CampaignSummaryModel,
+    DataVersionModel,
+    LocationOptionsModel,
+    VarietyOptionsModel,
+)
+from repository.relative_performance import recompute_relative_performance
+from repository.routers import (
+    STICKY_COOKIE,
+    ReplicaReads,
+    ReplicaRouter,
+    replica_routing_middleware,
+)
+from repository.sqlite import get_pragma_statements, measure_concurrent_reads
+from repository.summaries import (
+    SUMMARY_STATS,
+    find_inconsistent_summaries,
+    refresh_campaign_summaries,
+)
+from repository.versioning import (
+    DataVersionScope,
+    bump_data_version,
+    data_changed,
+    get_data_version,
+)
+
+CAMPAIGN_DOCUMENT_RECORD = {
+    "reference": "RED INTA 2022",
+    "paper_type": "VARIEDADES",
+    "paper_creation_year": "2022",
+    "location_origin": "Laboulaye",
+    "latitude": "-34.13",
+    "longitude": "-63.39",
+    "paper_repetition": "3",
+    "crop_variety": "Baguette 620",
+    "humidity_percentage_stat": "12.50",
+    "performance_stat": "450.20",
+    "relative_performance_stat": "101.30",
+    "grain_count_crop_stat": "12000",
+    "grain_count_per_spike_stat": "42",
+    "weight_per_thousand_grains_stat": "35.10",
+    "proteins_percentage_stat": "11.20",
+    "ph_stat": "7.10",
+}
+
+
+class TestCampaignDocumentsIndexes(TestCase):
+
+    def assertQueryUsesIndex(self, index_name: str, **filters) -> None:
+        """Asserts that the database planner resolves the keyset query filtered with the
+        given lookups using the given index."""
+        queryset = (
+            CampaignDocumentsModel.objects.filter(id__gte=1, **filters)
+            .order_by("id")
+            .only("id")[:11]
+        )
+
+        self.assertIn(index_name, queryset.explain())
+
+    def test_keyset_queries_use_the_composite_indexes(self) -> None:
+        if connection.vendor != "sqlite":
+            self.skipTest("The query plan assertions are written for SQLite.")
+
+        self.assertQueryUsesIndex("campaign_location_id_idx", location_origin__id=1)
+        self.assertQueryUsesIndex("campaign_variety_id_idx", crop_variety__id=1)
+        self.assertQueryUsesIndex(
+            "campaign_year_id_idx", paper_creation_year=date(2022, 1, 1)
+        )
+
+
+class TestImportCampaignDocumentsCommand(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_file(self, name: str, content: str) -> Path:
+        file_path = Path(self.directory.name) / name
+        file_path.write_text(content, encoding="utf-8")
+
+        return file_path
+
+    def test_import_csv_and_json_lines_files(self) -> None:
+        LocationOptionsModel.objects.create(region_name="Laboulaye")
+
+        csv_rows = [",".join(CAMPAIGN_DOCUMENT_RECORD)] + [
+            ",".join(CAMPAIGN_DOCUMENT_RECORD.values()) for _ in range(5)
+        ]
+        csv_file = self.write_file("trials.csv", "\n".join(csv_rows) + "\n")
+        json_lines_file = self.write_file(
+            "trials.jsonl",
+            "\n".join(
+                json.dumps({**CAMPAIGN_DOCUMENT_RECORD, "crop_variety": f"Variety {index}"})
+                for index in range(3)
+            ),
+        )
+        data_version = get_data_version()
+
+        call_command(
+            "import_campaign_documents",
+            str(csv_file),
+            str(json_lines_file),
+            batch_size=2,
+            stdout=io.StringIO(),
+        )
+
+        self.assertEqual(CampaignDocumentsModel.objects.count(), 8)
+        self.assertEqual(LocationOptionsModel.objects.count(), 1)
+        self.assertEqual(VarietyOptionsModel.objects.count(), 4)
+        self.assertNotEqual(get_data_version(), data_version)
+
+        campaign_document = CampaignDocumentsModel.objects.first()
+
+        self.assertEqual(campaign_document.paper_creation_year, date(2022, 1, 1))  # type: ignore
+        self.assertEqual(campaign_document.crop_variety.variant_name, "Baguette 620")  # type: ignore
+
+    def test_import_reports_the_invalid_line(self) -> None:
+        json_lines_file = self.write_file(
+            "trials.jsonl",
+            "\n".join(
+                [
+                    json.dumps(CAMPAIGN_DOCUMENT_RECORD),
+                    json.dumps(
+                        {**CAMPAIGN_DOCUMENT_RECORD, "performance_stat": "high"}
+                    ),
+                ]
+            ),
+        )
+
+        with self.assertRaisesMessage(CommandError, "Line 2"):
+            call_command("import_campaign_documents", str(json_lines_file))
+
+    def record_data_changes(self) -> list[int]:
+        """Returns the list where the data versions of the changes are recorded."""
+        versions: list[int] = []
+
+        def on_data_changed(sender, version: int, **kwargs) -> None:
+            versions.append(version)
+
+        data_changed.connect(on_data_changed, weak=False)
+        self.addCleanup(data_changed.disconnect, on_data_changed)
+
+        return versions
+
+    def test_import_creates_the_options_of_each_batch_with_a_bulk_insert(self) -> None:
+        json_lines_file = self.write_file(
+            "trials.jsonl",
+            "\n".join(
+                json.dumps(
+                    {
+                        **CAMPAIGN_DOCUMENT_RECORD,
+                        "location_origin": f"Location {index}",
+                        "crop_variety": f"Variety {index}",
+                        "relative_performance_stat": "100.00",
+                    }
+                )
+                for index in range(6)
+            ),
+        )
+        versions = self.record_data_changes()
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "import_campaign_documents",
+                str(json_lines_file),
+                batch_size=3,
+                stdout=io.StringIO(),
+            )
+
+        variety_inserts = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "variety_options"')
+        ]
+
+        location_inserts = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "location_options"')
+        ]
+
+        self.assertEqual(VarietyOptionsModel.objects.count(), 6)
+        self.assertEqual(len(variety_inserts), 2)
+        self.assertEqual(len(location_inserts), 2)
+        self.assertEqual(len(versions), 1)
+
+    def test_import_does_not_count_the_options_of_a_failed_batch(self) -> None:
+        json_lines_file = self.write_file(
+            "trials.jsonl",
+            "\n".join(
+                [
+                    json.dumps(CAMPAIGN_DOCUMENT_RECORD),
+                    json.dumps(
+                        {**CAMPAIGN_DOCUMENT_RECORD, "performance_stat": "high"}
+                    ),
+                ]
+            ),
+        )
+        versions = self.record_data_changes()
+
+        with self.assertRaisesMessage(CommandError, "Line 2"):
+            call_command("import_campaign_documents", str(json_lines_file))
+
+        self.assertEqual(VarietyOptionsModel.objects.count(), 0)
+        self.assertEqual(versions, [])
+
+    def test_import_errors_are_not_replaced_by_the_finishing_errors(self) -> None:
+        stream = io.StringIO(
+            "\n".join(
+                [
+                    json.dumps(CAMPAIGN_DOCUMENT_RECORD),
+                    json.dumps(
+                        {**CAMPAIGN_DOCUMENT_RECORD, "performance_stat": "high"}
+                    ),
+                ]
+            )
+        )
+        versions = self.record_data_changes()
+
+        with mock.patch(
+            "repository.ingestion.recompute_relative_performance",
+            side_effect=OperationalError("database is locked"),
+        ), self.assertLogs("repository.ingestion", "ERROR"), self.assertRaisesMessage(
+            IngestionError, "Line 2"
+        ):
+            ingest_campaign_documents(stream, file_format="jsonl", batch_size=1)
+
+        # The first batch was committed before the error.
+        self.assertEqual(CampaignDocumentsModel.objects.count(), 1)
+        self.assertEqual(versions, [])
+
+
+class TestCampaignSummaries(TestCase):
+
+    def setUp(self) -> None:
+        self.locations = LocationOptionsModel.objects.bulk_create(
+            [LocationOptionsModel(region_name=f"Region {index}") for index in range(2)]
+        )
+        self.variety = VarietyOptionsModel.objects.create(
+            tradename="Trade", variant_name="Variety"
+        )
+
+    def create_campaign_document(self, performance: str) -> CampaignDocumentsModel:
+        fields = {
+            field: CAMPAIGN_DOCUMENT_RECORD[field]
+            for field in CAMPAIGN_DOCUMENT_RECORD
+            if field not in ["location_origin", "crop_variety"]
+        }
+
+        return CampaignDocumentsModel.objects.create(
+            **{
+                **fields,
+                "paper_creation_year": date(2022, 1, 1),
+                "performance_stat": performance,
+            },
+            location_origin=self.locations[0],
+            crop_variety=self.variety,
+        )
+
+    def get_performance_summary(self, location: LocationOptionsModel) -> tuple:
+        return CampaignSummaryModel.objects.values_list(
+            "count", "total", "minimum", "maximum"
+        ).get(stat="performance_stat", location_origin=location, year=2022)
+
+    def test_summaries_follow_the_saved_and_deleted_documents(self) -> None:
+        first_document = self.create_campaign_document("100")
+        second_document = self.create_campaign_document("300")
+
+        self.assertEqual(
+            self.get_performance_summary(self.locations[0]), (2, 400.0, 100.0, 300.0)
+        )
+
+        # Moving a document to another location updates both groups.
+        second_document.location_origin = self.locations[1]
+        second_document.save()
+
+        self.assertEqual(
+            self.get_performance_summary(self.locations[0]), (1, 100.0, 100.0, 100.0)
+        )
+        self.assertEqual(
+            self.get_performance_summary(self.locations[1]), (1, 300.0, 300.0, 300.0)
+        )
+
+        first_document.delete()
+
+        self.assertFalse(
+            CampaignSummaryModel.objects.filter(location_origin=self.locations[0]).exists()
+        )
+        self.assertEqual(find_inconsistent_summaries(), [])
+
+    def test_imports_refresh_the_summaries(self) -> None:
+        stream = io.StringIO(
+            "\n".join(
+                json.dumps({**CAMPAIGN_DOCUMENT_RECORD, "performance_stat": performance})
+                for performance in ["100", "200", "600"]
+            )
+        )
+
+        ingest_campaign_documents(stream, file_format="jsonl", batch_size=2)
+
+        location = LocationOptionsModel.objects.get(region_name="Laboulaye")
+
+        self.assertEqual(
+            self.get_performance_summary(location), (3, 900.0, 100.0, 600.0)
+        )
+        self.assertEqual(find_inconsistent_summaries(), [])
+
+    def test_refresh_only_recomputes_the_given_groups(self) -> None:
+        other_variety = VarietyOptionsModel.objects.create(
+            tradename="Other trade", variant_name="Other variety"
+        )
+        self.create_campaign_document("100")
+        second_document = self.create_campaign_document("300")
+        third_document = self.create_campaign_document("500")
+
+        # The updates do not send the model signals, so the summaries of the moved
+        # documents are not refreshed.
+        CampaignDocumentsModel.objects.filter(id=second_document.id).update(
+            location_origin=self.locations[1], crop_variety=other_variety
+        )
+        CampaignDocumentsModel.objects.filter(id=third_document.id).update(
+            location_origin=self.locations[1]
+        )
+
+        refresh_campaign_summaries(
+            [
+                (self.variety.id, self.locations[0].id, 2022),
+                (other_variety.id, self.locations[1].id, 2022),
+            ]
+        )
+
+        # The groups of the cross product of the given ones are not refreshed.
+        self.assertEqual(
+            find_inconsistent_summaries(),
+            [
+                (stat, self.variety.id, self.locations[1].id, 2022)
+                for stat in sorted(SUMMARY_STATS)
+            ],
+        )
+        self.assertEqual(
+            self.get_performance_summary(self.locations[0]), (1, 100.0, 100.0, 100.0)
+        )
+
+    def test_command_verifies_and_rebuilds_the_summaries(self) -> None:
+        self.create_campaign_document("100")
+        CampaignSummaryModel.objects.filter(stat="ph_stat").update(total=0)
+
+        with self.assertRaises(CommandError):
+            call_command(
+                "rebuild_campaign_summaries",
+                "--verify",
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+
+        version = get_data_version()
+        call_command("rebuild_campaign_summaries", stdout=io.StringIO())
+
+        self.assertEqual(find_inconsistent_summaries(), [])
+        self.assertGreater(get_data_version(), version)
+
+    def test_migration_summarizes_the_documents_like_the_rebuild(self) -> None:
+        migration = importlib.import_module(
+            "repository.migrations.0007_campaign_summaries"
+        )
+        self.create_campaign_document("100")
+        self.create_campaign_document("300")
+        CampaignSummaryModel.objects.all().delete()
+
+        migration.summarize_existing_documents(apps, None)
+
+        self.assertEqual(find_inconsistent_summaries(), [])
+        self.assertEqual(
+            self.get_performance_summary(self.locations[0]), (2, 400.0, 100.0, 300.0)
+        )
+
+
+class TestRelativePerformance(TestCase):
+
+    def test_relative_performance_is_relative_to_the_location_and_year_mean(
+        self,
+    ) -> None:
+        records = [
+            {**CAMPAIGN_DOCUMENT_RECORD, "crop_variety": variety, "performance_stat": value}
+            for variety, value in [("A", "300"), ("B", "500"), ("C", "400")]
+        ] + [
+            {
+                **CAMPAIGN_DOCUMENT_RECORD,
+                "paper_creation_year": "2021",
+                "performance_stat": "250",
+            }
+        ]
+
+        ingest_campaign_documents(
+            io.StringIO("\n".join(json.dumps(record) for record in records)),
+            file_format="jsonl",
+            batch_size=2,
+        )
+
+        self.assertEqual(
+            [
+                str(value)
+                for value in CampaignDocumentsModel.objects.order_by("id").values_list(
+                    "relative_performance_stat", flat=True
+                )
+            ],
+            ["75.00", "125.00", "100.00", "100.00"],
+        )
+        self.assertEqual(find_inconsistent_summaries(), [])
+
+    def test_command_only_writes_the_changed_documents(self) -> None:
+        ingest_campaign_documents(
+            io.StringIO(
+                "\n".join(
+                    json.dumps({**CAMPAIGN_DOCUMENT_RECORD, "performance_stat": value})
+                    for value in ["100", "300"]
+                )
+            ),
+            file_format="jsonl",
+            batch_size=10,
+        )
+        CampaignDocumentsModel.objects.update(relative_performance_stat=0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(recompute_relative_performance(years=[2023]), 0)
+
+        stdout = io.StringIO()
+        call_command("recompute_relative_performance", chunk_size=1, stdout=stdout)
+
+        self.assertIn("of 2 campaign documents", stdout.getvalue())
+        self.assertEqual(
+            sorted(
+                CampaignDocumentsModel.objects.values_list(
+                    "relative_performance_stat", flat=True
+                )
+            ),
+            [Decimal("50.00"), Decimal("150.00")],
+        )
+
+
+class TestSyntheticDataset(TestCase):
+
+    def test_the_same_seed_generates_the_same_dataset(self) -> None:
+        def generate() -> list[tuple]:
+            call_command(
+                "generate_synthetic_data",
+                documents=250,
+                locations=4,
+                varieties=6,
+                trial_size=5,
+                seed=7,
+                batch_size=100,
+                flush=True,
+                stdout=io.StringIO(),
+            )
+
+            return list(
+                CampaignDocumentsModel.objects.order_by("id").values_list(
+                    "location_origin__region_name",
+                    "crop_variety__variant_name",
+                    "paper_creation_year",
+                    "performance_stat",
+                    "relative_performance_stat",
+                    "latitude",
+                )
+            )
+
+        first_dataset = generate()
+
+        self.assertEqual(len(first_dataset), 250)
+        self.assertEqual(LocationOptionsModel.objects.count(), 4)
+        self.assertEqual(VarietyOptionsModel.objects.count(), 6)
+        self.assertEqual(find_inconsistent_summaries(), [])
+        self.assertEqual(generate(), first_dataset)
+        # The generated relative performances are the recomputed ones.
+        self.assertEqual(recompute_relative_performance(), 0)
+
+
+WITHOUT_BACKGROUND_REBUILDS = override_settings(
+    PREFLIGHT_SNAPSHOT={**settings.PREFLIGHT_SNAPSHOT, "BACKGROUND_REBUILD": False},
+    ANALYTICS_SNAPSHOT={**settings.ANALYTICS_SNAPSHOT, "BACKGROUND_REBUILD": False},
+    SPATIAL_INDEX={**settings.SPATIAL_INDEX, "BACKGROUND_REBUILD": False},
+)
+"""Disables the background rebuilds of the transaction test cases, whose threads
+would read the test database while the next tests write it."""
+
+
+@WITHOUT_BACKGROUND_REBUILDS
+class TestDataVersion(TransactionTestCase):
+
+    def bump_in_another_connection(self) -> None:
+        """Bumps the data version from a thread, which has its own database
+        connection, like another server worker or a management command."""
+
+        def bump() -> None:
+            try:
+                bump_data_version()
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=bump)
+        thread.start()
+        thread.join()
+
+    def test_versions_bumped_by_other_connections_are_read(self) -> None:
+        data_version = get_data_version()
+
+        self.bump_in_another_connection()
+
+        self.assertGreater(get_data_version(), data_version)
+
+    def test_scopes_keep_the_version_they_read_first(self) -> None:
+        with DataVersionScope():
+            data_version = get_data_version()
+
+            self.bump_in_another_connection()
+
+            self.assertEqual(get_data_version(), data_version)
+
+        self.assertGreater(get_data_version(), data_version)
+
+
+@WITHOUT_BACKGROUND_REBUILDS
+@override_settings(DATABASE_REPLICAS={"ALIASES": ["replica_test"], "STICKY_SECONDS": 10})
+class TestReplicaRouter(TransactionTestCase):
+
+    def setUp(self) -> None:
+        # The replica is a separate SQLite file with its own variety options and an
+        # older data version.
+        self.replica_directory = tempfile.TemporaryDirectory()
+        connections.settings["replica_test"] = connections.configure_settings(
+            {
+                DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+                "replica_test": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": Path(self.replica_directory.name) / "replica.sqlite3",
+                },
+            }
+        )["replica_test"]
+
+        with connections["replica_test"].schema_editor() as schema_editor:
+            schema_editor.create_model(VarietyOptionsModel)
+            schema_editor.create_model(DataVersionModel)
+
+        DataVersionModel.objects.using("replica_test").create(id=1, version=1)
+
+        VarietyOptionsModel.objects.using("replica_test").create(
+            tradename="REP", variant_name="Replica variety"
+        )
+        VarietyOptionsModel.objects.create(
+            tradename="PRI", variant_name="Primary variety"
+        )
+
+    def tearDown(self) -> None:
+        connections["replica_test"].close()
+        del connections.settings["replica_test"]
+        delattr(connections._connections, "replica_test")
+        self.replica_directory.cleanup()
+
+    def get_variant_names(self) -> list[str]:
+        return list(VarietyOptionsModel.objects.values_list("variant_name", flat=True))
+
+    def test_reads_use_the_replicas_only_inside_the_scopes(self) -> None:
+        self.assertEqual(self.get_variant_names(), ["Primary variety"])
+
+        with ReplicaReads():
+            self.assertEqual(self.get_variant_names(), ["Replica variety"])
+
+            with transaction.atomic():
+                self.assertEqual(self.get_variant_names(), ["Primary variety"])
+
+    def test_reads_are_pinned_to_the_primary_after_a_write(self) -> None:
+        with ReplicaReads() as replica_reads:
+            VarietyOptionsModel.objects.create(tradename="NEW", variant_name="New")
+
+            self.assertTrue(replica_reads.wrote)
+            self.assertEqual(
+                sorted(self.get_variant_names()), ["New", "Primary variety"]
+            )
+
+    def test_each_scope_reads_from_a_single_replica_in_round_robin(self) -> None:
+        router = ReplicaRouter()
+        scope_aliases = []
+
+        with override_settings(
+            DATABASE_REPLICAS={"ALIASES": ["a", "b"], "STICKY_SECONDS": 10}
+        ):
+            for _ in range(2):
+                with ReplicaReads():
+                    scope_aliases.append(
+                        {router.db_for_read(VarietyOptionsModel) for _ in range(4)}
+                    )
+
+        self.assertEqual(sorted(scope_aliases), [{"a"}, {"b"}])
+
+    def test_scopes_read_the_data_version_of_their_replica(self) -> None:
+        primary_version = get_data_version()
+
+        with ReplicaReads(), DataVersionScope():
+            self.assertEqual(get_data_version(), 1)
+            self.assertEqual(self.get_variant_names(), ["Replica variety"])
+
+        self.assertEqual(get_data_version(), primary_version)
+
+    def test_middleware_pins_the_clients_that_write(self) -> None:
+        request_factory = RequestFactory()
+
+        def read_view(request: HttpRequest) -> HttpResponse:
+            return HttpResponse(",".join(self.get_variant_names()))
+
+        def write_view(request: HttpRequest) -> HttpResponse:
+            VarietyOptionsModel.objects.create(tradename="NEW", variant_name="New")
+            return HttpResponse()
+
+        write_response = replica_routing_middleware(write_view)(
+            request_factory.post("/")
+        )
+        read_response = replica_routing_middleware(read_view)(request_factory.get("/"))
+
+        pinned_request = request_factory.get("/")
+        pinned_request.COOKIES[STICKY_COOKIE] = "1"
+        pinned_response = replica_routing_middleware(read_view)(pinned_request)
+
+        self.assertEqual(write_response.cookies[STICKY_COOKIE]["max-age"], 10)
+        self.assertEqual(read_response.content, b"Replica variety")
+        self.assertNotIn(STICKY_COOKIE, read_response.cookies)
+        self.assertEqual(pinned_response.content, b"Primary variety,New")
+
+
+class TestSQLitePragmas(TestCase):
+
+    def test_pragmas_are_applied_to_the_connections(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_invalid_pragma_values_are_rejected(self) -> None:
+        self.assertEqual(
+            get_pragma_statements({"JOURNAL_MODE": "WAL", "MMAP_SIZE": "1024"}),
+            ["PRAGMA journal_mode = wal", "PRAGMA mmap_size = 1024"],
+        )
+
+        with self.assertRaises(ValueError):
+            get_pragma_statements({"JOURNAL_MODE": "wal; DROP TABLE trials"})
+
+    def test_readers_do_not_fail_while_writing(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            result = measure_concurrent_reads(
+                str(Path(directory) / "benchmark.sqlite3"),
+                pragmas={"JOURNAL_MODE": "wal", "SYNCHRONOUS": "normal"},
+                readers=2,
+                duration=0.2,
+                rows=100,
+                write_batch=10,
+            )
+
+        self.assertEqual(result["failed_reads"], 0)
+        self.assertGreater(result["reads"], 0)
+        self.assertGreater(result["write_transactions"], 0)
@@ -0,0 +1,122 @@
+import contextvars
+import time
+
+from django.db import transaction
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Greatest
+from django.dispatch import Signal
+
+from repository.models import DataVersionModel
+
+DATA_VERSION_ID = 1
+"""Represents the id of the row where the global data version is stored."""
+
+data_changed = Signal()
+"""Represents a signal sent with the new data version each time the repository data changes."""
+
+
+class DataVersionScope:
+    """Represents a scope, like a GraphQL operation, that reads the data version
+    once and reuses it, so everything resolved in the scope is stamped with the
+    same version. The scopes entered inside another scope reuse its version."""
+
+    def __init__(self) -> None:
+        self.__token: contextvars.Token | None = None
+
+    def __enter__(self) -> "DataVersionScope":
+        if _data_version_scope.get() is None:
+            self.__token = _data_version_scope.set([None])
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.__token is not None:
+            _data_version_scope.reset(self.__token)
+
+
+# The scope version is kept in a list, so the `sync_to_async` threads, that run in
+# a copy of the context, share it.
+_data_version_scope: contextvars.ContextVar[list[int | None] | None] = (
+    contextvars.ContextVar("data_version_scope", default=None)
+)
+
+
+def read_data_version() -> int:
+    """Reads the data version from the database, initializing it when it is missing
+    with a timestamp, to never repeat the version of a previous database."""
+    version = (
+        DataVersionModel.objects.filter(pk=DATA_VERSION_ID)
+        .values_list("version", flat=True)
+        .first()
+    )
+
+    if version is None:
+        data_version, _ = DataVersionModel.objects.get_or_create(
+            pk=DATA_VERSION_ID, defaults={"version": time.time_ns()}
+        )
+        version = data_version.version
+
+    return version
+
+
+def get_data_version() -> int:
+    """Returns the current version of the repository data.
+
+    The version is stored in a single row of the database, so every process, like
+    the server workers and the management commands, shares the same version.
+    Inside a `ReplicaReads` scope it is read from the replica of the scope, so the
+    caches and snapshots stamped with it hold the rows of that version, even when
+    the replica lags behind the primary database.
+
+    Returns:
+        int: The current data version, or the version of the current
+        `DataVersionScope` once it has been read.
+    """
+    scope = _data_version_scope.get()
+
+    if scope is not None and scope[0] is not None:
+        return scope[0]
+
+    version = read_data_version()
+
+    if scope is not None:
+        scope[0] = version
+
+    return version
+
+
+def bump_data_version() -> int:
+    """Increments the repository data version and notifies the receivers of
+    the `data_changed` signal of this process. The other processes find out
+    the change the next time they read the version.
+
+    Returns:
+        int: The new data version.
+    """
+    # The version is incremented by the database, so the concurrent bumps of
+    # different processes are never lost. It moves at least to the current
+    # timestamp, so the versions of the rolled back bumps are never reused.
+    next_version = Greatest(
+        F("version") + 1, Value(time.time_ns(), output_field=BigIntegerField())
+    )
+
+    with transaction.atomic():
+        if not DataVersionModel.objects.filter(pk=DATA_VERSION_ID).update(
+            version=next_version
+        ):
+            # The version is missing, so a new one is initialized.
+            read_data_version()
+            DataVersionModel.objects.filter(pk=DATA_VERSION_ID).update(
+                version=next_version
+            )
+
+        version = read_data_version()
+
+    scope = _data_version_scope.get()
+
+    if scope is not None:
+        scope[0] = version
+
+    data_changed.send(sender=bump_data_version, version=version)
+
+    return version